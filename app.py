@@ -3,29 +3,52 @@ import os
 
 import aws_cdk as cdk
 
-from connect_cdk_voice_channel.connect_cdk_voice_channel_stack import ConnectCdkVoiceChannelStack
+from connect_cdk_voice_channel.connect_cdk_voice_channel_stack import ConnectParameterizedStack
+from connect_cdk_voice_channel.multi_tenant import add_tenant_stacks, synth_partitioned
+from connect_cdk_voice_channel.parameterized import PARAMETERIZED_STACK_NAME, PARAMETERIZED_TEMPLATE_CONTEXT_KEY
+from connect_cdk_voice_channel.tenant_config import TENANT_CONFIG_CONTEXT_KEY, TenantConfig
+from connect_cdk_voice_channel.tenant_manifest import (
+    SYNTH_WORKERS_CONTEXT_KEY, TENANTS_MANIFEST_CONTEXT_KEY, resolve_manifest)
 
 
 app = cdk.App()
-# CloudFormation Stack 名称：优先使用经过合法化处理的 stack_name，
-# 若不存在则回退到 tenant_name（保持向后兼容）。
-stack_id = os.environ.get("stack_name") or os.environ["tenant_name"]
-ConnectCdkVoiceChannelStack(app, stack_id, description=os.environ.get("tenant_description", "")
-                            # If you don't specify 'env', this stack will be environment-agnostic.
-                            # Account/Region-dependent features and context lookups will not work,
-                            # but a single synthesized template can be deployed anywhere.
 
-                            # Uncomment the next line to specialize this stack for the AWS Account
-                            # and Region that are implied by the current CLI configuration.
-
-                            # env=cdk.Environment(account=os.getenv('CDK_DEFAULT_ACCOUNT'), region=os.getenv('CDK_DEFAULT_REGION')),
-
-                            # Uncomment the next line if you know exactly what Account and Region you
-                            # want to deploy the stack to. */
-
-                            # env=cdk.Environment(account='123456789012', region='us-east-1'),
-
-                            # For more information, see https://docs.aws.amazon.com/cdk/latest/guide/environments.html
-                            )
+# 参数化模板：`cdk synth -c parameterized_template=true` 只合成一个不含租户数据的 Stack，
+# 由 deploy_cli.py 以各租户的参数多次部署
+if app.node.try_get_context(PARAMETERIZED_TEMPLATE_CONTEXT_KEY) in (True, "true", "1"):
+    ConnectParameterizedStack(app, PARAMETERIZED_STACK_NAME)
+    app.synth()
+    raise SystemExit(0)
+
+# 多租户：`cdk deploy --all --concurrency 8 -c tenants_manifest=tenants.json`
+# 在一次 synth 中为清单中的每个租户创建一个 Stack。
+manifest_path = app.node.try_get_context(TENANTS_MANIFEST_CONTEXT_KEY) or os.environ.get("TENANTS_MANIFEST")
+if manifest_path:
+    tenant_configs = resolve_manifest(manifest_path)
+    workers = int(app.node.try_get_context(SYNTH_WORKERS_CONTEXT_KEY) or os.environ.get("SYNTH_WORKERS", "1"))
+    if workers > 1:
+        if "CDK_OUTDIR" in os.environ:
+            # 由 CDK CLI 调用时只能输出一个 cloud assembly，分区模式需要直接运行 python app.py
+            print("synth_workers is ignored when running under the CDK CLI; synthesizing in-process")
+        else:
+            for outdir, stack_names in synth_partitioned(tenant_configs, workers):
+                print(f"{outdir}: {len(stack_names)} stacks "
+                      f"(deploy with: cdk deploy --app {outdir} --all --concurrency 8)")
+            raise SystemExit(0)
+else:
+    # 单租户：租户配置由 deploy_cli.py 序列化后通过 `cdk -c tenant_config=<path>` 传入，
+    # 也可以用环境变量 TENANT_CONFIG_FILE 指定。
+    config_path = app.node.try_get_context(TENANT_CONFIG_CONTEXT_KEY) or os.environ.get("TENANT_CONFIG_FILE")
+    if not config_path:
+        raise SystemExit("Missing tenant config: run via deploy_cli.py, or pass "
+                         "-c tenant_config=<path> / -c tenants_manifest=<path>")
+    tenant_configs = [TenantConfig.load(config_path)]
+
+# CloudFormation Stack 名称使用经过合法化处理的 stack_name。
+# 未指定 env，Stack 与环境无关：同一份模板可以部署到任意账户/区域。
+# 如需绑定账户/区域，可传入
+# env=cdk.Environment(account=os.getenv('CDK_DEFAULT_ACCOUNT'), region=os.getenv('CDK_DEFAULT_REGION'))，
+# 参见 https://docs.aws.amazon.com/cdk/latest/guide/environments.html
+add_tenant_stacks(app, tenant_configs)
 
 app.synth()
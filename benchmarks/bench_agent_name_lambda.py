@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""
+GetAgentNameByAgentId Lambda 离线基准测试
+
+- 冷启动：在全新的 Python 解释器中导入 lambda_function，测量导入耗时与首次调用耗时
+- 温调用：以模拟的 Amazon Connect 联系事件驱动 lambda_handler，使用可注入延迟与限流的
+  Connect 客户端桩（不访问 AWS），统计 p50/p95/p99 延迟与内存分配
+- 结果写入 JSON（默认 benchmarks/results/latest.json），并与纳入版本控制的基线
+  benchmarks/results/baseline.json 比较，超过容忍比例时以非零状态退出
+
+用法:
+  python benchmarks/bench_agent_name_lambda.py
+  python benchmarks/bench_agent_name_lambda.py --invocations 5000 --latency-ms 30 --throttle-rate 0.05
+  python benchmarks/bench_agent_name_lambda.py --update-baseline
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import re
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LAMBDA_DIR = os.path.join(PROJECT_DIR, "lambda", "GetAgentNameByAgentId")
+RESULTS_DIR = os.path.join(PROJECT_DIR, "benchmarks", "results")
+BASELINE_PATH = os.path.join(RESULTS_DIR, "baseline.json")
+
+# EMF 日志中的 Degraded 指标；批量调用时为各座席的合计
+DEGRADED_PATTERN = re.compile(r'"Degraded": (\d+)')
+
+INSTANCE_ID = "00000000-0000-0000-0000-000000000000"
+INSTANCE_ARN = f"arn:aws:connect:us-east-1:123456789012:instance/{INSTANCE_ID}"
+
+# 基准测试进程中使用的 Lambda 环境变量（不访问 AWS，只需要区域让 boto3 创建客户端）
+BENCH_ENV = {
+    "AWS_DEFAULT_REGION": "us-east-1",
+    "AWS_ACCESS_KEY_ID": "bench",
+    "AWS_SECRET_ACCESS_KEY": "bench",
+    "AWS_LAMBDA_FUNCTION_NAME": "Bench-GetAgentNameByAgentId",
+}
+
+
+# ─── Connect 客户端桩 ────────────────────────────────────────────────────────
+
+class StubConnectClient:
+    """模拟 Connect 客户端：每次调用注入固定延迟（含抖动），按比例抛出限流异常。"""
+
+    def __init__(self, latency_ms=20.0, jitter_ms=5.0, throttle_rate=0.0, seed=0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.throttle_rate = throttle_rate
+        self._random = random.Random(seed)
+        self.calls = 0
+        self.throttled = 0
+
+    def _simulate(self, operation):
+        self.calls += 1
+        delay = max(self.latency_ms + self._random.uniform(-self.jitter_ms, self.jitter_ms), 0)
+        time.sleep(delay / 1000)
+        if self._random.random() < self.throttle_rate:
+            from botocore.exceptions import ClientError
+            self.throttled += 1
+            raise ClientError(
+                {"Error": {"Code": "ThrottlingException", "Message": "Rate exceeded"}}, operation)
+
+    def describe_user(self, UserId, InstanceId):
+        self._simulate("DescribeUser")
+        return {
+            "User": {
+                "Id": UserId,
+                "Username": f"agent_{UserId[:8]}",
+                "RoutingProfileId": "routing-profile-1",
+                "HierarchyGroupId": "hierarchy-group-1",
+                "IdentityInfo": {"FirstName": "Agent", "LastName": UserId[:8]},
+            }
+        }
+
+    def describe_routing_profile(self, InstanceId, RoutingProfileId):
+        self._simulate("DescribeRoutingProfile")
+        return {"RoutingProfile": {"Name": "Bench Routing Profile"}}
+
+    def describe_user_hierarchy_group(self, HierarchyGroupId, InstanceId):
+        self._simulate("DescribeUserHierarchyGroup")
+        return {"HierarchyGroup": {"Name": "Bench Group"}}
+
+
+class StubContext:
+    function_name = BENCH_ENV["AWS_LAMBDA_FUNCTION_NAME"]
+
+    def __init__(self, timeout_ms=3000):
+        self._deadline = time.monotonic() + timeout_ms / 1000
+
+    def get_remaining_time_in_millis(self):
+        return int((self._deadline - time.monotonic()) * 1000)
+
+
+def make_contact_event(agent_id, parameters=None):
+    """构造与 Connect InvokeLambdaFunction 相同结构的联系事件。"""
+    params = {"LastAgentID": agent_id}
+    params.update(parameters or {})
+    return {
+        "Name": "ContactFlowEvent",
+        "Details": {
+            "ContactData": {
+                "Attributes": {},
+                "Channel": "VOICE",
+                "ContactId": "11111111-2222-3333-4444-555555555555",
+                "CustomerEndpoint": {"Address": "+15555550100", "Type": "TELEPHONE_NUMBER"},
+                "InitialContactId": "11111111-2222-3333-4444-555555555555",
+                "InitiationMethod": "INBOUND",
+                "InstanceARN": INSTANCE_ARN,
+                "PreviousContactId": "11111111-2222-3333-4444-555555555555",
+                "Queue": None,
+                "SystemEndpoint": {"Address": "+15555550199", "Type": "TELEPHONE_NUMBER"},
+            },
+            "Parameters": params,
+        },
+    }
+
+
+def make_agent_pool(size, seed=0):
+    rnd = random.Random(seed)
+    return [
+        "%08x-%04x-%04x-%04x-%012x" % (
+            rnd.getrandbits(32), rnd.getrandbits(16), rnd.getrandbits(16),
+            rnd.getrandbits(16), rnd.getrandbits(48))
+        for _ in range(size)
+    ]
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100
+    lower = int(k)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (k - lower)
+
+
+def summarize(latencies_ms):
+    return {
+        "count": len(latencies_ms),
+        "min_ms": round(min(latencies_ms), 3) if latencies_ms else 0.0,
+        "mean_ms": round(statistics.fmean(latencies_ms), 3) if latencies_ms else 0.0,
+        "p50_ms": round(percentile(latencies_ms, 50), 3),
+        "p95_ms": round(percentile(latencies_ms, 95), 3),
+        "p99_ms": round(percentile(latencies_ms, 99), 3),
+        "max_ms": round(max(latencies_ms), 3) if latencies_ms else 0.0,
+    }
+
+
+
+def count_degraded(log_output):
+    return sum(int(count) for count in DEGRADED_PATTERN.findall(log_output))
+
+# ─── 冷启动 ──────────────────────────────────────────────────────────────────
+
+# 在子进程中执行：导入 lambda_function 并完成首次调用，输出 JSON
+COLD_START_SNIPPET = r"""
+import contextlib, io, json, sys, time
+sys.path.insert(0, {bench_dir!r})
+sys.path.insert(0, {lambda_dir!r})
+t0 = time.perf_counter()
+import lambda_function
+t1 = time.perf_counter()
+from bench_agent_name_lambda import StubConnectClient, StubContext, make_contact_event
+lambda_function.connect = StubConnectClient(latency_ms={latency_ms}, jitter_ms=0)
+with contextlib.redirect_stdout(io.StringIO()):
+    t2 = time.perf_counter()
+    lambda_function.lambda_handler(make_contact_event("cold-start-agent"), StubContext())
+    t3 = time.perf_counter()
+print(json.dumps({{"import_ms": (t1 - t0) * 1000, "first_invocation_ms": (t3 - t2) * 1000}}))
+"""
+
+
+def measure_cold_start(runs, latency_ms):
+    env = dict(os.environ, **BENCH_ENV)
+    snippet = COLD_START_SNIPPET.format(
+        bench_dir=os.path.dirname(os.path.abspath(__file__)),
+        lambda_dir=LAMBDA_DIR, latency_ms=latency_ms)
+    imports, first_calls, process_ms = [], [], []
+    for _ in range(runs):
+        started = time.perf_counter()
+        out = subprocess.run(
+            [sys.executable, "-c", snippet], env=env, capture_output=True, text=True, check=True)
+        process_ms.append((time.perf_counter() - started) * 1000)
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        imports.append(result["import_ms"])
+        first_calls.append(result["first_invocation_ms"])
+    return {
+        "runs": runs,
+        "import": summarize(imports),
+        "first_invocation": summarize(first_calls),
+        "process_total": summarize(process_ms),
+    }
+
+
+# ─── 温调用 ──────────────────────────────────────────────────────────────────
+
+def measure_warm(invocations, agents, latency_ms, throttle_rate, parameters, seed):
+    os.environ.update(BENCH_ENV)
+    sys.path.insert(0, LAMBDA_DIR)
+    import lambda_function
+
+    stub = StubConnectClient(latency_ms=latency_ms, throttle_rate=throttle_rate, seed=seed)
+    lambda_function.connect = stub
+    pool = make_agent_pool(agents, seed)
+    rnd = random.Random(seed)
+    # 少数座席承担大部分通话：按 1/rank 的权重抽样
+    weights = [1 / (rank + 1) for rank in range(len(pool))]
+    events = [make_contact_event(agent_id, parameters)
+              for agent_id in rnd.choices(pool, weights=weights, k=invocations)]
+
+    latencies = []
+    degraded = 0
+    errors = 0
+    tracemalloc.start()
+    alloc_before = tracemalloc.get_traced_memory()[0]
+    with contextlib.redirect_stdout(io.StringIO()) as captured:
+        for event in events:
+            started = time.perf_counter()
+            try:
+                lambda_function.lambda_handler(event, StubContext())
+            except Exception:
+                errors += 1
+            latencies.append((time.perf_counter() - started) * 1000)
+            # 避免重定向缓冲无限增长，同时统计降级次数
+            if captured.tell() > 1 << 20:
+                degraded += count_degraded(captured.getvalue())
+                captured.seek(0)
+                captured.truncate()
+        degraded += count_degraded(captured.getvalue())
+    alloc_after, alloc_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "invocations": invocations,
+        "agent_pool": agents,
+        "latency": summarize(latencies),
+        "connect_calls": stub.calls,
+        "throttled": stub.throttled,
+        "degraded": degraded,
+        "errors": errors,
+        "allocations": {
+            "retained_kib": round((alloc_after - alloc_before) / 1024, 1),
+            "peak_kib": round(alloc_peak / 1024, 1),
+        },
+    }
+
+
+# ─── 基线比较 ────────────────────────────────────────────────────────────────
+
+def compare_with_baseline(results, baseline_path, tolerance):
+    """与基线比较 p95/p99 与导入耗时，超过容忍比例即视为回退，返回回退项列表。"""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("config") != results["config"]:
+        print(f"\n  ⚠ 基线的测试参数与本次不同，比较结果仅供参考: {baseline.get('config')}")
+    checks = [
+        ("warm.latency.p95_ms", results["warm"]["latency"]["p95_ms"],
+         baseline["warm"]["latency"]["p95_ms"]),
+        ("warm.latency.p99_ms", results["warm"]["latency"]["p99_ms"],
+         baseline["warm"]["latency"]["p99_ms"]),
+    ]
+    # 导入耗时受机器负载影响较大，取多次冷启动中的最小值比较
+    if "cold_start" in results and "min_ms" in baseline.get("cold_start", {}).get("import", {}):
+        checks.append(("cold_start.import.min_ms", results["cold_start"]["import"]["min_ms"],
+                       baseline["cold_start"]["import"]["min_ms"]))
+    regressions = []
+    print(f"\n  与基线比较（{os.path.relpath(baseline_path, PROJECT_DIR)}，容忍 {tolerance:.0%}）:")
+    for name, current, previous in checks:
+        delta = (current - previous) / previous if previous else 0.0
+        flag = "⚠" if delta > tolerance else "✓"
+        print(f"    {flag} {name}: {previous:.3f} → {current:.3f} ({delta:+.1%})")
+        if delta > tolerance:
+            regressions.append(name)
+    return regressions
+
+
+def write_results(results, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+        f.write("\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GetAgentNameByAgentId Lambda 基准测试")
+    parser.add_argument("--invocations", type=int, default=2000, help="温调用次数")
+    parser.add_argument("--agents", type=int, default=300, help="座席池大小")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Connect API 注入延迟（毫秒）")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Connect API 限流比例 (0-1)")
+    parser.add_argument("--attributes", default="", help="AgentAttributes 参数，如 Name,RoutingProfile")
+    parser.add_argument("--cold-runs", type=int, default=5, help="冷启动测量次数（0 表示跳过）")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=os.path.join(RESULTS_DIR, "latest.json"))
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="基线结果文件，用于检测回退")
+    parser.add_argument("--no-baseline", action="store_true", help="不与基线比较")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="把本次结果写为基线（确认性能变化符合预期后与代码一并提交）")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="允许的回退比例")
+    args = parser.parse_args()
+
+    parameters = {"AgentAttributes": args.attributes} if args.attributes else {}
+    results = {
+        "python": sys.version.split()[0],
+        "config": {
+            "latency_ms": args.latency_ms,
+            "throttle_rate": args.throttle_rate,
+            "attributes": args.attributes or "Name",
+            "seed": args.seed,
+        },
+    }
+    if args.cold_runs > 0:
+        print(f"  测量冷启动（{args.cold_runs} 个新解释器）...")
+        results["cold_start"] = measure_cold_start(args.cold_runs, args.latency_ms)
+    print(f"  测量温调用（{args.invocations} 次）...")
+    results["warm"] = measure_warm(
+        args.invocations, args.agents, args.latency_ms, args.throttle_rate, parameters, args.seed)
+
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+    write_results(results, args.output)
+    print(f"\n  ✓ 结果已写入 {args.output}")
+
+    if args.update_baseline:
+        write_results(results, args.baseline)
+        print(f"  ✓ 基线已更新: {args.baseline}（请与代码改动一并提交）")
+        return
+    if args.no_baseline:
+        return
+    if not os.path.exists(args.baseline):
+        print(f"  ⚠ 基线文件不存在，未做回退检测: {args.baseline}（可用 --update-baseline 生成）")
+        return
+    regressions = compare_with_baseline(results, args.baseline, args.tolerance)
+    if regressions:
+        print(f"  ✗ 检测到性能回退（超过基线 {args.tolerance:.0%}）: {', '.join(regressions)}")
+        print("    如变化符合预期，请以 --update-baseline 重新生成基线并在评审中说明")
+        sys.exit(1)
+    print("  ✓ 未检测到性能回退")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+import csv
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+from connect_cdk_voice_channel.tenant_config import AGENT_FIELDS, PROJECT_DIR
+
+# 座席批量开通（不经过 CloudFormation）
+#
+# 流式读取座席行（见 catalogs.iter_agent_rows），与实例中已有的用户比对后直接调用 Connect API 创建 / 更新 / 删除：
+# - 所有 API 调用都经过令牌桶限速（默认 2 TPS），线程池并发执行；
+# - 幂等：已存在且内容一致的座席跳过，同名但不一致的座席更新（不修改已有密码）；
+# - 可恢复：成功的行写入 journal，中断后重新运行会跳过已完成的行，全部成功后删除 journal；
+# - 每行结果写入 CSV 报告，单行失败（如密码不符合策略）不影响其它行。
+# 只会删除带有本工具标签且属于当前租户、但已不在 CSV 中的座席。
+
+PROVISIONING_DIR = os.path.join(PROJECT_DIR, ".agent_provisioning")
+PROVISIONED_BY_TAG = "ProvisionedBy"
+PROVISIONED_BY_VALUE = "connect-cdk-voice-channel"
+TENANT_TAG = "Tenant"
+
+DEFAULT_TPS = 2.0
+DEFAULT_WORKERS = 4
+REPORT_FIELDS = ["line", "username", "action", "status", "message"]
+
+
+class RateLimiter:
+    """线程安全的令牌桶，acquire() 在没有令牌时阻塞"""
+
+    def __init__(self, rate, burst=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = float(rate)
+        self.capacity = float(burst or max(1.0, rate))
+        self._tokens = self.capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                delay = (1 - self._tokens) / self.rate
+            self._sleep(delay)
+
+
+class ProvisioningJournal:
+    """记录已成功处理的行（按内容哈希），用于中断后恢复"""
+
+    def __init__(self, path):
+        self.path = path
+        self.done = set()
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        self.done.add(json.loads(line)["key"])
+
+    def record(self, key):
+        with self._lock:
+            self.done.add(key)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"key": key}) + "\n")
+
+    def discard(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def row_hash(row, routing_profile_id, security_profile_ids):
+    payload = json.dumps(
+        [row.get("Username"), row.get("FirstName"), row.get("LastName"), row.get("Email"),
+         row.get("Password"), routing_profile_id, sorted(security_profile_ids)],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def load_existing_users(client, instance_id):
+    """search_users 分页获取实例全部用户：Username → 用户详情"""
+    users = {}
+    paginator = client.get_paginator("search_users")
+    for page in paginator.paginate(InstanceId=instance_id):
+        for user in page.get("Users", []):
+            users[user["Username"]] = user
+    return users
+
+
+def _identity_info(row):
+    info = {"FirstName": row["FirstName"], "LastName": row["LastName"]}
+    if row.get("Email"):
+        info["Email"] = row["Email"]
+    return info
+
+
+def _tags(tenant_name):
+    return {PROVISIONED_BY_TAG: PROVISIONED_BY_VALUE, TENANT_TAG: tenant_name}
+
+
+def _error_message(error):
+    if isinstance(error, ClientError):
+        err = error.response.get("Error", {})
+        return f"{err.get('Code')}: {err.get('Message')}"
+    return str(error)
+
+
+class AgentProvisioner:
+    """按 CSV 批量开通一个租户的座席"""
+
+    def __init__(self, client, instance_id, tenant_name, routing_profile_id, security_profile_ids,
+                 tps=DEFAULT_TPS, workers=DEFAULT_WORKERS, delete_missing=False, dry_run=False):
+        self.client = client
+        self.instance_id = instance_id
+        self.tenant_name = tenant_name
+        self.routing_profile_id = routing_profile_id
+        self.security_profile_ids = list(security_profile_ids)
+        self.limiter = RateLimiter(tps)
+        self.workers = workers
+        self.delete_missing = delete_missing
+        self.dry_run = dry_run
+
+    def _call(self, operation, **kwargs):
+        self.limiter.acquire()
+        return getattr(self.client, operation)(InstanceId=self.instance_id, **kwargs)
+
+    def plan(self, row, existing):
+        """返回 (action, user)：create / update / skip"""
+        user = existing.get(row["Username"])
+        if user is None:
+            return "create", None
+        identity = user.get("IdentityInfo", {})
+        tags = user.get("Tags", {})
+        if (identity.get("FirstName") != row["FirstName"]
+                or identity.get("LastName") != row["LastName"]
+                or (row.get("Email") and identity.get("Email") != row["Email"])
+                or user.get("RoutingProfileId") != self.routing_profile_id
+                or sorted(user.get("SecurityProfileIds", [])) != sorted(self.security_profile_ids)
+                or any(tags.get(k) != v for k, v in _tags(self.tenant_name).items())):
+            return "update", user
+        return "skip", user
+
+    def apply(self, action, row, user):
+        if self.dry_run or action == "skip":
+            return
+        if action == "create":
+            try:
+                self._call(
+                    "create_user",
+                    Username=row["Username"],
+                    Password=row["Password"],
+                    IdentityInfo=_identity_info(row),
+                    PhoneConfig={"PhoneType": "SOFT_PHONE", "AutoAccept": False},
+                    SecurityProfileIds=self.security_profile_ids,
+                    RoutingProfileId=self.routing_profile_id,
+                    Tags=_tags(self.tenant_name),
+                )
+            except ClientError as e:
+                # 上次运行已创建（例如中断在写 journal 之前）：视为成功
+                if e.response.get("Error", {}).get("Code") != "DuplicateResourceException":
+                    raise
+            return
+        if action == "update":
+            user_id = user["Id"]
+            identity = user.get("IdentityInfo", {})
+            if (identity.get("FirstName") != row["FirstName"] or identity.get("LastName") != row["LastName"]
+                    or (row.get("Email") and identity.get("Email") != row["Email"])):
+                self._call("update_user_identity_info", UserId=user_id, IdentityInfo=_identity_info(row))
+            if user.get("RoutingProfileId") != self.routing_profile_id:
+                self._call("update_user_routing_profile", UserId=user_id,
+                           RoutingProfileId=self.routing_profile_id)
+            if sorted(user.get("SecurityProfileIds", [])) != sorted(self.security_profile_ids):
+                self._call("update_user_security_profiles", UserId=user_id,
+                           SecurityProfileIds=self.security_profile_ids)
+            tags = user.get("Tags", {})
+            if any(tags.get(k) != v for k, v in _tags(self.tenant_name).items()):
+                self.limiter.acquire()
+                self.client.tag_resource(resourceArn=user["Arn"], tags=_tags(self.tenant_name))
+            return
+        if action == "delete":
+            self._call("delete_user", UserId=user["Id"])
+
+    def run(self, agent_rows, report_path, journal_path=None, resume=True):
+        """执行开通并写入报告，返回各 action/status 的计数。agent_rows 产出 (行号, 座席行)"""
+        journal = ProvisioningJournal(journal_path) if journal_path else None
+        if journal and not resume:
+            journal.discard()
+            journal = ProvisioningJournal(journal_path)
+
+        existing = load_existing_users(self.client, self.instance_id)
+        counts = {}
+        report_lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(report_path)), exist_ok=True)
+        report_file = open(report_path, "w", encoding="utf-8", newline="")
+        writer = csv.DictWriter(report_file, fieldnames=REPORT_FIELDS)
+        writer.writeheader()
+
+        def report(line, username, action, status, message=""):
+            with report_lock:
+                writer.writerow({"line": line, "username": username, "action": action,
+                                 "status": status, "message": message})
+                key = f"{action}:{status}"
+                counts[key] = counts.get(key, 0) + 1
+
+        def process(line, action, row, user, key):
+            try:
+                self.apply(action, row, user)
+            except (ClientError, BotoCoreError, KeyError) as e:
+                report(line, row["Username"], action, "failed", _error_message(e))
+                return
+            if journal and not self.dry_run:
+                journal.record(key)
+            report(line, row["Username"], action, "dry-run" if self.dry_run else "ok")
+
+        seen = set()
+        pending = set()
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                # 逐行处理，同时在途的任务数受限，避免一次性把大文件全部排队
+                for line, row in agent_rows:
+                    username = row.get("Username")
+                    missing = [k for k in AGENT_FIELDS if not row.get(k)]
+                    if missing:
+                        report(line, username or "", "invalid", "failed", f"missing {', '.join(missing)}")
+                        continue
+                    if username in seen:
+                        report(line, username, "invalid", "failed", "duplicate Username")
+                        continue
+                    seen.add(username)
+                    key = row_hash(row, self.routing_profile_id, self.security_profile_ids)
+                    if journal and key in journal.done:
+                        report(line, username, "resume", "ok", "completed in a previous run")
+                        continue
+                    action, user = self.plan(row, existing)
+                    if action == "skip":
+                        report(line, username, "skip", "ok")
+                        continue
+                    pending.add(executor.submit(process, line, action, row, user, key))
+                    if len(pending) >= self.workers * 4:
+                        _, pending = wait(pending, return_when=FIRST_COMPLETED)
+
+                if self.delete_missing:
+                    for username, user in existing.items():
+                        tags = user.get("Tags", {})
+                        if (username in seen or tags.get(PROVISIONED_BY_TAG) != PROVISIONED_BY_VALUE
+                                or tags.get(TENANT_TAG) != self.tenant_name):
+                            continue
+                        key = f"delete:{username}"
+                        if journal and key in journal.done:
+                            report("", username, "resume", "ok", "deleted in a previous run")
+                            continue
+                        pending.add(executor.submit(process, "", "delete", {"Username": username}, user, key))
+                wait(pending)
+        finally:
+            report_file.close()
+
+        if journal and not self.dry_run and not any(k.endswith(":failed") for k in counts):
+            journal.discard()
+        return counts
+
+
+def default_paths(stack_name):
+    """返回 (报告路径, journal 路径)"""
+    return (os.path.join(PROVISIONING_DIR, f"{stack_name}-report.csv"),
+            os.path.join(PROVISIONING_DIR, f"{stack_name}-journal.jsonl"))
@@ -0,0 +1,181 @@
+import csv
+import json
+import os
+import re
+from functools import lru_cache
+
+from connect_cdk_voice_channel.tenant_config import FLOWS_DIR, PROJECT_DIR
+
+# 共享的示例目录数据（语言、消息、营业时间、座席、流程模板、Lambda 性能配置档）
+#
+# 读取结果按路径缓存在进程内，多个租户共用同一份解析结果。
+# 返回的 dict/list 为共享对象，调用方不得原地修改（需要修改时先复制）。
+
+EXAMPLES_DIR = os.path.join(PROJECT_DIR, "examples")
+AGENTS_CSV = os.path.join(EXAMPLES_DIR, "agents", "agents.csv")
+LANGUAGES_CSV = os.path.join(EXAMPLES_DIR, "languages", "languages_neural.csv")
+HOP_DIR = os.path.join(EXAMPLES_DIR, "hoursofoperation")
+
+IVR_MESSAGES_FILE = os.path.join(FLOWS_DIR, "welcome_message_flow", "ivr_messages.json")
+SURVEY_MESSAGES_FILE = os.path.join(FLOWS_DIR, "survey_message_flow", "survey_messages.json")
+SCREENPOP_TRANSLATIONS_FILE = os.path.join(FLOWS_DIR, "screenpop_message_flow", "screenpop_translations.json")
+LAMBDA_PROFILES_FILE = os.path.join(EXAMPLES_DIR, "lambda", "performance_profiles.json")
+DEFAULT_LAMBDA_PROFILE = "standard"
+
+# 语言名称到区域 key 的映射（用于选取 IVR/Survey 消息和营业时间文件）
+LANGUAGE_REGION_MAP = {
+    "English": "us",
+    "Chinese (Cantonese)": "hk",
+    "Chinese (Mandarin)": "cn",
+    "Chinese": "cn",
+    "German": "de",
+    "Japanese": "jp",
+    "Korean": "ko",
+    "French": "fr",
+    "Spanish": "es",
+    "Arabic": "ar",
+    "Portuguese": "pt",
+    "Italian": "it",
+}
+
+HOP_REGION_MAP = {
+    "us": os.path.join(HOP_DIR, "hours_of_operation_us.json"),
+    "cn": os.path.join(HOP_DIR, "hours_of_operation_hk.json"),
+    "hk": os.path.join(HOP_DIR, "hours_of_operation_hk.json"),
+    "de": os.path.join(HOP_DIR, "hours_of_operation_de.json"),
+    "jp": os.path.join(HOP_DIR, "hours_of_operation_us.json"),
+    "ko": os.path.join(HOP_DIR, "hours_of_operation_us.json"),
+    "fr": os.path.join(HOP_DIR, "hours_of_operation_us.json"),
+    "es": os.path.join(HOP_DIR, "hours_of_operation_us.json"),
+    "ar": os.path.join(HOP_DIR, "hours_of_operation_dubai.json"),
+    "pt": os.path.join(HOP_DIR, "hours_of_operation_us.json"),
+    "it": os.path.join(HOP_DIR, "hours_of_operation_us.json"),
+}
+
+
+@lru_cache(maxsize=None)
+def _load_json_cached(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_catalog(path):
+    """读取 JSON 文件（按绝对路径缓存）"""
+    return _load_json_cached(os.path.abspath(path))
+
+
+@lru_cache(maxsize=None)
+def _load_csv_cached(path):
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        return tuple(csv.DictReader(f))
+
+
+def load_csv_rows(path):
+    """读取 CSV 文件（按绝对路径缓存），返回每行的副本"""
+    return [dict(row) for row in _load_csv_cached(os.path.abspath(path))]
+
+
+def load_languages():
+    """加载语言 CSV，返回 [{LanguageName, LanguageCode, Voice, Gender}, ...]"""
+    return load_csv_rows(LANGUAGES_CSV)
+
+
+def get_ivr_messages(region_key):
+    """从整合的 ivr_messages.json 中按 language key 获取 IVR 消息"""
+    all_msgs = load_catalog(IVR_MESSAGES_FILE)
+    return all_msgs.get(region_key, all_msgs["us"])
+
+
+def get_survey_messages(region_key):
+    """从整合的 survey_messages.json 中按 language key 获取 Survey 消息"""
+    all_msgs = load_catalog(SURVEY_MESSAGES_FILE)
+    return all_msgs.get(region_key, all_msgs["us"])
+
+
+def get_screenpop_translations(region_key):
+    """从 screenpop_translations.json 中按 language key 获取弹屏界面翻译"""
+    all_translations = load_catalog(SCREENPOP_TRANSLATIONS_FILE)
+    return all_translations.get(region_key, all_translations["us"])
+
+
+def get_hours_of_operation(region_key):
+    """按区域 key 获取营业时间配置，缺失时回退到 us"""
+    hop_file = HOP_REGION_MAP.get(region_key, HOP_REGION_MAP["us"])
+    if not os.path.exists(hop_file):
+        hop_file = HOP_REGION_MAP["us"]
+    return load_catalog(hop_file)
+
+
+def load_flow_template(path):
+    """读取联系流模板（共享对象，渲染引擎不会修改它）"""
+    return load_catalog(path)
+
+
+def resolve_region_key(language_name):
+    """语言名称 → 区域 key，优先匹配更具体的名称（如 "Chinese (Mandarin)" 优先于 "Chinese"）"""
+    region_key = "us"  # 默认
+    best_match_len = 0
+    for key, value in LANGUAGE_REGION_MAP.items():
+        if key.lower() in language_name.lower() and len(key) > best_match_len:
+            region_key = value
+            best_match_len = len(key)
+    return region_key
+
+
+def get_default_voice(language_name):
+    """返回该语言在 languages_neural.csv 中的第一个 Neural 语音（去掉 * 号），不存在时返回 None"""
+    for row in load_languages():
+        if row["LanguageName"].strip() == language_name:
+            return row["Voice"].replace("*", "").strip()
+    return None
+
+
+def sanitize_username_token(name):
+    """将租户名转换为合法的用户名片段（Connect Username 允许 [A-Za-z0-9_@.-]）。"""
+    token = re.sub(r"[^A-Za-z0-9_@.\-]", "", name.replace(" ", ""))
+    return token or "Tenant"
+
+
+def sanitize_stack_name(name):
+    """将任意名称转换为合法的 CDK Stack 名称。
+    规则: /^[A-Za-z][A-Za-z0-9-]*$/
+    尽量保持与原始名称接近。
+    """
+    sanitized = name.replace("_", "-").replace(" ", "-")
+    sanitized = re.sub(r"[^A-Za-z0-9-]", "", sanitized)
+    sanitized = re.sub(r"-{2,}", "-", sanitized)
+    sanitized = sanitized.strip("-")
+    # 数字开头时加最小前缀 "S"
+    if sanitized and not sanitized[0].isalpha():
+        sanitized = "S" + sanitized
+    return sanitized if sanitized else "MyTenant"
+
+
+def _apply_tenant_to_agent(row, tenant_name, username_token):
+    if row.get("LastName"):
+        row["LastName"] = row["LastName"].replace("Test", tenant_name)
+    if row.get("Username"):
+        row["Username"] = row["Username"].replace("Test", username_token)
+    return row
+
+
+def load_agents(tenant_name, agents_csv=AGENTS_CSV):
+    """读取座席 CSV，并将 LastName / Username 中的 'Test' 替换为租户名。
+
+    这样不同租户或多次部署之间座席用户名不会重复（Connect 实例内用户名必须唯一），
+    避免创建座席时因重名而失败。返回处理后的座席行列表（写入租户配置）。
+    """
+    if not os.path.exists(agents_csv):
+        return []
+
+    username_token = sanitize_username_token(tenant_name)
+    return [_apply_tenant_to_agent(row, tenant_name, username_token) for row in load_csv_rows(agents_csv)]
+
+
+def iter_agent_rows(agents_csv, tenant_name):
+    """逐行读取座席 CSV（不缓存，适合大文件），产出 (行号, 替换租户名后的座席行)"""
+    username_token = sanitize_username_token(tenant_name)
+    with open(agents_csv, "r", encoding="utf-8", newline="") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            yield reader.line_num, _apply_tenant_to_agent(row, tenant_name, username_token)
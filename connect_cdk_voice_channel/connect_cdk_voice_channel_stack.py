@@ -1,277 +1,201 @@
-from aws_cdk import Stack
+from aws_cdk import Stack, Duration, RemovalPolicy, CfnCondition, CfnMapping, CfnParameter, Fn, Token
 from constructs import Construct
 from aws_cdk import aws_connect as connect
 from aws_cdk import aws_lambda as _lambda
 from aws_cdk import aws_iam as iam
+from aws_cdk import aws_events as events
+from aws_cdk import aws_events_targets as targets
+from aws_cdk import aws_dynamodb as dynamodb
+import copy
 import os
-import csv
-import json
-import shutil
+from types import SimpleNamespace
+
+from connect_cdk_voice_channel.catalogs import (
+    DEFAULT_LAMBDA_PROFILE, LAMBDA_PROFILES_FILE, load_catalog, load_flow_template)
+from connect_cdk_voice_channel.flow_template import render_flow_content
+from connect_cdk_voice_channel.parameterized import (
+    IVR_MESSAGE_PARAMETERS,
+    SURVEY_MESSAGE_PARAMETERS,
+    SURVEY_RESULT_DEFAULTS,
+    SURVEY_RESULT_PARAMETERS,
+    TENANT_NAME_MAX_LENGTH,
+    TENANT_NAME_PATTERN,
+    hours_of_operation_variants,
+    screenpop_translation_keys,
+    translation_parameter,
+)
+from connect_cdk_voice_channel.tenant_config import (
+    PROJECT_DIR, SCREENPOP_FLOW_TEMPLATE, SURVEY_FLOW_TEMPLATE, agent_logical_id, select_inbound_flow_template)
 
 # 工具函数
 
 
-def str_to_bool(value):
-    """将配置文件中的字符串（"True"/"False"）安全地转换为布尔值。
+def load_lambda_performance_profile(profile_name):
+    """从 examples/lambda/performance_profiles.json 读取 Lambda 性能配置档。
 
-    替代直接使用 eval()，避免执行任意代码并对异常输入更健壮。
+    SnapStart 与预置并发不能同时作用于同一个函数版本，预置并发也不能超过预留并发，
+    因此这里在 synth 时提前校验，而不是等到部署时才失败。
     """
-    return str(value).strip().lower() in ("true", "1", "yes")
-
-
-def copy_file(source, destination):
-    """复制文件的通用函数"""
-    if not os.path.exists(destination):
-        shutil.copyfile(source, destination)
-
-
-def load_json_file(file_path):
-    """加载JSON文件的通用函数"""
-    with open(file_path, 'r', encoding='utf-8') as f:
-        return json.load(f)
-
-
-def create_inbound_flow(tab1_button, tab2_button, tab3_button):
-    """创建入站流程文件"""
-
-    # 根据选择的功能复制相应的流程文件
-    flow_configs = [
-        (tab1_button and tab2_button and tab3_button,
-         'examples/flows/ivr_survey_screenpop_flow.json', 'inbound_flow.json'),
-        (tab1_button and tab2_button,
-         'examples/flows/ivr_survey_flow.json', 'inbound_flow.json'),
-        (tab1_button and tab3_button,
-         'examples/flows/ivr_screenpop_flow.json', 'inbound_flow.json'),
-        (tab1_button, 'examples/flows/welcome_message_flow/welcome_message_flow.json',
-         'inbound_flow.json')
-    ]
-
-    additional_files = [
-        (tab2_button,
-         'examples/flows/survey_message_flow/survey_message_flow.json', 'survey_message_flow.json'),
-        (tab3_button, 'examples/flows/screenpop_message_flow/screenpop_message_flow.json',
-         'screenpop_message_flow.json')
-    ]
-
-    # 复制主流程文件
-    for condition, source, dest in flow_configs:
-        if condition:
-            copy_file(source, dest)
-            break
-
-    # 复制附加文件
-    for condition, source, dest in additional_files:
-        if condition:
-            copy_file(source, dest)
-
-
-def get_config_value(file_path, key, default=''):
-    """从配置文件获取值的通用函数"""
-    if os.path.exists(file_path):
-        json_data = load_json_file(file_path)
-        return json_data.get(key, default)
-    return default
-
-
-def load_flows():
-    """根据环境配置准备入站流程文件"""
-    os_data = load_json_file('environment_config.json')
-
-    create_inbound_flow(
-        True, str_to_bool(os_data['deploy_survey_flow']), str_to_bool(os_data['deploy_screen_flow']))
+    profiles = load_catalog(LAMBDA_PROFILES_FILE)
+    if profile_name not in profiles:
+        raise ValueError(
+            f"Unknown lambda performance profile '{profile_name}', "
+            f"expected one of: {', '.join(profiles)}")
+    profile = profiles[profile_name]
+    if profile.get('snapStart') and profile.get('provisionedConcurrency'):
+        raise ValueError(
+            f"Lambda performance profile '{profile_name}' cannot enable both "
+            "SnapStart and provisioned concurrency")
+    reserved = profile.get('reservedConcurrency')
+    provisioned = profile.get('provisionedConcurrency') or 0
+    if reserved is not None and provisioned > reserved:
+        raise ValueError(
+            f"Lambda performance profile '{profile_name}' provisions {provisioned} "
+            f"concurrent executions but only reserves {reserved}")
+    return profile
 
 
 def get_arn_prefix(arn):
+    # 参数化模板中实例 ARN 是参数，只能在部署时由 CloudFormation 截取前四段
+    if Token.is_unresolved(arn):
+        parts = Fn.split(':', arn, 6)
+        return Fn.join(':', [Fn.select(i, parts) for i in range(4)])
     return arn.rsplit(':', 2)[0]
 
 
-def create_screenpop_contact_flow(self, file_path, output_file, flow_name, description, connect_instance_arn, get_agent_name_lambda_arn=None):
-    """创建联系流程的通用函数"""
-    if os.path.exists(file_path):
-        flow_data = load_json_file(file_path)
-
-        # 注入弹屏翻译到 UpdateContactAttributes (System attributes) action
-        if os.path.exists('screenpop_translations.json'):
-            translations = load_json_file('screenpop_translations.json')
-            for action in flow_data.get('Actions', []):
-                if action.get('Identifier') == 'System attributes' and action.get('Type') == 'UpdateContactAttributes':
-                    action['Parameters']['Attributes'].update(translations)
-                    break
-
-        flow_content = json.dumps(flow_data)
-
-        # 替换消息内容
-        replacements = {
-            "arn_prefix": get_arn_prefix(connect_instance_arn),
-            "contact_queue_name": f"{os.environ['tenant_name']} Queue",
-            # 弹屏中显示的语言使用部署时（deploy_cli.py）选择的语言，
-            # 而不是未被赋值的 $.LanguageCode 系统属性。
-            "screenpop_language": os.environ.get("selected_language", "")
-        }
-
-        # 替换 GetAgentNameByAgentId Lambda 的 ARN 占位符与显示名称。
-        # 实际部署的 Lambda 名称为 {tenant_name}-GetAgentNameByAgentId，
-        # 因此流程中必须引用带租户前缀的真实 ARN 与名称，否则调用会失败。
-        if get_agent_name_lambda_arn is not None:
-            replacements["get_agent_name_lambda_arn"] = get_agent_name_lambda_arn
-            replacements['"displayName": "GetAgentNameByAgentId"'] = \
-                f'"displayName": "{os.environ["tenant_name"]}-GetAgentNameByAgentId"'
-
-        for old_text, new_text in replacements.items():
-            flow_content = flow_content.replace(old_text, new_text)
-
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(flow_content)
-
-        return connect.CfnContactFlow(
-            self,
-            f"CfnContactFlow{flow_name}",
-            content=flow_content,
-            instance_arn=connect_instance_arn,
-            description=description,
-            name=f"{os.environ['tenant_name']} {flow_name}",
-            type="CONTACT_FLOW"
-        )
-    return None
-
-
-def create_survey_contact_flow(self, connect_instance_arn):
+def create_screenpop_contact_flow(self, config, flow_name, description, get_agent_name_lambda_arn=None):
+    """创建弹屏联系流程"""
+    if not config.enable_screenpop:
+        return None
+
+    flow_data = load_flow_template(SCREENPOP_FLOW_TEMPLATE)
+
+    # 注入弹屏翻译到 UpdateContactAttributes (System attributes) action。
+    # 模板在多个租户之间共享，注入前先复制。
+    if config.screenpop_translations:
+        flow_data = copy.deepcopy(flow_data)
+        for action in flow_data.get('Actions', []):
+            if action.get('Identifier') == 'System attributes' and action.get('Type') == 'UpdateContactAttributes':
+                action['Parameters']['Attributes'].update(config.screenpop_translations)
+                break
+
+    # 替换消息内容
+    fragments = {
+        "arn_prefix": get_arn_prefix(config.connect_instance_arn),
+        "contact_queue_name": f"{config.tenant_name} Queue",
+        # 弹屏中显示的语言使用部署时（deploy_cli.py）选择的语言，
+        # 而不是未被赋值的 $.LanguageCode 系统属性。
+        "screenpop_language": config.selected_language,
+        "get_agent_name_lambda_arn": None,
+    }
+    scoped = {}
+
+    # 替换 GetAgentNameByAgentId Lambda 的 ARN 占位符与显示名称。
+    # 实际部署的 Lambda 名称为 {tenant_name}-GetAgentNameByAgentId，
+    # 因此流程中必须引用带租户前缀的真实 ARN 与名称，否则调用会失败。
+    # 显示名称只替换 displayName 字段，流程中其它位置的同名文本保持不变。
+    if get_agent_name_lambda_arn is not None:
+        fragments["get_agent_name_lambda_arn"] = get_agent_name_lambda_arn
+        scoped["displayName"] = {
+            "GetAgentNameByAgentId": f"{config.tenant_name}-GetAgentNameByAgentId"}
+
+    flow_content = render_flow_content(flow_data, fragments, name=flow_name, scoped=scoped)
+
+    return connect.CfnContactFlow(
+        self,
+        f"CfnContactFlow{flow_name}",
+        content=flow_content,
+        instance_arn=config.connect_instance_arn,
+        description=description,
+        name=f"{config.tenant_name} {flow_name}",
+        type="CONTACT_FLOW"
+    )
+
+
+def create_survey_contact_flow(self, config):
     """创建调查联系流程"""
-    if os.path.exists('survey_message.json') and os.path.exists('survey_message_flow.json'):
-        message_data = load_json_file('survey_message.json')
-        os.environ["survey_message"] = message_data['surveyMessage']
-        os.environ["survey_message_feedback"] = message_data['surveyMessageFeedback']
-
-        flow_data = load_json_file('survey_message_flow.json')
-        flow_content = json.dumps(flow_data)
-
-        # 满意度评分的本地化文案（写入 AgentSurveyResult 属性，供主管在 admin 页面搜索）。
-        # 若缺失则回退到英文默认值，保证流程占位符一定被替换掉。
-        results = message_data.get('results', {})
-
-        # 替换消息内容
-        replacements = {
-            "Joanna": os.environ["tts_voice"],
-            "survey_message": os.environ["survey_message"],
-            "survey_feedback": os.environ["survey_message_feedback"],
-            "survey_result_1": results.get("1", "VerySatisfied"),
-            "survey_result_2": results.get("2", "Satisfied"),
-            "survey_result_3": results.get("3", "Unsatisfied"),
-            "survey_result_na": results.get("-1", "N/A"),
-        }
+    if not config.enable_survey:
+        return None
+
+    message_data = config.survey_messages
+    flow_data = load_flow_template(SURVEY_FLOW_TEMPLATE)
+
+    # 满意度评分的本地化文案（写入 AgentSurveyResult 属性，供主管在 admin 页面搜索）。
+    # 若缺失则回退到英文默认值，保证流程占位符一定被替换掉。
+    results = message_data.get('results', {})
+
+    # 替换消息内容
+    fragments = {
+        "survey_message": message_data['surveyMessage'],
+        "survey_feedback": message_data['surveyMessageFeedback'],
+        "survey_result_1": results.get("1", SURVEY_RESULT_DEFAULTS["1"]),
+        "survey_result_2": results.get("2", SURVEY_RESULT_DEFAULTS["2"]),
+        "survey_result_3": results.get("3", SURVEY_RESULT_DEFAULTS["3"]),
+        "survey_result_na": results.get("-1", SURVEY_RESULT_DEFAULTS["-1"]),
+    }
+    exact = {"Joanna": config.tts_voice}
 
-        for old_text, new_text in replacements.items():
-            flow_content = flow_content.replace(old_text, new_text)
+    flow_content = render_flow_content(flow_data, fragments, exact, name="Survey Flow")
 
-        with open('connect_flow_survey_updated.json', 'w', encoding='utf-8') as f:
-            f.write(flow_content)
-
-        return connect.CfnContactFlow(
-            self,
-            "CfnContactFlowSurvey",
-            content=flow_content,
-            instance_arn=connect_instance_arn,
-            description="Survey flow created using cfn",
-            name=f"{os.environ['tenant_name']} Survey Flow",
-            type="CONTACT_FLOW"
-        )
-    return None
+    return connect.CfnContactFlow(
+        self,
+        "CfnContactFlowSurvey",
+        content=flow_content,
+        instance_arn=config.connect_instance_arn,
+        description="Survey flow created using cfn",
+        name=f"{config.tenant_name} Survey Flow",
+        type="CONTACT_FLOW"
+    )
 
 
-def create_ivr_contact_flow(cfn_queue, cfn_contact_flow_screenpop=None, cfn_contact_flow_survey=None):
+def create_ivr_contact_flow(config, cfn_queue, cfn_contact_flow_screenpop=None, cfn_contact_flow_survey=None):
     """创建IVR联系流程"""
-    flow_data = load_json_file('inbound_flow.json')
-    flow_content = json.dumps(flow_data)
+    flow_data = load_flow_template(config.inbound_flow_template)
 
     # 基本替换
-    basic_replacements = {
-        "contact_queue_name": f"{os.environ['tenant_name']} Queue",
-        "contact_name": os.environ["tenant_name"],
-        "Joanna": os.environ["tts_voice"],
-        "welcome-message": os.environ["ivr_welcome_message"],
-        "open-hour-message": os.environ["ivr_open_hour_message"],
-        "error-message": os.environ["ivr_error_message"],
-        "queue-arn": cfn_queue.attr_queue_arn
+    fragments = {
+        "contact_queue_name": f"{config.tenant_name} Queue",
+        "contact_name": config.tenant_name,
+        "welcome-message": config.ivr_messages["welcomeMessage"],
+        "open-hour-message": config.ivr_messages["openHourMessage"],
+        "error-message": config.ivr_messages["errorMessage"],
+        "queue-arn": cfn_queue.attr_queue_arn,
+        # 条件替换：对应流程未创建时保持为 None，模板中若仍引用会被报告为未替换
+        "contact_screenpop_flow_name": None,
+        "contact_screenpop_flow_id": None,
+        "contact_survey_flow_name": None,
+        "contact_survey_flow_id": None,
     }
+    exact = {"Joanna": config.tts_voice}
 
-    # 执行基本替换
-    for old_text, new_text in basic_replacements.items():
-        flow_content = flow_content.replace(old_text, new_text)
-
-    # 条件替换
-    if cfn_contact_flow_screenpop and os.path.exists('screenpop_message_flow.json'):
-        screenpop_replacements = {
-            "contact_screenpop_flow_name": cfn_contact_flow_screenpop.name,
-            "contact_screenpop_flow_id": cfn_contact_flow_screenpop.attr_contact_flow_arn
-        }
-        for old_text, new_text in screenpop_replacements.items():
-            flow_content = flow_content.replace(old_text, new_text)
-
-    if cfn_contact_flow_survey and os.path.exists('survey_message.json'):
-        survey_replacements = {
-            "contact_survey_flow_name": cfn_contact_flow_survey.name,
-            "contact_survey_flow_id": cfn_contact_flow_survey.attr_contact_flow_arn
-        }
-        for old_text, new_text in survey_replacements.items():
-            flow_content = flow_content.replace(old_text, new_text)
-
-    with open('inbound_flow_updated.json', 'w', encoding='utf-8') as f:
-        f.write(flow_content)
-
-    return flow_content
-
-
-class ConnectCdkVoiceChannelStack(Stack):
-
-    def __init__(self, scope: Construct, construct_id: str, **kwargs) -> None:
-        super().__init__(scope, construct_id, **kwargs)
-
-        try:
-            # 初始化配置
-            config = self._initialize_config()
-
-            # 创建 Lambda 函数（GetAgentNameByAgentId），使用源码目录直接部署
-            agent_name_lambda = self._create_get_agent_name_lambda(config)
-
-            # 创建核心资源
-            hours_of_operation = self._create_hours_of_operation(config)
-            queue = self._create_queue(config, hours_of_operation)
-
-            # 创建联系流程
-            contact_flows = self._create_contact_flows(config, agent_name_lambda)
-            ivr_flow = self._create_ivr_flow(config, queue, contact_flows)
-
-            # 创建路由配置文件
-            routing_profile = self._create_routing_profile(config, queue)
-
-            # 创建代理用户
-            self._create_agents(config, routing_profile)
+    if cfn_contact_flow_screenpop:
+        fragments["contact_screenpop_flow_name"] = cfn_contact_flow_screenpop.name
+        fragments["contact_screenpop_flow_id"] = cfn_contact_flow_screenpop.attr_contact_flow_arn
 
-        except Exception as e:
-            print(f"Error initializing ConnectCdkVoiceChannelStack: {e}")
-            raise
+    if cfn_contact_flow_survey:
+        fragments["contact_survey_flow_name"] = cfn_contact_flow_survey.name
+        fragments["contact_survey_flow_id"] = cfn_contact_flow_survey.attr_contact_flow_arn
 
-    def _initialize_config(self):
-        """初始化配置参数"""
-        config = {
-            'connect_instance_arn': get_config_value('connect.json', 'Arn'),
-            'security_profile_arn': get_config_value('security_profile.json', 'Arn'),
-            'tenant_name': os.environ.get('tenant_name', 'DefaultTenant')
-        }
+    return render_flow_content(flow_data, fragments, exact, name="Inbound Flow")
 
-        if not config['connect_instance_arn']:
-            raise ValueError("Connect instance ARN not found in configuration")
 
-        load_flows()
-        return config
+class TenantResources:
+    """租户资源的构建方法，由单体 Stack 与分层布局的各个 Stack 共用（self 为所在的 Stack）"""
 
     def _create_get_agent_name_lambda(self, config):
         """创建 GetAgentNameByAgentId Lambda 函数。
 
         不再从预打包的 zip 文件导入，而是直接引用 lambda/GetAgentNameByAgentId/
         源码目录，由 CDK 在 synth 阶段自动打包部署（等价于源码直接创建）。
+
+        当性能配置档启用 SnapStart 或预置并发时，会发布版本并创建 live 别名，
+        返回该别名，联系流与 Connect 实例关联均引用别名 ARN。
         """
-        # Lambda 执行角色，授予调用 Connect describe_user 的权限
+        # GetAgentNameByAgentId 的性能配置档（架构 / 内存 / SnapStart / 并发）
+        profile = load_lambda_performance_profile(config.lambda_performance_profile)
+
+        # Lambda 执行角色，授予调用 Connect describe_user 的权限；批量解析还会查询
+        # 座席的路由配置与层级组名称
         lambda_role = iam.Role(
             self, "GetAgentNameLambdaRole",
             assumed_by=iam.ServicePrincipal("lambda.amazonaws.com"),
@@ -283,43 +207,121 @@ class ConnectCdkVoiceChannelStack(Stack):
         lambda_role.add_to_policy(
             iam.PolicyStatement(
                 effect=iam.Effect.ALLOW,
-                actions=["connect:DescribeUser"],
+                actions=["connect:DescribeUser", "connect:DescribeRoutingProfile",
+                         "connect:DescribeUserHierarchyGroup"],
                 resources=["*"]
             )
         )
 
-        lambda_source_dir = os.path.join(
-            os.path.dirname(__file__), "..", "lambda", "GetAgentNameByAgentId")
+        if config.agent_directory_preload:
+            lambda_role.add_to_policy(
+                iam.PolicyStatement(
+                    effect=iam.Effect.ALLOW,
+                    actions=["connect:ListUsers", "connect:SearchUsers"],
+                    resources=["*"]
+                )
+            )
+
+        environment = {
+            "AGENT_NAME_CACHE_TTL": "300",
+            "AGENT_NAME_CACHE_NEGATIVE_TTL": "60",
+            "AGENT_NAME_CACHE_MAX_SIZE": "1000",
+            # 每次调用输出 CloudWatch 嵌入式指标格式（EMF）日志
+            "METRICS_ENABLED": "true",
+            "METRICS_NAMESPACE": "ConnectVoiceChannel/GetAgentName",
+            # Connect 客户端（adaptive 重试 + 短超时）与降级模式：
+            # 截止时间 2s < Lambda 超时 3s < 联系流 InvocationTimeLimitSeconds 8s
+            "CONNECT_MAX_ATTEMPTS": "3",
+            "CONNECT_CONNECT_TIMEOUT": "1",
+            "CONNECT_READ_TIMEOUT": "1",
+            "AGENT_NAME_DEADLINE_MS": "2000",
+            "AGENT_NAME_FALLBACK": "",
+            # 批量解析（AgentIds / AgentAttributes 参数）的并发度与座席数量上限
+            "BATCH_MAX_CONCURRENCY": "4",
+            "BATCH_MAX_AGENTS": "10"
+        }
+        if config.agent_directory_preload:
+            environment.update({
+                "AGENT_DIRECTORY_PRELOAD": "true",
+                "AGENT_DIRECTORY_INSTANCE_ID": config.connect_instance_id,
+                "AGENT_DIRECTORY_REFRESH_INTERVAL": "300"
+            })
+
+        # 跨容器共享缓存表：分区键 CacheKey，ExpiresAt 为 TTL 属性，按需计费
+        shared_cache_table = None
+        if config.agent_name_shared_cache:
+            shared_cache_table = dynamodb.Table(
+                self, "AgentNameCacheTable",
+                partition_key=dynamodb.Attribute(
+                    name="CacheKey", type=dynamodb.AttributeType.STRING),
+                billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+                time_to_live_attribute="ExpiresAt",
+                removal_policy=RemovalPolicy.DESTROY
+            )
+            environment.update({
+                "AGENT_NAME_SHARED_CACHE_BACKEND": "dynamodb",
+                "AGENT_NAME_SHARED_CACHE_TABLE": shared_cache_table.table_name
+            })
+
+        lambda_source_dir = os.path.join(PROJECT_DIR, "lambda", "GetAgentNameByAgentId")
 
         agent_name_fn = _lambda.Function(
             self, "GetAgentNameByAgentId",
-            function_name=f"{config['tenant_name']}-GetAgentNameByAgentId",
+            function_name=f"{config.tenant_name}-GetAgentNameByAgentId",
             runtime=_lambda.Runtime.PYTHON_3_13,
             handler="lambda_function.lambda_handler",
             code=_lambda.Code.from_asset(lambda_source_dir),
             role=lambda_role,
-            description="Resolve agent full name by agent id for Amazon Connect flows"
+            timeout=Duration.seconds(3),
+            architecture=(_lambda.Architecture.ARM_64 if profile['architecture'] == 'arm64'
+                          else _lambda.Architecture.X86_64),
+            memory_size=profile['memorySize'],
+            snap_start=(_lambda.SnapStartConf.ON_PUBLISHED_VERSIONS if profile.get('snapStart')
+                        else None),
+            reserved_concurrent_executions=profile.get('reservedConcurrency'),
+            description="Resolve agent full name by agent id for Amazon Connect flows",
+            # 容器内座席姓名缓存（TTL / 负缓存 TTL / LRU 最大条目数）、座席目录预加载
+            # 与共享缓存表配置
+            environment=environment
         )
+        if shared_cache_table is not None:
+            shared_cache_table.grant_read_write_data(agent_name_fn)
         agent_name_fn.grant_invoke(
             iam.ServicePrincipal("connect.amazonaws.com"))
 
+        # SnapStart 只对已发布版本生效，预置并发需要配置在版本/别名上
+        invoke_target = agent_name_fn
+        if profile.get('snapStart') or profile.get('provisionedConcurrency'):
+            invoke_target = _lambda.Alias(
+                self, "GetAgentNameLiveAlias",
+                alias_name="live",
+                version=agent_name_fn.current_version,
+                provisioned_concurrent_executions=profile.get('provisionedConcurrency') or None
+            )
+            invoke_target.grant_invoke(
+                iam.ServicePrincipal("connect.amazonaws.com"))
+
+        # 定时触发座席目录的增量刷新（同时保持至少一个容器处于温状态）
+        if config.agent_directory_preload:
+            events.Rule(
+                self, "AgentDirectoryRefreshSchedule",
+                schedule=events.Schedule.rate(Duration.minutes(5)),
+                targets=[targets.LambdaFunction(invoke_target)]
+            )
+
         # 关联到 Amazon Connect 实例，使联系流可以调用该 Lambda
         connect.CfnIntegrationAssociation(
             self, "GetAgentNameLambdaAssociation",
-            instance_id=config['connect_instance_arn'],
+            instance_id=config.connect_instance_arn,
             integration_type="LAMBDA_FUNCTION",
-            integration_arn=agent_name_fn.function_arn
+            integration_arn=invoke_target.function_arn
         )
 
-        return agent_name_fn
+        return invoke_target
 
     def _create_hours_of_operation(self, config):
         """创建营业时间配置"""
-        if not os.path.exists('hours_of_operation.json'):
-            copy_file('examples/hoursofoperation/hours_of_operation_hk.json',
-                      'hours_of_operation.json')
-
-        hop_data = load_json_file('hours_of_operation.json')
+        hop_data = config.hours_of_operation
 
         hop_props = [
             connect.CfnHoursOfOperation.HoursOfOperationConfigProperty(
@@ -336,8 +338,8 @@ class ConnectCdkVoiceChannelStack(Stack):
         return connect.CfnHoursOfOperation(
             self, "CfnHoursOfOperation",
             config=hop_props,
-            instance_arn=config['connect_instance_arn'],
-            name=f"{config['tenant_name']} {hop_data['name']}",
+            instance_arn=config.connect_instance_arn,
+            name=f"{config.tenant_name} {hop_data['name']}",
             time_zone=hop_data['timeZone'],
             description=hop_data['description']
         )
@@ -347,9 +349,9 @@ class ConnectCdkVoiceChannelStack(Stack):
         return connect.CfnQueue(
             self, "CfnQueue",
             hours_of_operation_arn=hours_of_operation.attr_hours_of_operation_arn,
-            instance_arn=config['connect_instance_arn'],
+            instance_arn=config.connect_instance_arn,
             description="Queue created using cfn",
-            name=f"{config['tenant_name']} Queue"
+            name=f"{config.tenant_name} Queue"
         )
 
     def _create_contact_flows(self, config, agent_name_lambda=None):
@@ -358,39 +360,27 @@ class ConnectCdkVoiceChannelStack(Stack):
 
         # ScreenPop流程
         flows['screenpop'] = create_screenpop_contact_flow(
-            self, 'screenpop_message_flow.json', 'connect_flow_screenpop_updated.json',
-            'ScreenPop Flow', 'ScreenPop flow created using cfn',
-            config['connect_instance_arn'],
+            self, config, 'ScreenPop Flow', 'ScreenPop flow created using cfn',
             agent_name_lambda.function_arn if agent_name_lambda is not None else None
         )
 
         # Survey流程
-        flows['survey'] = create_survey_contact_flow(
-            self, config['connect_instance_arn']
-        )
+        flows['survey'] = create_survey_contact_flow(self, config)
 
         return flows
 
     def _create_ivr_flow(self, config, queue, contact_flows):
         """创建IVR流程"""
-        # 加载IVR消息
-        if os.path.exists('ivr_messages.json'):
-            message_data = load_json_file('ivr_messages.json')
-            for key, env_key in [('welcomeMessage', 'ivr_welcome_message'),
-                                 ('openHourMessage', 'ivr_open_hour_message'),
-                                 ('errorMessage', 'ivr_error_message')]:
-                os.environ[env_key] = message_data.get(key, '')
-
         flow_content = create_ivr_contact_flow(
-            queue, contact_flows.get('screenpop'), contact_flows.get('survey')
+            config, queue, contact_flows.get('screenpop'), contact_flows.get('survey')
         )
 
         return connect.CfnContactFlow(
             self, "CfnContactFlowIVR",
             content=flow_content,
-            instance_arn=config['connect_instance_arn'],
+            instance_arn=config.connect_instance_arn,
             description="IVR flow created using cfn",
-            name=f"{config['tenant_name']} Inbound Flow",
+            name=f"{config.tenant_name} Inbound Flow",
             type="CONTACT_FLOW"
         )
 
@@ -400,7 +390,7 @@ class ConnectCdkVoiceChannelStack(Stack):
             self, "CfnRoutingProfile",
             default_outbound_queue_arn=queue.attr_queue_arn,
             description="Routing profile created using cfn",
-            instance_arn=config['connect_instance_arn'],
+            instance_arn=config.connect_instance_arn,
             media_concurrencies=[
                 connect.CfnRoutingProfile.MediaConcurrencyProperty(
                     channel="VOICE", concurrency=1),
@@ -413,31 +403,228 @@ class ConnectCdkVoiceChannelStack(Stack):
                     channel="VOICE", queue_arn=queue.attr_queue_arn
                 )
             )],
-            name=f"{config['tenant_name']} Routing Profile"
+            name=f"{config.tenant_name} Routing Profile"
         )
 
-    def _create_agents(self, config, routing_profile):
-        """创建代理用户"""
-        if not os.path.exists("agents.csv"):
-            return
+    def _create_agents(self, config, routing_profile_arn, agents=None):
+        """创建代理用户。agents 为分片中的座席行（默认为全部由 CloudFormation 管理的座席）
+
+        旧版本按行序号命名（CfnUser<n>）的已部署座席沿用原逻辑 ID，避免被删除重建；
+        同一 Stack 中该逻辑 ID 已被占用时（座席在分片之间移动）改用由用户名派生的逻辑 ID。
+        """
+        agents = config.stack_agents if agents is None else agents
+        used_ids = set()
+        for row in agents:
+            logical_id = config.legacy_agent_ids.get(row["Username"])
+            if logical_id is None or logical_id in used_ids:
+                logical_id = agent_logical_id(row["Username"])
+            used_ids.add(logical_id)
+            connect.CfnUser(
+                self, logical_id,
+                instance_arn=config.connect_instance_arn,
+                phone_config=connect.CfnUser.UserPhoneConfigProperty(
+                    phone_type="SOFT_PHONE", auto_accept=False
+                ),
+                routing_profile_arn=routing_profile_arn,
+                security_profile_arns=[config.security_profile_arn],
+                username=row["Username"],
+                identity_info=connect.CfnUser.UserIdentityInfoProperty(
+                    first_name=row["FirstName"], last_name=row["LastName"]
+                ),
+                password=row["Password"]
+            )
+
+
+class ConnectCdkVoiceChannelStack(TenantResources, Stack):
+    """单体布局：一个租户的全部资源在同一个 Stack 中"""
+
+    def __init__(self, scope: Construct, construct_id: str, tenant_config, **kwargs) -> None:
+        super().__init__(scope, construct_id, **kwargs)
 
         try:
-            with open("agents.csv", "r", encoding="utf-8", newline="") as f:
-                reader = csv.DictReader(f)
-                for index, row in enumerate(reader):
-                    connect.CfnUser(
-                        self, f"CfnUser{index}",
-                        instance_arn=config['connect_instance_arn'],
-                        phone_config=connect.CfnUser.UserPhoneConfigProperty(
-                            phone_type="SOFT_PHONE", auto_accept=False
-                        ),
-                        routing_profile_arn=routing_profile.attr_routing_profile_arn,
-                        security_profile_arns=[config['security_profile_arn']],
-                        username=row["Username"],
-                        identity_info=connect.CfnUser.UserIdentityInfoProperty(
-                            first_name=row["FirstName"], last_name=row["LastName"]
-                        ),
-                        password=row["Password"]
-                    )
+            # 租户配置（由 deploy_cli.py 构建并校验，app.py 传入）
+            config = tenant_config.validate()
+
+            # 创建 Lambda 函数（GetAgentNameByAgentId），使用源码目录直接部署
+            agent_name_lambda = self._create_get_agent_name_lambda(config)
+
+            # 创建核心资源
+            hours_of_operation = self._create_hours_of_operation(config)
+            queue = self._create_queue(config, hours_of_operation)
+
+            # 创建联系流程
+            contact_flows = self._create_contact_flows(config, agent_name_lambda)
+            ivr_flow = self._create_ivr_flow(config, queue, contact_flows)
+
+            # 创建路由配置文件
+            routing_profile = self._create_routing_profile(config, queue)
+
+            # 创建代理用户
+            self._create_agents(config, routing_profile.attr_routing_profile_arn)
+
         except Exception as e:
-            print(f"Error creating agents: {e}")
+            print(f"Error initializing ConnectCdkVoiceChannelStack: {e}")
+            raise
+
+
+class ConnectCoreStack(TenantResources, Stack):
+    """分层布局的核心 Stack：Lambda、营业时间、队列、路由配置"""
+
+    def __init__(self, scope: Construct, construct_id: str, tenant_config, **kwargs) -> None:
+        super().__init__(scope, construct_id, **kwargs)
+        config = tenant_config.validate()
+
+        self.agent_name_lambda = self._create_get_agent_name_lambda(config)
+        hours_of_operation = self._create_hours_of_operation(config)
+        self.queue = self._create_queue(config, hours_of_operation)
+        self.routing_profile = self._create_routing_profile(config, self.queue)
+
+
+class ConnectFlowsStack(TenantResources, Stack):
+    """分层布局的联系流 Stack。修改流程内容只会更新此 Stack"""
+
+    def __init__(self, scope: Construct, construct_id: str, tenant_config, core, **kwargs) -> None:
+        super().__init__(scope, construct_id, **kwargs)
+        config = tenant_config.validate()
+
+        # core 中的队列 / Lambda ARN 在这里被引用，CDK 会自动生成跨 Stack 的导出与导入
+        contact_flows = self._create_contact_flows(config, core.agent_name_lambda)
+        self._create_ivr_flow(config, core.queue, contact_flows)
+
+
+class ConnectAgentShardStack(TenantResources, Stack):
+    """分层布局的座席分片 Stack。各分片只依赖 core，可以并行部署"""
+
+    def __init__(self, scope: Construct, construct_id: str, tenant_config, core, agents, **kwargs) -> None:
+        super().__init__(scope, construct_id, **kwargs)
+        config = tenant_config.validate()
+
+        self._create_agents(config, core.routing_profile.attr_routing_profile_arn, agents)
+
+
+class ConnectParameterizedStack(TenantResources, Stack):
+    """参数化模板：租户名称、TTS 语音、消息、营业时间与功能开关均为 CloudFormation 参数 / 条件。
+
+    只需 synth 一次，由 deploy_cli.py deploy --manifest --parameterized 以各租户的参数
+    部署为多个 Stack。模板不包含座席（座席通过 Connect API 开通），Lambda 使用默认性能配置档。
+    """
+
+    def __init__(self, scope: Construct, construct_id: str, **kwargs) -> None:
+        super().__init__(scope, construct_id, **kwargs)
+
+        def parameter(name, description, **options):
+            return CfnParameter(self, name, type="String", description=description, **options).value_as_string
+
+        def condition(name, expression):
+            return CfnCondition(self, name, expression=expression)
+
+        # 参数值由 deploy_cli.py 生成（parameterized.template_parameters），消息类参数已做 JSON 转义
+        tenant_name = parameter("TenantName", "Tenant name, used as the prefix of every resource name",
+                                allowed_pattern=TENANT_NAME_PATTERN, max_length=TENANT_NAME_MAX_LENGTH)
+        instance_arn = parameter("ConnectInstanceArn", "Amazon Connect instance ARN",
+                                 allowed_pattern=r"arn:aws[a-z-]*:connect:[a-z0-9-]+:\d{12}:instance/[A-Za-z0-9-]+")
+        screenpop_enabled = condition("ScreenPopEnabled", Fn.condition_equals(
+            parameter("EnableScreenPop", "Create the screen pop flow", default="false",
+                      allowed_values=["true", "false"]), "true"))
+        survey_enabled = condition("SurveyEnabled", Fn.condition_equals(
+            parameter("EnableSurvey", "Create the post-call survey flow", default="false",
+                      allowed_values=["true", "false"]), "true"))
+        screenpop_and_survey = condition("ScreenPopAndSurveyEnabled", Fn.condition_and(
+            screenpop_enabled, survey_enabled))
+
+        config = SimpleNamespace(
+            tenant_name=tenant_name,
+            connect_instance_arn=instance_arn,
+            tts_voice=parameter("TtsVoice", "Amazon Polly voice"),
+            selected_language=parameter("SelectedLanguage", "Language shown in the screen pop"),
+            ivr_messages={key: parameter(name, f"IVR {key}") for key, name in IVR_MESSAGE_PARAMETERS.items()},
+            enable_screenpop=True,
+            enable_survey=True,
+            screenpop_translations={
+                key: parameter(translation_parameter(key), f"Screen pop label {key}", default="")
+                for key in screenpop_translation_keys()
+            },
+            survey_messages={
+                **{key: parameter(name, f"Survey {key}", default="")
+                   for key, name in SURVEY_MESSAGE_PARAMETERS.items()},
+                "results": {key: parameter(name, f"Survey result label {key}", default=SURVEY_RESULT_DEFAULTS[key])
+                            for key, name in SURVEY_RESULT_PARAMETERS.items()},
+            },
+            lambda_performance_profile=DEFAULT_LAMBDA_PROFILE,
+            agent_directory_preload=False,
+            agent_name_shared_cache=False,
+        )
+
+        agent_name_lambda = self._create_get_agent_name_lambda(config)
+        hours_of_operation = self._create_parameterized_hours_of_operation(config, parameter)
+        queue = self._create_queue(config, hours_of_operation)
+
+        # 弹屏 / 调查流程始终合成，由条件决定是否创建
+        contact_flows = self._create_contact_flows(config, agent_name_lambda)
+        contact_flows['screenpop'].cfn_options.condition = screenpop_enabled
+        contact_flows['survey'].cfn_options.condition = survey_enabled
+
+        # 入站流程的四种模板组合各渲染一次，由 Fn::If 在部署时选择；
+        # 引用条件资源（弹屏 / 调查流程）的组合只出现在对应条件成立的分支中
+        def inbound_content(enable_screenpop, enable_survey):
+            variant = SimpleNamespace(**vars(config), inbound_flow_template=select_inbound_flow_template(
+                enable_screenpop, enable_survey))
+            return create_ivr_contact_flow(
+                variant, queue,
+                contact_flows['screenpop'] if enable_screenpop else None,
+                contact_flows['survey'] if enable_survey else None)
+
+        content = Fn.condition_if(
+            screenpop_and_survey.logical_id, inbound_content(True, True),
+            Fn.condition_if(
+                screenpop_enabled.logical_id, inbound_content(True, False),
+                Fn.condition_if(
+                    survey_enabled.logical_id, inbound_content(False, True),
+                    inbound_content(False, False))))
+        connect.CfnContactFlow(
+            self, "CfnContactFlowIVR",
+            content=Token.as_string(content),
+            instance_arn=instance_arn,
+            description="IVR flow created using cfn",
+            name=f"{tenant_name} Inbound Flow",
+            type="CONTACT_FLOW"
+        )
+
+        self._create_routing_profile(config, queue)
+
+    def _create_parameterized_hours_of_operation(self, config, parameter):
+        """营业时间从目录（examples/hoursofoperation）中按 HoursOfOperation 参数选择"""
+        variants = hours_of_operation_variants()
+        selected = parameter("HoursOfOperation", "Hours of operation catalog entry",
+                             default="us" if "us" in variants else next(iter(variants)),
+                             allowed_values=list(variants))
+        catalog = CfnMapping(self, "HoursOfOperationCatalog", mapping={
+            key: {"Name": hop["name"], "TimeZone": hop["timeZone"], "Description": hop["description"]}
+            for key, hop in variants.items()
+        })
+
+        # 时间段是对象列表，不能放进 Mapping，改用 Fn::If 链选择
+        timeslices = None
+        for key, hop in reversed(list(variants.items())):
+            value = [
+                {
+                    "Day": row['day'],
+                    "StartTime": {"Hours": row['startH'], "Minutes": row['startM']},
+                    "EndTime": {"Hours": row['endH'], "Minutes": row['endM']},
+                } for row in hop['timeslices']
+            ]
+            if timeslices is not None:
+                selected_condition = CfnCondition(
+                    self, f"HoursOfOperationIs{key.capitalize()}",
+                    expression=Fn.condition_equals(selected, key))
+                value = Fn.condition_if(selected_condition.logical_id, value, timeslices)
+            timeslices = value
+
+        return connect.CfnHoursOfOperation(
+            self, "CfnHoursOfOperation",
+            config=timeslices,
+            instance_arn=config.connect_instance_arn,
+            name=f"{config.tenant_name} {catalog.find_in_map(selected, 'Name')}",
+            time_zone=catalog.find_in_map(selected, 'TimeZone'),
+            description=catalog.find_in_map(selected, 'Description')
+        )
@@ -0,0 +1,112 @@
+import json
+import re
+
+# 联系流模板引擎
+#
+# 模板是解析后的联系流 JSON（dict/list）。占位符分两类：
+# - 片段占位符（fragment）：出现在字符串值内部，如 "contact_name Inbound Flow"、
+#   "arn_prefix:aws:view/detail:1"。匹配时要求前后不是 [A-Za-z0-9_-]，避免误伤更长的标识符。
+# - 整值占位符（exact）：仅当字符串值与占位符完全相同时替换，如 TTS 语音 "Joanna"，
+#   避免把消息正文中恰好出现的同名文本也替换掉。
+# - 限定 key 的整值占位符（scoped）：仅当字符串值位于指定的字典 key 下且与占位符完全相同时替换，
+#   如 "displayName": "GetAgentNameByAgentId"，避免替换 Lambda ARN 等其它位置的同名值。
+#
+# 渲染时只遍历一次结构，每个字符串值用一个编译好的正则单次替换所有片段占位符，
+# 替换结果不会被再次扫描；字典的 key 不参与替换。
+
+_BOUNDARY_CHARS = r"A-Za-z0-9_\-"
+
+
+class FlowTemplate:
+    """编译后的联系流模板。
+
+    fragments / exact 为声明的占位符名称，scoped 为 {字典 key: 占位符名称}。编译时记录模板中实际出现的占位符，
+    render() 返回渲染结果并报告未替换（模板中出现但未提供值）与未使用（提供了值但模板中不存在）的占位符。
+    """
+
+    def __init__(self, flow_data, fragments=(), exact=(), scoped=None):
+        self.flow_data = flow_data
+        self.fragments = tuple(fragments)
+        self.exact = frozenset(exact)
+        self.scoped = {key: frozenset(names) for key, names in (scoped or {}).items()}
+        # 长的占位符优先匹配
+        names = sorted(self.fragments, key=len, reverse=True)
+        self._pattern = re.compile(
+            rf"(?<![{_BOUNDARY_CHARS}])(?:{'|'.join(map(re.escape, names))})(?![{_BOUNDARY_CHARS}])"
+        ) if names else None
+        self.present = self._scan(flow_data)
+
+    def _scan(self, node):
+        found = set()
+        stack = [(None, node)]
+        while stack:
+            key, item = stack.pop()
+            if isinstance(item, dict):
+                stack.extend(item.items())
+            elif isinstance(item, list):
+                stack.extend((None, v) for v in item)
+            elif isinstance(item, str):
+                if item in self.scoped.get(key, ()):
+                    found.add(item)
+                elif item in self.exact:
+                    found.add(item)
+                elif self._pattern is not None:
+                    found.update(self._pattern.findall(item))
+        return found
+
+    def render(self, values):
+        """返回 (渲染后的结构, report)。report 包含 unresolved / unused 两个排序后的列表。
+
+        values 中值为 None 的占位符视为已声明但没有可用的值（保持原样并计入 unresolved）。
+        """
+        values = {k: v for k, v in values.items() if v is not None}
+        used = set()
+
+        def substitute(match):
+            name = match.group(0)
+            if name in values:
+                used.add(name)
+                return str(values[name])
+            return name
+
+        def render_node(item, key=None):
+            if isinstance(item, dict):
+                return {k: render_node(v, k) for k, v in item.items()}
+            if isinstance(item, list):
+                return [render_node(v) for v in item]
+            if isinstance(item, str):
+                if item in self.exact or item in self.scoped.get(key, ()):
+                    if item in values:
+                        used.add(item)
+                        return str(values[item])
+                    return item
+                if self._pattern is not None:
+                    return self._pattern.sub(substitute, item)
+            return item
+
+        rendered = render_node(self.flow_data)
+        report = {
+            "unresolved": sorted(self.present - set(values)),
+            "unused": sorted(set(values) - used),
+        }
+        return rendered, report
+
+
+def render_flow_content(flow_data, fragments=None, exact=None, name="flow", scoped=None):
+    """渲染联系流并返回 JSON 字符串。
+
+    fragments / exact 为 {占位符: 值}，scoped 为 {字典 key: {占位符: 值}}，值为 None 表示当前没有可用的值。
+    未替换的占位符会打印警告，未在模板中出现的占位符仅作提示（部分占位符只存在于特定功能组合的模板中）。
+    """
+    fragments = fragments or {}
+    exact = exact or {}
+    scoped = scoped or {}
+    template = FlowTemplate(flow_data, fragments=fragments.keys(), exact=exact.keys(),
+                            scoped={key: values.keys() for key, values in scoped.items()})
+    scoped_values = {k: v for values in scoped.values() for k, v in values.items()}
+    rendered, report = template.render({**fragments, **exact, **scoped_values})
+    if report["unresolved"]:
+        print(f"  ⚠ {name} 中存在未替换的占位符: {', '.join(report['unresolved'])}")
+    if report["unused"]:
+        print(f"  ℹ {name} 中未使用的占位符: {', '.join(report['unused'])}")
+    return json.dumps(rendered)
@@ -0,0 +1,261 @@
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from connect_cdk_voice_channel.tenant_config import PROJECT_DIR
+
+# Connect 实例资源清单快照
+#
+# 按资源类型（座席、队列、路由配置、营业时间、联系流、安全配置文件、已关联的 Lambda）
+# 并发列举，按名称 / ARN / ID 建立索引，并保存到 .inventory/<instance_id>.json。
+# 只列举调用方需要的资源类型，每种类型单独记录获取时间：TTL（默认 300 秒，
+# 环境变量 CONNECT_INVENTORY_TTL）内的后续命令直接从内存/本地快照查询，不再重复分页调用 API。
+# 创建或删除资源后调用 invalidate() 使快照失效。
+#
+# 只需要查找少量已知名称时（例如重名协调），使用 search_resources() 通过 Search* API 定向查询，
+# 成本与要查找的名称数量成正比，而不是与实例中的资源总数成正比。
+#
+# CloudFormation Stack 的资源列表每次部署都会变化，只在进程内缓存（get_stack_resources）。
+
+INVENTORY_DIR = os.path.join(PROJECT_DIR, ".inventory")
+INVENTORY_VERSION = 2
+DEFAULT_TTL_SECONDS = 300
+FETCH_WORKERS = 7
+
+# 资源类型 → (分页操作, 结果字段, 名称字段, 额外参数)；lambda_functions 的结果为 ARN 字符串
+RESOURCE_TYPES = {
+    "users": ("list_users", "UserSummaryList", "Username", {}),
+    "queues": ("list_queues", "QueueSummaryList", "Name", {"QueueTypes": ["STANDARD"]}),
+    "routing_profiles": ("list_routing_profiles", "RoutingProfileSummaryList", "Name", {}),
+    "hours_of_operations": ("list_hours_of_operations", "HoursOfOperationSummaryList", "Name", {}),
+    "contact_flows": ("list_contact_flows", "ContactFlowSummaryList", "Name", {}),
+    "security_profiles": ("list_security_profiles", "SecurityProfileSummaryList", "Name", {}),
+    "lambda_functions": ("list_lambda_functions", "LambdaFunctions", None, {}),
+}
+
+# 资源类型 → (Search 操作, 结果字段, 搜索字段, 名称字段, ID 字段, ARN 字段)
+SEARCH_TYPES = {
+    "users": ("search_users", "Users", "username", "Username", "Id", "Arn"),
+    "queues": ("search_queues", "Queues", "name", "Name", "QueueId", "QueueArn"),
+    "routing_profiles": ("search_routing_profiles", "RoutingProfiles", "name", "Name",
+                         "RoutingProfileId", "RoutingProfileArn"),
+    "hours_of_operations": ("search_hours_of_operations", "HoursOfOperations", "name", "Name",
+                            "HoursOfOperationId", "HoursOfOperationArn"),
+    "contact_flows": ("search_contact_flows", "ContactFlows", "name", "Name", "Id", "Arn"),
+}
+# 每次 Search 请求中 OR 组合的名称数量
+SEARCH_BATCH_SIZE = 20
+
+
+def get_ttl():
+    try:
+        return int(os.environ.get("CONNECT_INVENTORY_TTL", DEFAULT_TTL_SECONDS))
+    except ValueError:
+        return DEFAULT_TTL_SECONDS
+
+
+def snapshot_path(instance_id):
+    return os.path.join(INVENTORY_DIR, f"{instance_id}.json")
+
+
+def _list_all(client, operation, result_key, **kwargs):
+    items = []
+    for page in client.get_paginator(operation).paginate(**kwargs):
+        items.extend(page.get(result_key, []))
+    return items
+
+
+class ConnectInventory:
+    """一个 Connect 实例的资源快照及其索引（可以只包含部分资源类型）"""
+
+    def __init__(self, instance_id, resources=None, fetched_at=None):
+        self.instance_id = instance_id
+        self.resources = dict(resources or {})
+        self.fetched_at = dict(fetched_at or {})
+        self._reindex()
+
+    def _reindex(self):
+        self._by_name = {}
+        self._by_arn = {}
+        self._by_id = {}
+        for kind, items in self.resources.items():
+            name_key = RESOURCE_TYPES[kind][2]
+            if name_key is None:
+                continue
+            index = self._by_name.setdefault(kind, {})
+            for item in items:
+                index.setdefault(item.get(name_key), []).append(item)
+                if item.get("Arn"):
+                    self._by_arn[item["Arn"]] = (kind, item)
+                if item.get("Id"):
+                    self._by_id[item["Id"]] = (kind, item)
+
+    def refresh(self, client, kinds):
+        """并发列举指定的资源类型并合并到快照"""
+        with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as executor:
+            futures = {}
+            for kind in kinds:
+                operation, result_key, _, extra = RESOURCE_TYPES[kind]
+                futures[kind] = executor.submit(
+                    _list_all, client, operation, result_key, InstanceId=self.instance_id, **extra)
+            for kind, future in futures.items():
+                self.resources[kind] = future.result()
+                self.fetched_at[kind] = time.time()
+        self._reindex()
+
+    def stale_kinds(self, kinds, ttl):
+        now = time.time()
+        return [kind for kind in kinds
+                if kind not in self.resources or now - self.fetched_at.get(kind, 0) >= ttl]
+
+    def find(self, kind, name):
+        """按名称查找，返回第一个匹配项或 None"""
+        matches = self._by_name.get(kind, {}).get(name)
+        return matches[0] if matches else None
+
+    def find_all(self, kind, names=None, prefix=None):
+        """按名称集合或名称前缀查找"""
+        if names is not None:
+            index = self._by_name.get(kind, {})
+            return [item for name in names for item in index.get(name, [])]
+        name_key = RESOURCE_TYPES[kind][2]
+        return [item for item in self.resources.get(kind, [])
+                if prefix is None or (item.get(name_key) or "").startswith(prefix)]
+
+    def find_by_arn(self, arn):
+        """返回 (资源类型, 资源) 或 None"""
+        return self._by_arn.get(arn)
+
+    def find_by_id(self, resource_id):
+        return self._by_id.get(resource_id)
+
+    def has_lambda(self, function_arn):
+        return function_arn in self.resources.get("lambda_functions", [])
+
+    def to_dict(self):
+        return {
+            "version": INVENTORY_VERSION,
+            "instance_id": self.instance_id,
+            "fetched_at": self.fetched_at,
+            "resources": self.resources,
+        }
+
+    def save(self):
+        os.makedirs(INVENTORY_DIR, exist_ok=True)
+        path = snapshot_path(self.instance_id)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, instance_id):
+        """读取本地快照；不存在或格式不符时返回 None"""
+        try:
+            with open(snapshot_path(instance_id), "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get("version") != INVENTORY_VERSION or not set(data.get("resources", {})) <= set(RESOURCE_TYPES):
+            return None
+        return cls(data["instance_id"], data["resources"], data.get("fetched_at"))
+
+
+# 进程内缓存：同一次 CLI 运行中的多个步骤共享同一份快照
+_loaded = {}
+
+
+def get_inventory(client, instance_id, kinds=None, ttl=None, refresh=False):
+    """返回实例资源快照：kinds 中过期或缺失的资源类型会重新列举并保存，其余直接使用内存/本地快照"""
+    kinds = list(kinds or RESOURCE_TYPES)
+    ttl = get_ttl() if ttl is None else ttl
+    inventory = _loaded.get(instance_id) or ConnectInventory.load(instance_id) or ConnectInventory(instance_id)
+    stale = kinds if refresh else inventory.stale_kinds(kinds, ttl)
+    if stale:
+        inventory.refresh(client, stale)
+        inventory.save()
+    _loaded[instance_id] = inventory
+    return inventory
+
+
+def invalidate(instance_id=None):
+    """使快照失效（instance_id 为 None 时清除全部实例），返回删除的文件数"""
+    if instance_id is None:
+        _loaded.clear()
+        names = os.listdir(INVENTORY_DIR) if os.path.isdir(INVENTORY_DIR) else []
+    else:
+        _loaded.pop(instance_id, None)
+        names = [os.path.basename(snapshot_path(instance_id))]
+    removed = 0
+    for name in names:
+        path = os.path.join(INVENTORY_DIR, name)
+        if os.path.exists(path):
+            os.remove(path)
+            removed += 1
+    return removed
+
+
+def _batches(values, size):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def search_resources(client, instance_id, kind, names=None, prefix=None):
+    """通过 Search* API 查找名称精确等于 names 中任一项（或以 prefix 开头）的资源。
+
+    names 按 SEARCH_BATCH_SIZE 分批以 OR 条件组合，返回 [{"Id", "Arn", <名称字段>}, ...]。
+    """
+    operation, result_key, field_name, name_key, id_key, arn_key = SEARCH_TYPES[kind]
+    if prefix is not None:
+        batches = [[(prefix, "STARTS_WITH")]]
+    else:
+        wanted = set(names or ())
+        batches = [[(name, "EXACT") for name in batch] for batch in _batches(sorted(wanted), SEARCH_BATCH_SIZE)]
+
+    found = {}
+    for batch in batches:
+        conditions = [{"StringCondition": {"FieldName": field_name, "Value": value, "ComparisonType": comparison}}
+                      for value, comparison in batch]
+        criteria = conditions[0] if len(conditions) == 1 else {"OrConditions": conditions}
+        for item in _list_all(client, operation, result_key, InstanceId=instance_id, SearchCriteria=criteria):
+            name = item.get(name_key) or ""
+            # Search 的字符串匹配不区分大小写，这里再按原始名称精确过滤
+            if (name.startswith(prefix) if prefix is not None else name in wanted):
+                if kind == "queues" and item.get("QueueType", "STANDARD") != "STANDARD":
+                    continue
+                found[item[arn_key]] = {"Id": item[id_key], "Arn": item[arn_key], name_key: name}
+    return list(found.values())
+
+
+_stack_resources = {}
+
+
+def is_missing_stack_error(error):
+    """CloudFormation 对不存在的 Stack 返回 ValidationError「Stack with id ... does not exist」"""
+    info = getattr(error, "response", {}).get("Error", {})
+    return info.get("Code") == "ValidationError" and "does not exist" in info.get("Message", "")
+
+
+def get_stack_resources(cfn, stack_name):
+    """返回 Stack 的资源摘要列表（进程内缓存）；Stack 不存在时返回 []。
+
+    其它错误（限流、AccessDenied、网络错误）原样抛出且不缓存：把它们当作「没有 Stack 管理的资源」
+    会让重名协调删除或重建实际由 CloudFormation 管理的资源。
+    """
+    if stack_name not in _stack_resources:
+        try:
+            _stack_resources[stack_name] = _list_all(
+                cfn, "list_stack_resources", "StackResourceSummaries", StackName=stack_name)
+        except Exception as e:
+            if not is_missing_stack_error(e):
+                raise
+            # Stack 尚不存在（首次部署）
+            _stack_resources[stack_name] = []
+    return _stack_resources[stack_name]
+
+
+def invalidate_stacks():
+    _stack_resources.clear()
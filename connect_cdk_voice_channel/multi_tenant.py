@@ -0,0 +1,69 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import aws_cdk as cdk
+
+from connect_cdk_voice_channel.connect_cdk_voice_channel_stack import (
+    ConnectAgentShardStack,
+    ConnectCdkVoiceChannelStack,
+    ConnectCoreStack,
+    ConnectFlowsStack,
+)
+from connect_cdk_voice_channel.tenant_config import AGENT_SHARD_THRESHOLD
+
+# 在一个 CDK App 中为多个租户创建 Stack
+#
+# 默认在同一进程中 synth 全部租户（只启动一次 Python + jsii），生成的 cloud assembly
+# 可以用 `cdk deploy --all --concurrency N` 并行部署。
+# 租户数量很大时可以按进程分区：每个子进程 synth 一部分租户到 cdk.out/partition-<n>，
+# 分别用 `cdk deploy --app cdk.out/partition-<n> --all --concurrency N` 部署。
+
+
+def add_tenant_stacks(app, configs):
+    """为每个租户创建 Stack（单体布局一个 Stack；分层布局 Core + Flows + 座席分片）
+
+    座席数量超过 AGENT_SHARD_THRESHOLD 的 auto 租户会被拒绝：直接运行 cdk 时无法查询已部署的布局，
+    auto 可能把已按单体布局部署的租户隐式切换为分层布局。deploy_cli.py 传入的配置已固定布局，不受影响。
+    """
+    unpinned = [config.tenant_name for config in configs
+                if config.stack_layout == "auto" and len(config.stack_agents) > AGENT_SHARD_THRESHOLD]
+    if unpinned:
+        raise ValueError(
+            f"Tenants with more than {AGENT_SHARD_THRESHOLD} agents need an explicit stack_layout "
+            f"(single or layered, matching any deployed stacks): {', '.join(unpinned)}")
+    stacks = []
+    for config in configs:
+        if not config.layered:
+            stacks.append(ConnectCdkVoiceChannelStack(
+                app, config.stack_name, tenant_config=config,
+                description=config.tenant_description))
+            continue
+
+        core = ConnectCoreStack(
+            app, config.core_stack_name, tenant_config=config,
+            description=f"{config.tenant_description} (core)".strip())
+        stacks.append(core)
+        stacks.append(ConnectFlowsStack(
+            app, config.flows_stack_name, tenant_config=config, core=core,
+            description=f"{config.tenant_description} (contact flows)".strip()))
+        for shard_name, start, agents in config.agent_shards():
+            stacks.append(ConnectAgentShardStack(
+                app, shard_name, tenant_config=config, core=core, agents=agents,
+                description=f"{config.tenant_description} (agents {start + 1}-{start + len(agents)})".strip()))
+    return stacks
+
+
+def _synth_partition(configs, outdir):
+    app = cdk.App(outdir=outdir)
+    add_tenant_stacks(app, configs)
+    app.synth()
+    return outdir, [name for config in configs for name in config.stack_names]
+
+
+def synth_partitioned(configs, workers, outdir="cdk.out"):
+    """按进程池分区 synth，返回 [(分区 assembly 目录, [Stack 名称, ...]), ...]"""
+    workers = max(1, min(workers, len(configs)))
+    partitions = [configs[i::workers] for i in range(workers)]
+    outdirs = [os.path.join(outdir, f"partition-{i}") for i in range(workers)]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_synth_partition, partitions, outdirs))
@@ -0,0 +1,128 @@
+import json
+import os
+import re
+
+from connect_cdk_voice_channel.catalogs import (
+    DEFAULT_LAMBDA_PROFILE, HOP_DIR, get_screenpop_translations, load_catalog)
+
+# 参数化模板（synth 一次，部署多次）
+#
+# ConnectParameterizedStack 把租户名称、TTS 语音、IVR / 调查消息、弹屏翻译、营业时间与功能开关
+# 声明为 CloudFormation 参数与条件，只需 synth 一次；deploy_cli.py 随后以每个租户的参数
+# 把同一份模板部署为该租户的 Stack。本模块定义参数名称与取值规则，只依赖标准库，
+# 供 Stack（app.py）与 CLI 共用。
+#
+# 消息等参数会被 Fn::Join 拼接进联系流 Content（JSON 字符串）中，因此参数值是经过 JSON 转义的文本。
+
+PARAMETERIZED_TEMPLATE_CONTEXT_KEY = "parameterized_template"
+PARAMETERIZED_STACK_NAME = "ConnectVoiceChannelTemplate"
+
+IVR_MESSAGE_PARAMETERS = {
+    "welcomeMessage": "WelcomeMessage",
+    "openHourMessage": "OpenHourMessage",
+    "errorMessage": "ErrorMessage",
+}
+SURVEY_MESSAGE_PARAMETERS = {
+    "surveyMessage": "SurveyMessage",
+    "surveyMessageFeedback": "SurveyFeedback",
+}
+SURVEY_RESULT_PARAMETERS = {
+    "1": "SurveyResult1",
+    "2": "SurveyResult2",
+    "3": "SurveyResult3",
+    "-1": "SurveyResultNA",
+}
+# 满意度评分文案缺失时的英文默认值
+SURVEY_RESULT_DEFAULTS = {
+    "1": "VerySatisfied",
+    "2": "Satisfied",
+    "3": "Unsatisfied",
+    "-1": "N/A",
+}
+
+_HOP_FILE_PATTERN = re.compile(r"^hours_of_operation_([A-Za-z0-9]+)\.json$")
+
+# TenantName 参数的取值范围：租户名称是 Lambda 函数名 {TenantName}-GetAgentNameByAgentId 的前缀，
+# 函数名只允许字母、数字、- 与 _，且最长 64 个字符
+LAMBDA_NAME_SUFFIX = "-GetAgentNameByAgentId"
+TENANT_NAME_PATTERN = r"[A-Za-z0-9_-]+"
+TENANT_NAME_MAX_LENGTH = 64 - len(LAMBDA_NAME_SUFFIX)
+
+
+def hours_of_operation_variants():
+    """examples/hoursofoperation 中的营业时间目录：{key: 营业时间配置}，key 即 HoursOfOperation 参数的取值"""
+    variants = {}
+    for name in sorted(os.listdir(HOP_DIR)):
+        match = _HOP_FILE_PATTERN.match(name)
+        if match:
+            variants[match.group(1)] = load_catalog(os.path.join(HOP_DIR, name))
+    return variants
+
+
+def screenpop_translation_keys():
+    """弹屏翻译的 key（以 us 目录为准），每个 key 对应一个 ScreenPop<key> 参数"""
+    return list(get_screenpop_translations("us"))
+
+
+def translation_parameter(key):
+    return f"ScreenPop{key}"
+
+
+def flow_text(value):
+    """把文本转义为可以直接拼接进联系流 JSON 字符串中的形式"""
+    return json.dumps(value, ensure_ascii=False)[1:-1]
+
+
+def hours_of_operation_key(config):
+    """租户营业时间对应的目录 key；自定义营业时间（与目录中任何一项都不同）返回 None"""
+    for key, hours in hours_of_operation_variants().items():
+        if hours == config.hours_of_operation:
+            return key
+    return None
+
+
+def ineligible_reason(config):
+    """租户无法使用参数化模板时返回原因（此时应按租户单独 synth），可以使用时返回 None"""
+    if config.stack_agents:
+        return "座席由 CloudFormation 管理（参数化模板不包含座席，需要 agent_provisioning=api）"
+    if config.layered:
+        return "使用分层 Stack 布局（参数化模板是单个 Stack）"
+    if (config.lambda_performance_profile != DEFAULT_LAMBDA_PROFILE
+            or config.agent_directory_preload or config.agent_name_shared_cache):
+        return "Lambda 使用了非默认的性能配置档 / 座席目录预加载 / 共享缓存"
+    if hours_of_operation_key(config) is None:
+        return "使用了自定义营业时间文件"
+    if (not re.fullmatch(TENANT_NAME_PATTERN, config.tenant_name)
+            or len(config.tenant_name) > TENANT_NAME_MAX_LENGTH):
+        return f"租户名称只能包含字母、数字、- 与 _，且不超过 {TENANT_NAME_MAX_LENGTH} 个字符"
+    if config.enable_screenpop and set(config.screenpop_translations) != set(screenpop_translation_keys()):
+        return "弹屏翻译的 key 与目录不一致"
+    return None
+
+
+def template_parameters(config):
+    """租户配置 → 参数化模板的参数 {参数名: 值}（调用方须先确认 ineligible_reason 为 None）"""
+    parameters = {
+        "TenantName": config.tenant_name,
+        "ConnectInstanceArn": config.connect_instance_arn,
+        "TtsVoice": flow_text(config.tts_voice),
+        "SelectedLanguage": flow_text(config.selected_language),
+        "HoursOfOperation": hours_of_operation_key(config),
+        "EnableScreenPop": "true" if config.enable_screenpop else "false",
+        "EnableSurvey": "true" if config.enable_survey else "false",
+    }
+    for key, name in IVR_MESSAGE_PARAMETERS.items():
+        parameters[name] = flow_text(config.ivr_messages[key])
+
+    # 功能关闭时对应参数传空字符串（模板中的相关联系流不会被创建）
+    survey_messages = config.survey_messages if config.enable_survey else {}
+    for key, name in SURVEY_MESSAGE_PARAMETERS.items():
+        parameters[name] = flow_text(survey_messages.get(key, ""))
+    results = survey_messages.get("results", {})
+    for key, name in SURVEY_RESULT_PARAMETERS.items():
+        parameters[name] = flow_text(results.get(key, SURVEY_RESULT_DEFAULTS[key]))
+
+    translations = config.screenpop_translations if config.enable_screenpop else {}
+    for key in screenpop_translation_keys():
+        parameters[translation_parameter(key)] = flow_text(translations.get(key, ""))
+    return parameters
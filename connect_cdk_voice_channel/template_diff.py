@@ -0,0 +1,175 @@
+import copy
+import hashlib
+import json
+import os
+
+# 已合成模板与已部署模板的比较
+#
+# deploy_cli.py 先执行一次 cdk synth，再把 cdk.out 中每个 Stack 的模板与 CloudFormation
+# 中已部署的模板（GetTemplate, TemplateStage=Original）比较。模板中已包含 Lambda 等资源的
+# 资产哈希，因此模板哈希一致即说明 Stack 没有任何变更，可以跳过重名协调与变更集创建。
+#
+# 热更新（hotswap）：若模板之间唯一的差异是 AWS::Connect::ContactFlow 的 Content，
+# 可以解析其中的内置函数（Ref / Fn::GetAtt / Fn::ImportValue / Fn::Join ...）后直接调用
+# UpdateContactFlowContent 更新联系流，无需 CloudFormation 更新。无法解析时由调用方回退到完整部署。
+
+# 可以直接比较模板的 Stack 状态（其它状态下一律视为有变更，交给 cdk deploy 处理）
+STABLE_STACK_STATUSES = {
+    "CREATE_COMPLETE",
+    "UPDATE_COMPLETE",
+    "UPDATE_ROLLBACK_COMPLETE",
+    "IMPORT_COMPLETE",
+    "IMPORT_ROLLBACK_COMPLETE",
+}
+
+
+def read_assembly_templates(outdir):
+    """读取 cloud assembly（cdk.out）中的全部 Stack 模板：Stack 名称 → 模板 dict"""
+    with open(os.path.join(outdir, "manifest.json"), "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    templates = {}
+    for artifact_id, artifact in manifest.get("artifacts", {}).items():
+        if artifact.get("type") != "aws:cloudformation:stack":
+            continue
+        properties = artifact.get("properties", {})
+        stack_name = properties.get("stackName", artifact_id)
+        with open(os.path.join(outdir, properties["templateFile"]), "r", encoding="utf-8") as f:
+            templates[stack_name] = json.load(f)
+    return templates
+
+
+def normalize_template_body(body):
+    """GetTemplate 对 JSON 模板返回 dict，对其它格式返回字符串"""
+    if isinstance(body, str):
+        try:
+            return json.loads(body)
+        except ValueError:
+            return None
+    return body
+
+
+def template_hash(template):
+    payload = json.dumps(template, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def get_deployed_template(cfn, stack_name):
+    """返回已部署且处于稳定状态的 Stack 模板；Stack 不存在或状态不稳定时返回 None"""
+    try:
+        stacks = cfn.describe_stacks(StackName=stack_name).get("Stacks", [])
+    except Exception:
+        return None
+    if not stacks or stacks[0].get("StackStatus") not in STABLE_STACK_STATUSES:
+        return None
+    body = cfn.get_template(StackName=stack_name, TemplateStage="Original").get("TemplateBody")
+    return normalize_template_body(body)
+
+
+def diff_stacks(cfn, templates):
+    """返回 {有变更（或尚未部署）的 Stack 名称: 已部署模板或 None}，保持 templates 的顺序"""
+    changed = {}
+    for stack_name, template in templates.items():
+        deployed = get_deployed_template(cfn, stack_name)
+        if deployed is None or template_hash(deployed) != template_hash(template):
+            changed[stack_name] = deployed
+    return changed
+
+
+def changed_stacks(cfn, templates):
+    """返回模板与已部署版本不一致（或尚未部署）的 Stack 名称，保持 templates 的顺序"""
+    return list(diff_stacks(cfn, templates))
+
+
+# ─── 联系流热更新 ────────────────────────────────────────────────────────────
+
+CONTACT_FLOW_TYPE = "AWS::Connect::ContactFlow"
+
+# Fn::GetAtt 可以直接由物理 ID 得到的属性（Connect 资源的物理 ID 即 ARN）
+_ARN_ATTRIBUTES = {
+    "AWS::Connect::Queue": "QueueArn",
+    "AWS::Connect::ContactFlow": "ContactFlowArn",
+    "AWS::Connect::HoursOfOperation": "HoursOfOperationArn",
+    "AWS::Connect::RoutingProfile": "RoutingProfileArn",
+}
+
+
+class HotswapNotSupported(Exception):
+    """变更无法通过热更新完成，需要完整部署"""
+
+
+def _without_flow_content(template):
+    stripped = copy.deepcopy(template)
+    for resource in stripped.get("Resources", {}).values():
+        if resource.get("Type") == CONTACT_FLOW_TYPE:
+            resource.get("Properties", {}).pop("Content", None)
+    return stripped
+
+
+def flow_content_changes(deployed, synthesized):
+    """若两个模板只有联系流 Content 不同，返回 {逻辑 ID: 新 Content}；否则返回 None"""
+    if deployed is None or template_hash(_without_flow_content(deployed)) != template_hash(
+            _without_flow_content(synthesized)):
+        return None
+    changes = {}
+    for logical_id, resource in synthesized.get("Resources", {}).items():
+        if resource.get("Type") != CONTACT_FLOW_TYPE:
+            continue
+        content = resource.get("Properties", {}).get("Content")
+        if content != deployed["Resources"][logical_id].get("Properties", {}).get("Content"):
+            changes[logical_id] = content
+    return changes
+
+
+def resolve_intrinsics(value, context):
+    """解析模板值中的内置函数。
+
+    context: {"resources": {逻辑 ID: (资源类型, 物理 ID)}, "exports": {导出名: 值} 或返回它的函数,
+              "pseudo": {"AWS::Region": ..., "AWS::AccountId": ..., "AWS::Partition": ..., ...}}
+    遇到不支持的函数或属性时抛出 HotswapNotSupported。
+    """
+    if isinstance(value, list):
+        return [resolve_intrinsics(v, context) for v in value]
+    if not isinstance(value, dict):
+        return value
+    if len(value) != 1:
+        return {k: resolve_intrinsics(v, context) for k, v in value.items()}
+
+    (name, arg), = value.items()
+    if name == "Ref":
+        if arg in context["pseudo"]:
+            return context["pseudo"][arg]
+        if arg in context["resources"]:
+            return context["resources"][arg][1]
+        raise HotswapNotSupported(f"Ref {arg}")
+    if name == "Fn::GetAtt":
+        logical_id, attribute = arg if isinstance(arg, list) else arg.split(".", 1)
+        if logical_id not in context["resources"]:
+            raise HotswapNotSupported(f"Fn::GetAtt {logical_id}")
+        resource_type, physical_id = context["resources"][logical_id]
+        if _ARN_ATTRIBUTES.get(resource_type) == attribute:
+            return physical_id
+        if resource_type == "AWS::Lambda::Function" and attribute == "Arn":
+            pseudo = context["pseudo"]
+            return (f"arn:{pseudo['AWS::Partition']}:lambda:{pseudo['AWS::Region']}:"
+                    f"{pseudo['AWS::AccountId']}:function:{physical_id}")
+        raise HotswapNotSupported(f"Fn::GetAtt {resource_type}.{attribute}")
+    if name == "Fn::ImportValue":
+        exports = context["exports"]
+        if callable(exports):
+            exports = context["exports"] = exports()
+        export_name = resolve_intrinsics(arg, context)
+        if export_name not in exports:
+            raise HotswapNotSupported(f"Fn::ImportValue {export_name}")
+        return exports[export_name]
+    if name == "Fn::Join":
+        separator, parts = arg
+        return separator.join(str(resolve_intrinsics(p, context)) for p in parts)
+    if name == "Fn::Select":
+        index, items = arg
+        return resolve_intrinsics(items, context)[int(resolve_intrinsics(index, context))]
+    if name == "Fn::Split":
+        separator, source = arg
+        return resolve_intrinsics(source, context).split(separator)
+    if name.startswith("Fn::") or name == "Condition":
+        raise HotswapNotSupported(name)
+    return {name: resolve_intrinsics(arg, context)}
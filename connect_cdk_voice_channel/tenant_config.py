@@ -0,0 +1,241 @@
+import hashlib
+import json
+import os
+import re
+from dataclasses import asdict, dataclass, field, fields
+
+# 租户部署配置
+#
+# deploy_cli.py 交互收集配置后构建一个 TenantConfig，序列化一次传给 CDK 子进程
+# （cdk -c tenant_config=<path>），app.py 读取后直接交给 ConnectCdkVoiceChannelStack。
+# 模块只依赖标准库，CLI 在未安装 aws_cdk 时也可以导入。
+
+PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+FLOWS_DIR = os.path.join(PROJECT_DIR, "examples", "flows")
+TENANT_CONFIG_DIR = os.path.join(PROJECT_DIR, ".tenant_configs")
+TENANT_CONFIG_CONTEXT_KEY = "tenant_config"
+
+CONFIG_VERSION = 1
+
+_STACK_NAME_PATTERN = re.compile(r"^[A-Za-z][A-Za-z0-9-]*$")
+_INSTANCE_ARN_PATTERN = re.compile(r"^arn:aws[a-z-]*:connect:[a-z0-9-]+:\d{12}:instance/[A-Za-z0-9-]+$")
+
+IVR_MESSAGE_KEYS = ("welcomeMessage", "openHourMessage", "errorMessage")
+SURVEY_MESSAGE_KEYS = ("surveyMessage", "surveyMessageFeedback")
+HOURS_OF_OPERATION_KEYS = ("name", "timeZone", "description", "timeslices")
+AGENT_FIELDS = ("Username", "FirstName", "LastName", "Password")
+
+# Stack 布局：
+# - single:  所有资源在一个 Stack 中（默认布局，兼容已有部署）
+# - layered: 拆分为 <stack>-Core（营业时间、队列、路由配置、Lambda）、<stack>-Flows（联系流）
+#            以及 <stack>-Agents<n>（每个分片 agents_per_shard 个座席），跨 Stack 引用由 CDK 自动导出/导入
+# - auto:    座席数量超过 AGENT_SHARD_THRESHOLD（单个 Stack 接近 CloudFormation 500 个资源上限）时使用 layered
+# 租户部署后布局即被固定（pin_stack_layout）：两种布局之间没有自动迁移，auto 不会因座席数量变化而隐式切换。
+STACK_LAYOUTS = ("auto", "single", "layered")
+AGENT_SHARD_THRESHOLD = 400
+DEFAULT_AGENTS_PER_SHARD = 200
+MAX_AGENTS_PER_SHARD = 450
+
+# 座席开通方式：cloudformation（CfnUser 资源）或 api（部署后由 agent_provisioning 直接调用 Connect API）
+AGENT_PROVISIONING_MODES = ("cloudformation", "api")
+
+
+def select_inbound_flow_template(enable_screenpop, enable_survey):
+    """根据功能组合返回入站流程模板路径"""
+    if enable_screenpop and enable_survey:
+        return os.path.join(FLOWS_DIR, "ivr_survey_screenpop_flow.json")
+    if enable_survey:
+        return os.path.join(FLOWS_DIR, "ivr_survey_flow.json")
+    if enable_screenpop:
+        return os.path.join(FLOWS_DIR, "ivr_screenpop_flow.json")
+    return os.path.join(FLOWS_DIR, "welcome_message_flow", "welcome_message_flow.json")
+
+
+def agent_logical_id(username):
+    """座席 CfnUser 的逻辑 ID：由用户名派生，与 agents.csv 中的行位置无关。
+
+    在 CSV 中插入或删除一行只影响该行对应的资源，其余座席的逻辑 ID 不变，
+    CloudFormation 不会替换它们。用户名去掉非字母数字字符后可能重名（如 a.b 与 ab），
+    因此追加原始用户名的短哈希保证唯一。
+    """
+    token = re.sub(r"[^A-Za-z0-9]", "", username)[:64]
+    digest = hashlib.sha256(username.encode("utf-8")).hexdigest()[:8]
+    return f"CfnUser{token}{digest}"
+
+
+SURVEY_FLOW_TEMPLATE = os.path.join(FLOWS_DIR, "survey_message_flow", "survey_message_flow.json")
+SCREENPOP_FLOW_TEMPLATE = os.path.join(FLOWS_DIR, "screenpop_message_flow", "screenpop_message_flow.json")
+
+
+@dataclass
+class TenantConfig:
+    """一个租户的完整部署配置（替代 connect.json / environment_config.json 等临时文件与 os.environ）。"""
+
+    tenant_name: str
+    stack_name: str
+    connect_instance_arn: str
+    security_profile_arn: str
+    tts_voice: str
+    selected_language: str
+    language_region_key: str
+    ivr_messages: dict
+    hours_of_operation: dict
+    tenant_description: str = ""
+    enable_screenpop: bool = False
+    enable_survey: bool = False
+    screenpop_translations: dict = field(default_factory=dict)
+    survey_messages: dict = field(default_factory=dict)
+    agents: list = field(default_factory=list)
+    agent_directory_preload: bool = False
+    agent_name_shared_cache: bool = False
+    lambda_performance_profile: str = "standard"
+    stack_layout: str = "auto"
+    agents_per_shard: int = DEFAULT_AGENTS_PER_SHARD
+    agent_provisioning: str = "cloudformation"
+    # 旧版本按行序号命名的已部署座席 {用户名: CfnUser<n>}，由 deploy_cli.py 部署前从 Stack 中读取
+    legacy_agent_ids: dict = field(default_factory=dict)
+
+    @property
+    def connect_instance_id(self):
+        return self.connect_instance_arn.split("/")[-1]
+
+    @property
+    def agent_usernames(self):
+        return [row["Username"] for row in self.agents if row.get("Username")]
+
+    @property
+    def inbound_flow_template(self):
+        return select_inbound_flow_template(self.enable_screenpop, self.enable_survey)
+
+    @property
+    def stack_agents(self):
+        """由 CloudFormation 管理的座席（api 开通方式下为空）"""
+        return self.agents if self.agent_provisioning == "cloudformation" else []
+
+    @property
+    def layered(self):
+        if self.stack_layout == "auto":
+            return len(self.stack_agents) > AGENT_SHARD_THRESHOLD
+        return self.stack_layout == "layered"
+
+    @property
+    def core_stack_name(self):
+        return f"{self.stack_name}-Core"
+
+    @property
+    def flows_stack_name(self):
+        return f"{self.stack_name}-Flows"
+
+    def agent_shards(self):
+        """返回 [(分片 Stack 名称, 起始序号, 座席行列表), ...]（仅 layered 布局）"""
+        size = self.agents_per_shard
+        agents = self.stack_agents
+        return [
+            (f"{self.stack_name}-Agents{n}", start, agents[start:start + size])
+            for n, start in enumerate(range(0, len(agents), size), 1)
+        ]
+
+    @property
+    def stack_names(self):
+        """本租户的全部 CloudFormation Stack 名称"""
+        if not self.layered:
+            return [self.stack_name]
+        return [self.core_stack_name, self.flows_stack_name] + [name for name, _, _ in self.agent_shards()]
+
+    def pin_stack_layout(self, deployed_stacks):
+        """按该租户已部署的 Stack 把 stack_layout 固定为 single 或 layered 并返回。
+
+        deployed_stacks 为已部署的单体 Stack 或 Core / Flows / Agents<n> 的名称。
+        尚未部署时 auto 按座席数量确定；已部署时 auto 沿用已部署的布局（即使座席数量已跨过阈值），
+        显式指定的布局与已部署的不同则抛出 ValueError。
+        """
+        if self.stack_name in deployed_stacks:
+            deployed = "single"
+        elif deployed_stacks:
+            deployed = "layered"
+        else:
+            deployed = None
+
+        if deployed is None:
+            self.stack_layout = "layered" if self.layered else "single"
+        elif self.stack_layout == "auto":
+            self.stack_layout = deployed
+        elif self.stack_layout != deployed:
+            raise ValueError(
+                f"stack_layout '{self.stack_layout}' does not match the deployed '{deployed}' layout "
+                f"({', '.join(sorted(deployed_stacks))})")
+        return self.stack_layout
+
+    def validate(self):
+        """校验配置，发现问题时抛出 ValueError（一次列出全部问题）。"""
+        errors = []
+        for name in ("tenant_name", "stack_name", "connect_instance_arn",
+                     "security_profile_arn", "tts_voice"):
+            if not getattr(self, name):
+                errors.append(f"{name} is required")
+        if self.stack_name and not _STACK_NAME_PATTERN.match(self.stack_name):
+            errors.append(f"stack_name '{self.stack_name}' is not a valid CloudFormation stack name")
+        if self.connect_instance_arn and not _INSTANCE_ARN_PATTERN.match(self.connect_instance_arn):
+            errors.append(f"connect_instance_arn '{self.connect_instance_arn}' is not a Connect instance ARN")
+
+        missing = [k for k in IVR_MESSAGE_KEYS if k not in self.ivr_messages]
+        if missing:
+            errors.append(f"ivr_messages missing: {', '.join(missing)}")
+        missing = [k for k in HOURS_OF_OPERATION_KEYS if k not in self.hours_of_operation]
+        if missing:
+            errors.append(f"hours_of_operation missing: {', '.join(missing)}")
+        if self.enable_survey:
+            missing = [k for k in SURVEY_MESSAGE_KEYS if not self.survey_messages.get(k)]
+            if missing:
+                errors.append(f"survey_messages missing: {', '.join(missing)}")
+
+        if self.stack_layout not in STACK_LAYOUTS:
+            errors.append(f"stack_layout must be one of: {', '.join(STACK_LAYOUTS)}")
+        if self.agent_provisioning not in AGENT_PROVISIONING_MODES:
+            errors.append(f"agent_provisioning must be one of: {', '.join(AGENT_PROVISIONING_MODES)}")
+        if not 1 <= self.agents_per_shard <= MAX_AGENTS_PER_SHARD:
+            errors.append(f"agents_per_shard must be between 1 and {MAX_AGENTS_PER_SHARD}")
+
+        seen = set()
+        for index, row in enumerate(self.agents):
+            missing = [k for k in AGENT_FIELDS if not row.get(k)]
+            if missing:
+                errors.append(f"agents[{index}] missing: {', '.join(missing)}")
+            username = row.get("Username")
+            if username in seen:
+                errors.append(f"agents[{index}] duplicate Username '{username}'")
+            seen.add(username)
+
+        if errors:
+            raise ValueError("Invalid tenant config:\n  - " + "\n  - ".join(errors))
+        return self
+
+    def to_dict(self):
+        return {"version": CONFIG_VERSION, **asdict(self)}
+
+    @classmethod
+    def from_dict(cls, data):
+        version = data.get("version", CONFIG_VERSION)
+        if version != CONFIG_VERSION:
+            raise ValueError(f"Unsupported tenant config version {version}, expected {CONFIG_VERSION}")
+        known = {f.name for f in fields(cls)}
+        unknown = sorted(set(data) - known - {"version"})
+        if unknown:
+            raise ValueError(f"Unknown tenant config keys: {', '.join(unknown)}")
+        return cls(**{k: v for k, v in data.items() if k in known}).validate()
+
+    def save(self, path=None):
+        """序列化到 JSON 文件并返回路径（默认 .tenant_configs/<stack_name>.json）。"""
+        path = path or os.path.join(TENANT_CONFIG_DIR, f"{self.stack_name}.json")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # 配置中包含座席初始密码，仅当前用户可读
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2, ensure_ascii=False)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
@@ -0,0 +1,158 @@
+import json
+import os
+
+from connect_cdk_voice_channel.catalogs import (
+    AGENTS_CSV,
+    DEFAULT_LAMBDA_PROFILE,
+    get_default_voice,
+    get_hours_of_operation,
+    get_ivr_messages,
+    get_screenpop_translations,
+    get_survey_messages,
+    load_agents,
+    load_catalog,
+    resolve_region_key,
+    sanitize_stack_name,
+)
+from connect_cdk_voice_channel.tenant_config import (
+    DEFAULT_AGENTS_PER_SHARD, IVR_MESSAGE_KEYS, PROJECT_DIR, TenantConfig)
+
+# 多租户清单
+#
+# 清单为 JSON（安装了 PyYAML 时也可以是 YAML），格式：
+#
+#   {
+#     "defaults": {"connect_instance_arn": "...", "security_profile_arn": "...", "language": "English (US)"},
+#     "tenants": [
+#       {"tenant_name": "TenantA", "enable_screenpop": true},
+#       {"tenant_name": "TenantB", "language": "Chinese (Mandarin)", "enable_survey": true}
+#     ]
+#   }
+#
+# 每个租户条目与 defaults 合并后解析为 TenantConfig。消息、营业时间、座席 CSV 等目录数据
+# 通过 catalogs 模块读取，所有租户共享同一份解析结果。
+
+TENANTS_MANIFEST_CONTEXT_KEY = "tenants_manifest"
+SYNTH_WORKERS_CONTEXT_KEY = "synth_workers"
+
+MANIFEST_KEYS = {
+    "tenant_name", "stack_name", "tenant_description",
+    "connect_instance_arn", "security_profile_arn",
+    "language", "tts_voice",
+    "enable_screenpop", "enable_survey",
+    "agents_csv", "hours_of_operation_file",
+    "agent_directory_preload", "agent_name_shared_cache", "lambda_performance_profile",
+    "stack_layout", "agents_per_shard", "agent_provisioning",
+}
+
+
+def load_manifest(path):
+    """读取租户清单文件（.json；.yaml/.yml 需要 PyYAML）"""
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith((".yaml", ".yml")):
+            try:
+                import yaml
+            except ImportError:
+                raise ValueError(f"Reading {path} requires PyYAML (pip install pyyaml), or use a JSON manifest")
+            data = yaml.safe_load(f)
+        else:
+            data = json.load(f)
+    if not isinstance(data, dict) or not isinstance(data.get("tenants"), list):
+        raise ValueError(f"Tenants manifest {path} must contain a 'tenants' list")
+    return data
+
+
+def _resolve_path(path, base_dir):
+    if os.path.isabs(path):
+        return path
+    return os.path.join(base_dir, path)
+
+
+def _flag(spec, key):
+    """功能开关只接受 JSON 布尔值：bool("false") 为 True，字符串会把显式关闭的功能部署出来"""
+    value = spec.get(key, False)
+    if not isinstance(value, bool):
+        raise ValueError(f"{key} must be true or false, got {value!r}")
+    return value
+
+
+def resolve_tenant(entry, defaults=None, base_dir=PROJECT_DIR):
+    """将一个清单条目（与 defaults 合并）解析为校验过的 TenantConfig"""
+    spec = {**(defaults or {}), **entry}
+    unknown = sorted(set(spec) - MANIFEST_KEYS)
+    if unknown:
+        raise ValueError(f"Unknown tenants manifest keys: {', '.join(unknown)}")
+    if not spec.get("tenant_name"):
+        raise ValueError("Every tenants manifest entry needs a tenant_name")
+
+    tenant_name = spec["tenant_name"]
+    language = spec.get("language", "English (US)")
+    region_key = resolve_region_key(language)
+    enable_screenpop = _flag(spec, "enable_screenpop")
+    enable_survey = _flag(spec, "enable_survey")
+
+    ivr_data = get_ivr_messages(region_key)
+    if spec.get("hours_of_operation_file"):
+        hours_of_operation = load_catalog(_resolve_path(spec["hours_of_operation_file"], base_dir))
+    else:
+        hours_of_operation = get_hours_of_operation(region_key)
+
+    survey_messages = {}
+    if enable_survey:
+        survey_data = get_survey_messages(region_key)
+        survey_messages = {
+            "surveyMessage": survey_data.get("surveyMessage", ""),
+            "surveyMessageFeedback": survey_data.get("surveyMessageFeedback", ""),
+            "results": survey_data.get("results", {}),
+        }
+
+    agents_csv = _resolve_path(spec["agents_csv"], base_dir) if spec.get("agents_csv") else AGENTS_CSV
+
+    return TenantConfig(
+        tenant_name=tenant_name,
+        stack_name=spec.get("stack_name") or sanitize_stack_name(tenant_name),
+        tenant_description=spec.get("tenant_description", ""),
+        connect_instance_arn=spec.get("connect_instance_arn", ""),
+        security_profile_arn=spec.get("security_profile_arn", ""),
+        tts_voice=spec.get("tts_voice") or get_default_voice(language) or "",
+        selected_language=language,
+        language_region_key=region_key,
+        ivr_messages={k: ivr_data.get(k, "") for k in IVR_MESSAGE_KEYS},
+        hours_of_operation=hours_of_operation,
+        enable_screenpop=enable_screenpop,
+        enable_survey=enable_survey,
+        screenpop_translations=get_screenpop_translations(region_key) if enable_screenpop else {},
+        survey_messages=survey_messages,
+        agents=load_agents(tenant_name, agents_csv),
+        agent_directory_preload=_flag(spec, "agent_directory_preload"),
+        agent_name_shared_cache=_flag(spec, "agent_name_shared_cache"),
+        lambda_performance_profile=spec.get("lambda_performance_profile", DEFAULT_LAMBDA_PROFILE),
+        stack_layout=spec.get("stack_layout", "auto"),
+        agents_per_shard=int(spec.get("agents_per_shard", DEFAULT_AGENTS_PER_SHARD)),
+        agent_provisioning=spec.get("agent_provisioning", "cloudformation"),
+    ).validate()
+
+
+def resolve_manifest(path):
+    """读取清单并返回 [TenantConfig, ...]；Stack 名称重复时报错"""
+    data = load_manifest(path)
+    base_dir = os.path.dirname(os.path.abspath(path))
+    defaults = data.get("defaults", {})
+    configs = []
+    errors = []
+    for index, entry in enumerate(data["tenants"]):
+        try:
+            configs.append(resolve_tenant(entry, defaults, base_dir))
+        except ValueError as e:
+            errors.append(f"tenants[{index}] ({entry.get('tenant_name', '?')}): {e}")
+
+    seen = {}
+    for config in configs:
+        if config.stack_name in seen:
+            errors.append(f"stack_name '{config.stack_name}' used by both "
+                          f"'{seen[config.stack_name]}' and '{config.tenant_name}'")
+        seen[config.stack_name] = config.tenant_name
+
+    if errors:
+        raise ValueError("Invalid tenants manifest:\n" + "\n".join(errors))
+    return configs
@@ -5,55 +5,89 @@ Amazon Connect Voice Channel CLI Deployment Tool
 """
 
 import os
+import re
 import sys
 import csv
 import json
+import time
+import hashlib
+import shlex
 import shutil
+import argparse
+import contextlib
 import subprocess
-
-import boto3
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from connect_cdk_voice_channel.catalogs import (
+    AGENTS_CSV,
+    DEFAULT_LAMBDA_PROFILE,
+    LAMBDA_PROFILES_FILE,
+    get_hours_of_operation,
+    get_ivr_messages,
+    get_screenpop_translations,
+    get_survey_messages,
+    iter_agent_rows,
+    load_agents,
+    load_languages,
+    resolve_region_key,
+    sanitize_stack_name,
+)
+from connect_cdk_voice_channel.inventory import (
+    get_inventory, get_stack_resources, invalidate, invalidate_stacks, search_resources)
+from connect_cdk_voice_channel.parameterized import (
+    PARAMETERIZED_STACK_NAME, PARAMETERIZED_TEMPLATE_CONTEXT_KEY, ineligible_reason, template_parameters)
+from connect_cdk_voice_channel.tenant_manifest import resolve_manifest
+from connect_cdk_voice_channel.template_diff import (
+    STABLE_STACK_STATUSES,
+    HotswapNotSupported,
+    diff_stacks,
+    flow_content_changes,
+    get_deployed_template,
+    read_assembly_templates,
+    resolve_intrinsics,
+    template_hash,
+)
+from connect_cdk_voice_channel.tenant_config import (
+    AGENT_SHARD_THRESHOLD,
+    PROJECT_DIR,
+    TENANT_CONFIG_CONTEXT_KEY,
+    TENANT_CONFIG_DIR,
+    TenantConfig,
+)
 
 # ─── 常量 ───────────────────────────────────────────────────────────────────
 
-EXAMPLES_DIR = "examples"
-AGENTS_CSV = os.path.join(EXAMPLES_DIR, "agents", "agents.csv")
-LANGUAGES_CSV = os.path.join(EXAMPLES_DIR, "languages", "languages_neural.csv")
-FLOWS_DIR = os.path.join(EXAMPLES_DIR, "flows")
-HOP_DIR = os.path.join(EXAMPLES_DIR, "hoursofoperation")
-
-IVR_MESSAGES_FILE = os.path.join(FLOWS_DIR, "welcome_message_flow", "ivr_messages.json")
-SURVEY_MESSAGES_FILE = os.path.join(FLOWS_DIR, "survey_message_flow", "survey_messages.json")
-SCREENPOP_TRANSLATIONS_FILE = os.path.join(FLOWS_DIR, "screenpop_message_flow", "screenpop_translations.json")
-
-# 语言名称到区域 key 的映射（用于选取 IVR/Survey 消息和营业时间文件）
-LANGUAGE_REGION_MAP = {
-    "English": "us",
-    "Chinese (Cantonese)": "hk",
-    "Chinese (Mandarin)": "cn",
-    "Chinese": "cn",
-    "German": "de",
-    "Japanese": "jp",
-    "Korean": "ko",
-    "French": "fr",
-    "Spanish": "es",
-    "Arabic": "ar",
-    "Portuguese": "pt",
-    "Italian": "it",
-}
-
-HOP_REGION_MAP = {
-    "us": os.path.join(HOP_DIR, "hours_of_operation_us.json"),
-    "cn": os.path.join(HOP_DIR, "hours_of_operation_hk.json"),
-    "hk": os.path.join(HOP_DIR, "hours_of_operation_hk.json"),
-    "de": os.path.join(HOP_DIR, "hours_of_operation_de.json"),
-    "jp": os.path.join(HOP_DIR, "hours_of_operation_us.json"),
-    "ko": os.path.join(HOP_DIR, "hours_of_operation_us.json"),
-    "fr": os.path.join(HOP_DIR, "hours_of_operation_us.json"),
-    "es": os.path.join(HOP_DIR, "hours_of_operation_us.json"),
-    "ar": os.path.join(HOP_DIR, "hours_of_operation_dubai.json"),
-    "pt": os.path.join(HOP_DIR, "hours_of_operation_us.json"),
-    "it": os.path.join(HOP_DIR, "hours_of_operation_us.json"),
-}
+# 示例目录路径、语言/营业时间映射以及目录数据读取函数与 app.py 共用，
+# 定义在 connect_cdk_voice_channel/catalogs.py
+
+# 步骤 1（以及批量部署前）为 Agent 安全配置文件授予的权限
+AGENT_SECURITY_PROFILE_PERMISSIONS = [
+    "BasicAgentAccess",
+    "OutboundCallAccess",
+    "CustomerProfiles.Create",
+    "CustomerProfiles.Edit",
+    "CustomerProfiles.View",
+    "CustomViews.Access",
+]
+
+# cdk deploy --concurrency：分层布局下可并行部署的 Stack 数量
+DEPLOY_CONCURRENCY = 8
+
+# 重名协调时并发列举 / 删除 Connect 资源的线程数
+RECONCILE_WORKERS = 8
+
+# deploy 先 synth 到该目录，与已部署模板比较后再以 --app 直接部署其中有变更的 Stack
+SYNTH_OUT_DIR = os.path.join(PROJECT_DIR, "cdk.out")
+
+# deploy --manifest：每个租户的工作目录（配置、cdk.out、日志）与汇总报告所在目录，以及默认并行数
+FLEET_DIR = os.path.join(PROJECT_DIR, ".fleet")
+DEFAULT_FLEET_WORKERS = 4
+FLEET_REPORT_FIELDS = ["tenant_name", "stacks", "status", "seconds", "message", "log"]
+
+# deploy --manifest --parameterized：参数化模板只 synth 一次到该目录；逐个租户 CloudFormation 部署的等待上限
+TEMPLATE_OUT_DIR = os.path.join(FLEET_DIR, "template", "cdk.out")
+STACK_WAIT_DELAY = 10
+STACK_WAIT_MAX_ATTEMPTS = 360
 
 
 # ─── 工具函数 ────────────────────────────────────────────────────────────────
@@ -79,117 +113,118 @@ def load_json(path):
         return json.load(f)
 
 
-def save_json(data, path):
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
-
-
-def copy_file(src, dst):
-    shutil.copyfile(src, dst)
-
-
-def load_languages_csv():
-    """加载语言 CSV，返回 [{LanguageName, LanguageCode, Voice, Gender}, ...]"""
-    rows = []
-    with open(LANGUAGES_CSV, "r", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            rows.append(row)
-    return rows
-
-
-def get_ivr_messages(region_key):
-    """从整合的 ivr_messages.json 中按 language key 获取 IVR 消息"""
-    all_msgs = load_json(IVR_MESSAGES_FILE)
-    return all_msgs.get(region_key, all_msgs["us"])
-
-
-def get_survey_messages(region_key):
-    """从整合的 survey_messages.json 中按 language key 获取 Survey 消息"""
-    all_msgs = load_json(SURVEY_MESSAGES_FILE)
-    return all_msgs.get(region_key, all_msgs["us"])
-
-
-def get_screenpop_translations(region_key):
-    """从 screenpop_translations.json 中按 language key 获取弹屏界面翻译"""
-    all_translations = load_json(SCREENPOP_TRANSLATIONS_FILE)
-    return all_translations.get(region_key, all_translations["us"])
+def get_stack_managed_arns(stack_names):
+    """获取租户各 CloudFormation Stack 已管理的资源物理 ID（Connect 资源为 ARN）。
 
+    用于在重名协调时区分：由本租户 Stack 管理的同名资源交给 CloudFormation 就地更新，
+    不属于这些 Stack 的同名资源才需要删除后重建。
+    """
+    import boto3
 
-def sanitize_username_token(name):
-    """将租户名转换为合法的用户名片段（Connect Username 允许 [A-Za-z0-9_@.-]）。"""
-    import re
-    token = re.sub(r"[^A-Za-z0-9_@.\-]", "", name.replace(" ", ""))
-    return token or "Tenant"
+    cfn = boto3.client("cloudformation")
+    managed = set()
+    for stack_name in stack_names:
+        for r in get_stack_resources(cfn, stack_name):
+            if r.get("PhysicalResourceId"):
+                managed.add(r["PhysicalResourceId"])
+    return managed
 
 
-def prepare_agents_csv(tenant_name):
-    """复制 agents.csv 到工作目录，并将 LastName / Username 中的 'Test' 替换为租户名。
+def find_legacy_agent_ids(stack_names):
+    """返回旧版本按行序号命名（CfnUser<n>）的座席 {用户名: 逻辑 ID}。
 
-    这样不同租户或多次部署之间座席用户名不会重复（Connect 实例内用户名必须唯一），
-    避免创建座席时因重名而失败。返回处理后的用户名列表（供重名协调使用）。
+    座席逻辑 ID 改为由用户名派生后，已部署的座席沿用原来的逻辑 ID（写入租户配置的 legacy_agent_ids），
+    CloudFormation 不会删除重建这些用户，其 Connect 用户 ID 与密码保持不变。
+    只有包含 CfnUser<n> 资源的 Stack 才需要读取已部署的模板以获取用户名。
     """
-    if not os.path.exists(AGENTS_CSV):
-        return []
+    import boto3
 
-    username_token = sanitize_username_token(tenant_name)
-    rows = []
-    usernames = []
-    with open(AGENTS_CSV, "r", encoding="utf-8", newline="") as f:
-        reader = csv.DictReader(f)
-        fieldnames = reader.fieldnames
-        for row in reader:
-            if row.get("LastName"):
-                row["LastName"] = row["LastName"].replace("Test", tenant_name)
-            if row.get("Username"):
-                row["Username"] = row["Username"].replace("Test", username_token)
-            rows.append(row)
-            if row.get("Username"):
-                usernames.append(row["Username"])
-
-    with open("agents.csv", "w", encoding="utf-8", newline="") as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(rows)
+    cfn = boto3.client("cloudformation")
+    legacy = {}
+    for stack_name in stack_names:
+        logical_ids = {r["LogicalResourceId"] for r in get_stack_resources(cfn, stack_name)
+                       if re.match(r"^CfnUser\d+$", r.get("LogicalResourceId", ""))}
+        if not logical_ids:
+            continue
+        template = cfn.get_template(StackName=stack_name)["TemplateBody"]
+        if isinstance(template, str):
+            template = json.loads(template)
+        for logical_id in logical_ids:
+            resource = template.get("Resources", {}).get(logical_id, {})
+            username = resource.get("Properties", {}).get("Username")
+            if resource.get("Type") == "AWS::Connect::User" and isinstance(username, str):
+                legacy[username] = logical_id
+    return legacy
+
+
+def find_fleet_stacks(stack_names):
+    """一次列举账户中的 Stack，返回 {租户 Stack 名称: [已部署的单体 Stack 或 Core / Flows / Agents<n>]}"""
+    import boto3
+
+    patterns = {name: re.compile(rf"^{re.escape(name)}(-(Core|Flows|Agents\d+))?$") for name in stack_names}
+    found = {name: [] for name in stack_names}
+    cfn = boto3.client("cloudformation")
+    paginator = cfn.get_paginator("list_stacks")
+    for page in paginator.paginate():
+        for summary in page.get("StackSummaries", []):
+            if summary.get("StackStatus") == "DELETE_COMPLETE":
+                continue
+            for name, pattern in patterns.items():
+                if pattern.match(summary["StackName"]):
+                    found[name].append(summary["StackName"])
+    return found
 
-    return usernames
 
+def find_tenant_stacks(stack_name):
+    """返回已部署的租户 Stack 名称：单体 Stack，或分层布局的 Core / Flows / Agents<n>"""
+    return find_fleet_stacks([stack_name])[stack_name]
 
-def get_stack_managed_arns(stack_name):
-    """获取当前 CloudFormation Stack 已管理的资源物理 ID（Connect 资源为 ARN）。
 
-    用于在重名协调时区分：由本 Stack 管理的同名资源交给 CloudFormation 就地更新，
-    不属于本 Stack 的同名资源才需要删除后重建。
-    """
-    cfn = boto3.client("cloudformation")
-    managed = set()
-    try:
-        paginator = cfn.get_paginator("list_stack_resources")
-        for page in paginator.paginate(StackName=stack_name):
-            for r in page.get("StackResourceSummaries", []):
-                pid = r.get("PhysicalResourceId")
-                if pid:
-                    managed.add(pid)
-    except Exception:
-        # Stack 尚不存在（首次部署）——返回空集合
-        pass
-    return managed
+def pin_stack_layouts(configs):
+    """按已部署的 Stack 固定各租户的布局（一次列举账户中的 Stack），返回 {Stack 名称: 错误说明}。
 
-
-def reconcile_existing_resources(connect_instance_arn, stack_name, tenant_name, agent_usernames):
+    固定后的布局写入租户配置并传给 CDK，已部署的租户不会因座席数量跨过阈值而隐式切换布局
+    （新布局的 Stack 会与旧 Stack 争用同名 Connect 资源，重名协调还可能删除旧 Stack 的资源）。
+    """
+    deployed = find_fleet_stacks([config.stack_name for config in configs])
+    errors = {}
+    for config in configs:
+        requested = config.stack_layout
+        try:
+            config.pin_stack_layout(deployed[config.stack_name])
+        except ValueError as e:
+            errors[config.stack_name] = (
+                f"{e}。布局之间没有自动迁移，请先 destroy 该租户的现有 Stack 后再以新布局部署")
+            continue
+        if (requested == "auto" and config.stack_layout == "single"
+                and len(config.stack_agents) > AGENT_SHARD_THRESHOLD):
+            print(f"  ⚠ {config.tenant_name}: 座席数量 {len(config.stack_agents)} 已超过 {AGENT_SHARD_THRESHOLD}，"
+                  f"但该租户已按单体布局部署，布局保持不变（接近 CloudFormation 500 个资源上限时，"
+                  f"请 destroy 后以 stack_layout=layered 重新部署，或改用 agent_provisioning=api）")
+    return errors
+
+
+def reconcile_existing_resources(connect_instance_arn, stack_names, tenant_name, agent_usernames):
     """删除与目标资源同名、但不由当前 Stack 管理的 Connect 资源。
 
     - 由当前 Stack 管理的同名资源会跳过：CloudFormation 会对其执行就地更新。
     - 不属于当前 Stack 的同名资源（例如手动创建或历史遗留）会被删除，
       以便 cdk deploy 顺利创建，实现「有重名则更新、无重名则创建」的效果。
 
-    删除顺序遵循依赖关系：座席 → 路由配置 → 队列 → 营业时间 → 联系流 → Lambda。
+    同名资源通过 Connect Search* API 按名称定向查询（座席用户名分批以 OR 条件组合），
+    成本与租户规模成正比而不是与实例规模成正比；各类查询与 Stack 资源查询在线程池中并发执行。
+    删除按依赖关系分层：
+    座席 → 路由配置 → 队列 → 营业时间 → 联系流（入站流先于被引用的流）→ Lambda，
+    同一层内并发删除，上一层全部完成后才进入下一层。
     整个过程为尽力而为（best-effort），单个失败不会中断部署。
     """
+    import boto3
+
     instance_id = connect_instance_arn.split("/")[-1]
     connect_client = boto3.client("connect")
-    managed = get_stack_managed_arns(stack_name)
+    lambda_client = boto3.client("lambda")
 
+    usernames = set(agent_usernames)
     prefix = f"{tenant_name} "
     queue_name = f"{tenant_name} Queue"
     routing_profile_name = f"{tenant_name} Routing Profile"
@@ -200,107 +235,85 @@ def reconcile_existing_resources(connect_instance_arn, stack_name, tenant_name,
     }
     lambda_name = f"{tenant_name}-GetAgentNameByAgentId"
 
-    print("\n  正在检查并清理同名的历史资源（不影响本 Stack 管理的资源）...")
-
-    # 1. 座席（Users）——必须先于路由配置删除
-    try:
-        paginator = connect_client.get_paginator("list_users")
-        for page in paginator.paginate(InstanceId=instance_id):
-            for u in page.get("UserSummaryList", []):
-                if u.get("Username") in agent_usernames and u.get("Arn") not in managed:
-                    try:
-                        connect_client.delete_user(InstanceId=instance_id, UserId=u["Id"])
-                        print(f"    ↻ 已删除同名座席: {u['Username']}")
-                    except Exception as e:
-                        print(f"    ⚠ 删除座席 {u.get('Username')} 失败: {e}")
-    except Exception as e:
-        print(f"    ⚠ 列举座席失败: {e}")
-
-    # 2. 路由配置（Routing Profile）——引用队列，需先于队列删除
-    try:
-        paginator = connect_client.get_paginator("list_routing_profiles")
-        for page in paginator.paginate(InstanceId=instance_id):
-            for rp in page.get("RoutingProfileSummaryList", []):
-                if rp.get("Name") == routing_profile_name and rp.get("Arn") not in managed:
-                    try:
-                        connect_client.delete_routing_profile(
-                            InstanceId=instance_id, RoutingProfileId=rp["Id"])
-                        print(f"    ↻ 已删除同名路由配置: {rp['Name']}")
-                    except Exception as e:
-                        print(f"    ⚠ 删除路由配置失败: {e}")
-    except Exception as e:
-        print(f"    ⚠ 列举路由配置失败: {e}")
-
-    # 3. 队列（Queue）——引用营业时间，需先于营业时间删除
-    try:
-        paginator = connect_client.get_paginator("list_queues")
-        for page in paginator.paginate(InstanceId=instance_id, QueueTypes=["STANDARD"]):
-            for q in page.get("QueueSummaryList", []):
-                if q.get("Name") == queue_name and q.get("Arn") not in managed:
-                    try:
-                        connect_client.delete_queue(InstanceId=instance_id, QueueId=q["Id"])
-                        print(f"    ↻ 已删除同名队列: {q['Name']}")
-                    except Exception as e:
-                        print(f"    ⚠ 删除队列失败: {e}")
-    except Exception as e:
-        print(f"    ⚠ 列举队列失败: {e}")
+    def find_lambda():
+        try:
+            fn = lambda_client.get_function(FunctionName=lambda_name)
+        except Exception:
+            # Lambda 不存在——无需处理
+            return []
+        return [{"Name": lambda_name, "Arn": fn["Configuration"]["FunctionArn"]}]
+
+    def delete_lambda(fn):
+        # 先解除与 Connect 实例的关联（未关联时忽略错误），再删除
+        try:
+            connect_client.disassociate_lambda_function(InstanceId=instance_id, FunctionArn=fn["Arn"])
+        except Exception:
+            pass
+        lambda_client.delete_function(FunctionName=fn["Name"])
+
+    searches = {
+        "座席": ("users", {"names": usernames}),
+        "路由配置": ("routing_profiles", {"names": [routing_profile_name]}),
+        "队列": ("queues", {"names": [queue_name]}),
+        "营业时间": ("hours_of_operations", {"prefix": prefix}),
+        "联系流": ("contact_flows", {"names": flow_names}),
+    }
 
-    # 4. 营业时间（Hours of Operation）
-    try:
-        paginator = connect_client.get_paginator("list_hours_of_operations")
-        for page in paginator.paginate(InstanceId=instance_id):
-            for h in page.get("HoursOfOperationSummaryList", []):
-                if h.get("Name", "").startswith(prefix) and h.get("Arn") not in managed:
-                    try:
-                        connect_client.delete_hours_of_operation(
-                            InstanceId=instance_id, HoursOfOperationId=h["Id"])
-                        print(f"    ↻ 已删除同名营业时间: {h['Name']}")
-                    except Exception as e:
-                        print(f"    ⚠ 删除营业时间失败: {e}")
-    except Exception as e:
-        print(f"    ⚠ 列举营业时间失败: {e}")
+    print("\n  正在检查并清理同名的历史资源（不影响本 Stack 管理的资源）...")
 
-    # 5. 联系流（Contact Flows）——入站流引用其它流，需最先删除
-    try:
-        flows_to_delete = []
-        paginator = connect_client.get_paginator("list_contact_flows")
-        for page in paginator.paginate(InstanceId=instance_id):
-            for cf in page.get("ContactFlowSummaryList", []):
-                if cf.get("Name") in flow_names and cf.get("Arn") not in managed:
-                    flows_to_delete.append(cf)
-        flows_to_delete.sort(key=lambda c: 0 if c["Name"].endswith("Inbound Flow") else 1)
-        for cf in flows_to_delete:
-            try:
-                connect_client.delete_contact_flow(
-                    InstanceId=instance_id, ContactFlowId=cf["Id"])
-                print(f"    ↻ 已删除同名联系流: {cf['Name']}")
-            except Exception as e:
-                print(f"    ⚠ 删除联系流 {cf.get('Name')} 失败: {e}")
-    except Exception as e:
-        print(f"    ⚠ 列举联系流失败: {e}")
+    with ThreadPoolExecutor(max_workers=RECONCILE_WORKERS) as executor:
+        managed_future = executor.submit(get_stack_managed_arns, stack_names)
+        search_futures = {
+            label: executor.submit(search_resources, connect_client, instance_id, kind, **criteria)
+            for label, (kind, criteria) in searches.items()
+        }
+        lambda_future = executor.submit(find_lambda)
+        try:
+            managed = managed_future.result()
+        except Exception as e:
+            # 无法确认哪些资源由 Stack 管理时不能删除任何同名资源
+            raise DeployError(f"获取 Stack 资源列表失败，已中止重名协调: {e}")
 
-    # 6. Lambda 函数（先解除与 Connect 实例的关联，再删除）
-    try:
-        lambda_client = boto3.client("lambda")
-        fn = lambda_client.get_function(FunctionName=lambda_name)
-        fn_arn = fn["Configuration"]["FunctionArn"]
-        if fn_arn not in managed:
-            try:
-                assoc = connect_client.list_lambda_functions(InstanceId=instance_id)
-                for arn in assoc.get("LambdaFunctions", []):
-                    if arn == fn_arn:
-                        connect_client.disassociate_lambda_function(
-                            InstanceId=instance_id, FunctionArn=fn_arn)
-            except Exception:
-                pass
+        found = {"Lambda 函数": lambda_future.result()}
+        for label, future in search_futures.items():
             try:
-                lambda_client.delete_function(FunctionName=lambda_name)
-                print(f"    ↻ 已删除同名 Lambda 函数: {lambda_name}")
+                found[label] = future.result()
             except Exception as e:
-                print(f"    ⚠ 删除 Lambda 函数失败: {e}")
-    except Exception:
-        # Lambda 不存在——无需处理
-        pass
+                print(f"    ⚠ 查询{label}失败: {e}")
+                found[label] = []
+        found = {label: [item for item in items if item.get("Arn") not in managed]
+                 for label, items in found.items()}
+
+        flows = found.get("联系流", [])
+        tiers = [
+            ("座席", found.get("座席", []), "Username",
+             lambda u: connect_client.delete_user(InstanceId=instance_id, UserId=u["Id"])),
+            ("路由配置", found.get("路由配置", []), "Name",
+             lambda rp: connect_client.delete_routing_profile(InstanceId=instance_id, RoutingProfileId=rp["Id"])),
+            ("队列", found.get("队列", []), "Name",
+             lambda q: connect_client.delete_queue(InstanceId=instance_id, QueueId=q["Id"])),
+            ("营业时间", found.get("营业时间", []), "Name",
+             lambda h: connect_client.delete_hours_of_operation(InstanceId=instance_id, HoursOfOperationId=h["Id"])),
+            # 入站流引用 ScreenPop / Survey 流，需先删除
+            ("联系流", [cf for cf in flows if cf["Name"].endswith("Inbound Flow")], "Name",
+             lambda cf: connect_client.delete_contact_flow(InstanceId=instance_id, ContactFlowId=cf["Id"])),
+            ("联系流", [cf for cf in flows if not cf["Name"].endswith("Inbound Flow")], "Name",
+             lambda cf: connect_client.delete_contact_flow(InstanceId=instance_id, ContactFlowId=cf["Id"])),
+            ("Lambda 函数", found["Lambda 函数"], "Name", delete_lambda),
+        ]
+        deleted = False
+        for label, items, name_key, delete in tiers:
+            futures = {executor.submit(delete, item): item for item in items}
+            deleted = deleted or bool(futures)
+            for future in as_completed(futures):
+                name = futures[future].get(name_key)
+                try:
+                    future.result()
+                    print(f"    ↻ 已删除同名{label}: {name}")
+                except Exception as e:
+                    print(f"    ⚠ 删除{label} {name} 失败: {e}")
+    if deleted:
+        invalidate(instance_id)
 
 
 def prompt_input(msg, default=None):
@@ -315,29 +328,12 @@ def prompt_input(msg, default=None):
         print("  ⚠ 不能为空，请重新输入。")
 
 
-def sanitize_stack_name(name):
-    """将任意名称转换为合法的 CDK Stack 名称。
-    规则: /^[A-Za-z][A-Za-z0-9-]*$/
-    尽量保持与原始名称接近。
-    """
-    import re
-    sanitized = name.replace("_", "-").replace(" ", "-")
-    sanitized = re.sub(r"[^A-Za-z0-9-]", "", sanitized)
-    sanitized = re.sub(r"-{2,}", "-", sanitized)
-    sanitized = sanitized.strip("-")
-    # 数字开头时加最小前缀 "S"
-    if sanitized and not sanitized[0].isalpha():
-        sanitized = "S" + sanitized
-    return sanitized if sanitized else "MyTenant"
-
-
 def prompt_tenant_name(msg, default=None):
     """输入租户名称，自动生成合法的 CDK Stack 名称。
     tenant_name: 用户原始输入，用于 Connect 资源命名（Queue、Flow 等前缀）
     stack_name:  符合 CDK 规则的名称，仅用于 CloudFormation Stack ID
     返回 (tenant_name, stack_name)
     """
-    import re
     pattern = re.compile(r"^[A-Za-z][A-Za-z0-9-]*$")
     tenant_name = prompt_input(msg, default)
     if pattern.match(tenant_name):
@@ -368,6 +364,15 @@ def print_summary(label, value):
 
 # ─── 步骤 1: 确认 Amazon Connect 实例 ────────────────────────────────────────
 
+def update_agent_security_profile(connect_client, instance_id, security_profile_id):
+    """为 Agent 安全配置文件授予座席所需的权限（步骤 1 与批量部署共用）"""
+    connect_client.update_security_profile(
+        SecurityProfileId=security_profile_id,
+        InstanceId=instance_id,
+        Permissions=AGENT_SECURITY_PROFILE_PERMISSIONS,
+    )
+
+
 def step1_connect_instance():
     print_header(1, "确认 Amazon Connect 实例")
     print()
@@ -383,6 +388,9 @@ def step1_connect_instance():
         sys.exit(1)
 
     print(f"\n  正在验证 Connect 实例...")
+    # boto3 导入较慢，在输入实例 ARN 之后再导入
+    import boto3
+
     connect_client = boto3.client("connect")
 
     try:
@@ -392,43 +400,20 @@ def step1_connect_instance():
         print(f"    Instance ID: {instance_id}")
         print(f"    Instance ARN: {instance_arn}")
 
-        # 保存 connect.json
-        save_json({"Id": instance_id, "Arn": instance_arn}, "connect.json")
-
-        # 获取 Agent 安全配置文件
-        res = connect_client.list_security_profiles(InstanceId=instance_id)
-        security_profile_arn = None
-        security_profile_id = None
-        for item in res["SecurityProfileSummaryList"]:
-            if item["Name"] == "Agent":
-                security_profile_arn = item["Arn"]
-                security_profile_id = item["Id"]
-                save_json(
-                    {"Id": item["Id"], "Arn": item["Arn"], "Name": item["Name"]},
-                    "security_profile.json",
-                )
-                break
-
-        if not security_profile_arn:
+        # 获取 Agent 安全配置文件（只列举安全配置文件，结果保存在实例资源快照中）
+        agent_profile = get_inventory(connect_client, instance_id, kinds=["security_profiles"]).find(
+            "security_profiles", "Agent")
+        if not agent_profile:
             print("  ✗ 未找到 Agent 安全配置文件")
             sys.exit(1)
 
+        security_profile_arn = agent_profile["Arn"]
+        security_profile_id = agent_profile["Id"]
         print(f"    Security Profile ARN: {security_profile_arn}")
 
         # 更新安全配置文件权限
         try:
-            connect_client.update_security_profile(
-                SecurityProfileId=security_profile_id,
-                InstanceId=instance_id,
-                Permissions=[
-                    "BasicAgentAccess",
-                    "OutboundCallAccess",
-                    "CustomerProfiles.Create",
-                    "CustomerProfiles.Edit",
-                    "CustomerProfiles.View",
-                    "CustomViews.Access",
-                ],
-            )
+            update_agent_security_profile(connect_client, instance_id, security_profile_id)
             print("  ✓ Agent 安全配置文件权限已更新")
         except Exception as e:
             print(f"  ⚠ 更新安全配置文件权限失败: {e}")
@@ -450,7 +435,7 @@ def step2_language_voice():
     print_header(2, "选择 IVR 语言和语音")
     print()
 
-    languages = load_languages_csv()
+    languages = load_languages()
 
     # 获取唯一语言名称列表
     lang_names = []
@@ -531,12 +516,7 @@ def step2_language_voice():
     print(f"  使用语音: {first_voice} ({voices[0]['Gender'].strip()})")
 
     # 确定区域映射 — 优先匹配更具体的名称（如 "Chinese (Mandarin)" 优先于 "Chinese"）
-    region_key = "us"  # 默认
-    best_match_len = 0
-    for key, value in LANGUAGE_REGION_MAP.items():
-        if key.lower() in selected_lang.lower() and len(key) > best_match_len:
-            region_key = value
-            best_match_len = len(key)
+    region_key = resolve_region_key(selected_lang)
 
     if not prompt_yes_no(f"\n  确认使用 {selected_lang} / {first_voice}?"):
         print("  已取消。")
@@ -556,12 +536,50 @@ def step3_screenpop():
     print()
 
     enable = prompt_yes_no("  是否启用弹屏功能?", "y")
+    # 座席姓名查询 Lambda（GetAgentNameByAgentId）的可选项，写入租户配置
+    agent_name_options = {
+        "agent_directory_preload": False,
+        "agent_name_shared_cache": False,
+        "lambda_performance_profile": DEFAULT_LAMBDA_PROFILE,
+    }
     if enable:
         print("  ✓ 将部署 ScreenPop 联系流")
+        # 座席目录预加载：Lambda 冷启动时批量加载实例全部座席姓名并定时增量刷新，
+        # 适合座席数量较多、弹屏调用频繁的实例
+        preload_directory = prompt_yes_no("  是否为座席姓名查询启用实例级目录预加载?", "n")
+        if preload_directory:
+            print("  ✓ 将启用座席目录预加载（ListUsers/SearchUsers + 每 5 分钟增量刷新）")
+        # 共享缓存表：Lambda 并发扩容到大量容器时，一次查询结果可被所有容器复用
+        shared_cache = prompt_yes_no("  是否创建跨容器共享的座席姓名缓存表 (DynamoDB)?", "n")
+        if shared_cache:
+            print("  ✓ 将创建带 TTL 的 DynamoDB 缓存表并授权 Lambda 读写")
+        agent_name_options.update({
+            "agent_directory_preload": preload_directory,
+            "agent_name_shared_cache": shared_cache,
+            "lambda_performance_profile": prompt_lambda_performance_profile(),
+        })
     else:
         print("  ✓ 跳过 ScreenPop 部署")
 
-    return enable
+    return enable, agent_name_options
+
+
+def prompt_lambda_performance_profile():
+    """选择 GetAgentNameByAgentId 的性能配置档（见 performance_profiles.json）"""
+    profiles = load_json(LAMBDA_PROFILES_FILE)
+    names = list(profiles)
+    print("\n  座席姓名查询 Lambda 性能配置档:")
+    for i, name in enumerate(names, 1):
+        print(f"    {i}. {name} — {profiles[name].get('description', '')}")
+    default_idx = names.index(DEFAULT_LAMBDA_PROFILE) + 1 if DEFAULT_LAMBDA_PROFILE in names else 1
+    val = prompt_input("  请选择配置档编号", str(default_idx))
+    try:
+        idx = int(val) - 1
+    except ValueError:
+        idx = names.index(val) if val in names else default_idx - 1
+    name = names[idx] if 0 <= idx < len(names) else names[default_idx - 1]
+    print(f"  ✓ 使用性能配置档: {name}")
+    return name
 
 
 # ─── 步骤 4: 确认满意度评价功能 ──────────────────────────────────────────────
@@ -574,8 +592,7 @@ def step4_survey(region_key):
     print()
 
     enable = prompt_yes_no("  是否启用满意度评价功能?", "y")
-    survey_message = ""
-    survey_feedback = ""
+    survey_messages = {}
 
     if enable:
         # 从整合的 survey_messages.json 中按 language key 获取消息
@@ -593,59 +610,159 @@ def step4_survey(region_key):
                 survey_results.get(k, "") for k in ("1", "2", "3", "-1"))
             print(f"    评分文案: {labels}")
 
-        save_json(
-            {
-                "surveyMessage": survey_message,
-                "surveyMessageFeedback": survey_feedback,
-                "results": survey_results,
-            },
-            "survey_message.json",
-        )
+        survey_messages = {
+            "surveyMessage": survey_message,
+            "surveyMessageFeedback": survey_feedback,
+            "results": survey_results,
+        }
     else:
         print("  ✓ 跳过 Survey 部署")
 
-    return enable, survey_message, survey_feedback
+    return enable, survey_messages
 
 
-# ─── 准备流程文件 ─────────────────────────────────────────────────────────────
+# ─── 部署确认和执行 ──────────────────────────────────────────────────────────
 
-def prepare_flow_files(enable_screenpop, enable_survey):
-    """根据功能选择复制对应的流程模板文件"""
-    if enable_screenpop and enable_survey:
-        src = os.path.join(FLOWS_DIR, "ivr_survey_screenpop_flow.json")
-    elif enable_survey:
-        src = os.path.join(FLOWS_DIR, "ivr_survey_flow.json")
-    elif enable_screenpop:
-        src = os.path.join(FLOWS_DIR, "ivr_screenpop_flow.json")
-    else:
-        src = os.path.join(FLOWS_DIR, "welcome_message_flow", "welcome_message_flow.json")
+class DeployError(Exception):
+    """部署失败（消息面向用户）"""
 
-    copy_file(src, "inbound_flow.json")
 
-    if enable_survey:
-        copy_file(
-            os.path.join(FLOWS_DIR, "survey_message_flow", "survey_message_flow.json"),
-            "survey_message_flow.json",
-        )
+def run_cdk(args, tenant_config, config_path=None, log_file=None, cwd=None):
+    """序列化租户配置并以 `cdk -c tenant_config=<path>` 运行 CDK，返回退出码。
 
-    if enable_screenpop:
-        copy_file(
-            os.path.join(FLOWS_DIR, "screenpop_message_flow", "screenpop_message_flow.json"),
-            "screenpop_message_flow.json",
+    配置文件只在本次 CDK 子进程运行期间存在（其中包含座席初始密码）。
+    log_file 不为空时 CDK 的输出写入该文件（批量部署时每个租户一个日志）。
+    cwd 为 CDK 的工作目录（批量部署时为 prepare_fleet_work_dir 准备的租户目录），默认为当前目录。
+    """
+    config_path = os.path.abspath(tenant_config.save(config_path))
+    try:
+        if log_file is not None:
+            log_file.flush()
+        result = subprocess.run(
+            [get_cdk_command()] + args + ["-c", f"{TENANT_CONFIG_CONTEXT_KEY}={config_path}"],
+            stdout=log_file,
+            stderr=subprocess.STDOUT if log_file is not None else None,
+            cwd=cwd,
         )
+        return result.returncode
+    finally:
+        if os.path.exists(config_path):
+            os.remove(config_path)
 
 
-# ─── 部署确认和执行 ──────────────────────────────────────────────────────────
+def synth_changed_stacks(tenant_config, outdir=SYNTH_OUT_DIR, config_path=None, log_file=None, cwd=None):
+    """cdk synth 到 outdir，返回 {有变更的 Stack 名称: (合成的模板, 已部署模板或 None)}。
+
+    设置环境变量 FORCE_DEPLOY=1 时不做比较，返回全部 Stack。
+    """
+    import boto3
+
+    stack_names = tenant_config.stack_names
+    print("\n  正在合成 CloudFormation 模板...")
+    returncode = run_cdk(["synth", *stack_names, "--quiet", "--output", outdir], tenant_config,
+                         config_path, log_file, cwd)
+    if returncode != 0:
+        raise DeployError("CDK 合成失败")
+    templates = read_assembly_templates(outdir)
+    if os.environ.get("FORCE_DEPLOY") == "1":
+        return {name: (templates.get(name), None) for name in stack_names}
+
+    deployed = diff_stacks(boto3.client("cloudformation"),
+                           {name: templates[name] for name in stack_names if name in templates})
+    return {name: (templates.get(name), deployed.get(name)) for name in stack_names
+            if name in deployed or name not in templates}
+
+
+def plan_hotswap(changes):
+    """所有有变更的 Stack 都只有联系流内容不同时，返回 {Stack 名称: {逻辑 ID: 新 Content}}，否则返回 None"""
+    plan = {}
+    for stack_name, (template, deployed) in changes.items():
+        flows = flow_content_changes(deployed, template) if template is not None else None
+        if not flows:
+            return None
+        plan[stack_name] = flows
+    return plan
+
+
+def hotswap_contact_flows(tenant_config, plan):
+    """解析新的联系流内容并通过 UpdateContactFlowContent 直接更新，成功返回 True。
+
+    先解析全部联系流（任何一个无法解析则不做任何更新并返回 False），再逐个更新。
+    """
+    import boto3
+
+    cfn = boto3.client("cloudformation")
+    connect_client = boto3.client("connect")
+
+    def list_exports():
+        return {e["Name"]: e["Value"] for e in _list_exports(cfn)}
+
+    updates = []
+    exports = list_exports
+    try:
+        for stack_name, flows in plan.items():
+            stack_arn = cfn.describe_stacks(StackName=stack_name)["Stacks"][0]["StackId"]
+            _, partition, _, region, account = stack_arn.split(":")[:5]
+            context = {
+                "resources": {r["LogicalResourceId"]: (r["ResourceType"], r.get("PhysicalResourceId"))
+                              for r in get_stack_resources(cfn, stack_name)},
+                "exports": exports,
+                "pseudo": {
+                    "AWS::Partition": partition,
+                    "AWS::Region": region,
+                    "AWS::AccountId": account,
+                    "AWS::StackName": stack_name,
+                    "AWS::StackId": stack_arn,
+                    "AWS::URLSuffix": "amazonaws.com.cn" if partition == "aws-cn" else "amazonaws.com",
+                },
+            }
+            for logical_id, content in flows.items():
+                flow_arn = context["resources"].get(logical_id, (None, None))[1]
+                if not flow_arn:
+                    raise HotswapNotSupported(f"{logical_id} is not deployed")
+                updates.append((stack_name, logical_id, flow_arn, resolve_intrinsics(content, context)))
+            exports = context["exports"]
+    except HotswapNotSupported as e:
+        print(f"  ℹ 无法热更新（{e}），改为完整部署。")
+        return False
+
+    print(f"\n  仅联系流内容有变更，正在热更新 {len(updates)} 个联系流...")
+    drift = []
+    for stack_name, logical_id, flow_arn, content in updates:
+        try:
+            connect_client.update_contact_flow_content(
+                InstanceId=tenant_config.connect_instance_id,
+                ContactFlowId=flow_arn.split("/")[-1],
+                Content=content,
+            )
+        except Exception as e:
+            print(f"  ✗ 热更新 {stack_name}/{logical_id} 失败: {e}，改为完整部署。")
+            return False
+        drift.append(f"{stack_name}/{logical_id}")
+        print(f"    ↻ 已更新联系流: {stack_name}/{logical_id}")
+
+    print("\n  ✓ 热更新完成。以下资源的实际内容已与 CloudFormation 模板不一致（漂移），")
+    print("    下次完整部署（HOTSWAP 未设置）时会同步到 Stack：")
+    for name in drift:
+        print(f"    - {name}")
+    return True
+
+
+def _list_exports(cfn):
+    for page in cfn.get_paginator("list_exports").paginate():
+        yield from page.get("Exports", [])
+
 
 def deploy(
     connect_instance_arn,
+    security_profile_arn,
     tts_voice,
     selected_lang,
     region_key,
     enable_screenpop,
     enable_survey,
-    survey_message,
-    survey_feedback,
+    survey_messages,
+    agent_name_options=None,
 ):
     print(f"\n{'='*60}")
     print("  部署配置总览")
@@ -659,105 +776,96 @@ def deploy(
     print_summary("Connect 实例 ARN", connect_instance_arn)
     print_summary("TTS 语音", tts_voice)
     print_summary("弹屏功能", "启用" if enable_screenpop else "禁用")
+    agent_name_options = agent_name_options or {}
+    if enable_screenpop:
+        print_summary("座席目录预加载",
+                      "启用" if agent_name_options.get("agent_directory_preload") else "禁用")
+        print_summary("共享姓名缓存表",
+                      "启用" if agent_name_options.get("agent_name_shared_cache") else "禁用")
+        print_summary("Lambda 性能配置档",
+                      agent_name_options.get("lambda_performance_profile", DEFAULT_LAMBDA_PROFILE))
     print_summary("满意度评价", "启用" if enable_survey else "禁用")
     print_summary("租户名称", tenant_name)
     if stack_name != tenant_name:
         print_summary("CDK Stack 名称", stack_name)
     print_summary("座席文件", AGENTS_CSV)
+    agent_provisioning = "api" if prompt_yes_no(
+        "  是否在部署后通过 Connect API 批量开通座席（座席数量较多时推荐，座席不由 CloudFormation 管理）?",
+        "n") else "cloudformation"
 
     # 加载 IVR 消息
     ivr_data = get_ivr_messages(region_key)
+    ivr_messages = {
+        "welcomeMessage": ivr_data.get("welcomeMessage", ""),
+        "openHourMessage": ivr_data.get("openHourMessage", ""),
+        "errorMessage": ivr_data.get("errorMessage", ""),
+    }
 
-    welcome_msg = ivr_data.get("welcomeMessage", "")
-    open_hour_msg = ivr_data.get("openHourMessage", "")
-    error_msg = ivr_data.get("errorMessage", "")
-
-    save_json(
-        {"welcomeMessage": welcome_msg, "openHourMessage": open_hour_msg, "errorMessage": error_msg},
-        "ivr_messages.json",
-    )
-
-    print_summary("欢迎消息", welcome_msg[:40] + "...")
-    print_summary("非工作时间消息", open_hour_msg[:40] + "...")
+    print_summary("欢迎消息", ivr_messages["welcomeMessage"][:40] + "...")
+    print_summary("非工作时间消息", ivr_messages["openHourMessage"][:40] + "...")
 
     # 加载弹屏翻译
+    screenpop_translations = {}
     if enable_screenpop:
         screenpop_translations = get_screenpop_translations(region_key)
-        save_json(screenpop_translations, "screenpop_translations.json")
         print_summary("弹屏界面语言", f"已设置为 {region_key} 区域语言")
 
     # 加载 HOP
-    hop_file = HOP_REGION_MAP.get(region_key, HOP_REGION_MAP["us"])
-    if os.path.exists(hop_file):
-        copy_file(hop_file, "hours_of_operation.json")
-    else:
-        copy_file(HOP_REGION_MAP["us"], "hours_of_operation.json")
-
-    hop_data = load_json("hours_of_operation.json")
+    hop_data = get_hours_of_operation(region_key)
     print_summary("营业时间", f"{hop_data['name']} ({hop_data['timeZone']})")
 
-    # 准备流程文件
-    prepare_flow_files(enable_screenpop, enable_survey)
+    # 读取 agents.csv（将 LastName / Username 中的 'Test' 替换为租户名）
+    agents = load_agents(tenant_name)
+
+    tenant_config = TenantConfig(
+        tenant_name=tenant_name,
+        stack_name=stack_name,
+        tenant_description=tenant_description,
+        connect_instance_arn=connect_instance_arn,
+        security_profile_arn=security_profile_arn,
+        tts_voice=tts_voice,
+        selected_language=selected_lang,
+        language_region_key=region_key,
+        ivr_messages=ivr_messages,
+        hours_of_operation=hop_data,
+        enable_screenpop=enable_screenpop,
+        enable_survey=enable_survey,
+        screenpop_translations=screenpop_translations,
+        survey_messages=survey_messages,
+        agents=agents,
+        agent_directory_preload=agent_name_options.get("agent_directory_preload", False),
+        agent_name_shared_cache=agent_name_options.get("agent_name_shared_cache", False),
+        lambda_performance_profile=agent_name_options.get(
+            "lambda_performance_profile", DEFAULT_LAMBDA_PROFILE),
+        agent_provisioning=agent_provisioning,
+    )
+    try:
+        tenant_config.validate()
+    except ValueError as e:
+        print(f"  ✗ {e}")
+        sys.exit(1)
+    layout_error = pin_stack_layouts([tenant_config]).get(stack_name)
+    if layout_error:
+        print(f"  ✗ {layout_error}")
+        sys.exit(1)
+    if tenant_config.layered:
+        print_summary("Stack 布局",
+                      f"分层（{', '.join(tenant_config.stack_names[:3])}"
+                      f"{' ...' if len(tenant_config.stack_names) > 3 else ''}，"
+                      f"共 {len(tenant_config.agents)} 个座席）")
+    if agent_provisioning == "api":
+        print_summary("座席开通", "部署后通过 Connect API 批量开通")
 
     print()
     if not prompt_yes_no("  确认以上配置，开始部署?"):
         print("  已取消部署。")
         sys.exit(0)
 
-    # 设置环境变量
-    os.environ["tenant_name"] = tenant_name
-    os.environ["stack_name"] = stack_name
-    os.environ["tenant_description"] = tenant_description
-    os.environ["tts_voice"] = tts_voice
-    os.environ["deploy_survey_flow"] = str(enable_survey)
-    os.environ["deploy_screen_flow"] = str(enable_screenpop)
-    os.environ["ivr_welcome_message"] = welcome_msg
-    os.environ["ivr_open_hour_message"] = open_hour_msg
-    os.environ["ivr_error_message"] = error_msg
-    os.environ["language_region_key"] = region_key
-    os.environ["selected_language"] = selected_lang
-
-    if enable_survey:
-        os.environ["survey_message"] = survey_message
-        os.environ["survey_message_feedback"] = survey_feedback
-
-    # 保存环境配置
-    save_json(
-        {
-            "tenant_name": tenant_name,
-            "stack_name": stack_name,
-            "tenant_description": tenant_description,
-            "tts_voice": tts_voice,
-            "deploy_survey_flow": str(enable_survey),
-            "deploy_screen_flow": str(enable_screenpop),
-            "language_region_key": region_key,
-            "selected_language": selected_lang,
-        },
-        "environment_config.json",
-    )
-
-    # 复制并处理 agents.csv（将 LastName / Username 中的 'Test' 替换为租户名）
-    agent_usernames = prepare_agents_csv(tenant_name)
-
-    # 重名协调：删除不由本 Stack 管理的同名资源，使部署实现「有重名则更新、无重名则创建」
-    reconcile_existing_resources(
-        connect_instance_arn, stack_name, tenant_name, agent_usernames)
-
-    # 执行 CDK 部署
-    print(f"\n{'='*60}")
-    print("  开始 CDK 部署...")
-    print(f"{'='*60}\n")
-
     try:
-        result = subprocess.run(
-            [get_cdk_command(), "deploy", "--require-approval", "never"],
-            capture_output=False,
-        )
-        if result.returncode == 0:
-            print(f"\n  ✓ CDK 部署完成!")
-        else:
-            print(f"\n  ✗ CDK 部署失败，请检查 CloudFormation 控制台获取详细信息。")
-            sys.exit(1)
+        deploy_tenant(tenant_config)
+    except DeployError as e:
+        print(f"\n  ✗ {e}")
+        sys.exit(1)
     except FileNotFoundError:
         print("  ✗ 未找到 cdk 命令，请在项目根目录安装本地 AWS CDK CLI:")
         print("    npm install")
@@ -767,180 +875,927 @@ def deploy(
         sys.exit(1)
 
 
+def deploy_tenant(tenant_config, outdir=SYNTH_OUT_DIR, config_path=None, log_file=None, cwd=None):
+    """非交互地部署一个已校验、已固定布局（pin_stack_layouts）的租户配置，返回 (状态, 说明)。
+
+    状态为 unchanged（无变更）/ hotswapped（联系流热更新）/ deployed（CDK 部署）；失败时抛出 DeployError。
+    """
+    # 旧版本按行序号命名的座席沿用原逻辑 ID，避免删除重建（用户 ID 与密码会改变）
+    try:
+        tenant_config.legacy_agent_ids = (find_legacy_agent_ids(tenant_config.stack_names)
+                                          if tenant_config.stack_agents else {})
+    except Exception as e:
+        raise DeployError(f"获取 Stack 资源列表失败: {e}")
+
+    # 先合成一次并与已部署模板比较：没有任何变更时跳过重名协调与 cdk deploy
+    changes = synth_changed_stacks(tenant_config, outdir, config_path, log_file, cwd)
+    stacks_to_deploy = list(changes)
+    status = None
+    if not stacks_to_deploy:
+        print(f"\n  ✓ 无变更：合成的模板与已部署的 Stack 一致，跳过部署。")
+        status = "unchanged"
+    else:
+        # 只有联系流内容变更时可以热更新（HOTSWAP=1），失败或无法解析时回退到完整部署
+        hotswap_plan = plan_hotswap(changes)
+        if hotswap_plan and os.environ.get("HOTSWAP") == "1":
+            if hotswap_contact_flows(tenant_config, hotswap_plan):
+                status = "hotswapped"
+        elif hotswap_plan:
+            print("  ℹ 本次只有联系流内容变更，设置 HOTSWAP=1 可跳过 CloudFormation 直接热更新。")
+
+    if status is None:
+        if stacks_to_deploy != tenant_config.stack_names:
+            print_summary("有变更的 Stack", ", ".join(stacks_to_deploy))
+
+        # 重名协调：删除不由本 Stack 管理的同名资源，使部署实现「有重名则更新、无重名则创建」
+        # （API 开通的座席由 agent_provisioning 按用户名就地更新，不参与重名清理）
+        reconcile_existing_resources(
+            tenant_config.connect_instance_arn, tenant_config.stack_names, tenant_config.tenant_name,
+            [row["Username"] for row in tenant_config.stack_agents])
+
+        # 执行 CDK 部署
+        print(f"\n{'='*60}")
+        print("  开始 CDK 部署...")
+        print(f"{'='*60}\n")
+
+        # 直接部署已合成的 cloud assembly（不再重复 synth），只部署有变更的 Stack；
+        # 分层布局下各座席分片只依赖 Core，CDK 按依赖顺序并行部署
+        returncode = run_cdk(
+            ["deploy", *stacks_to_deploy, "--app", outdir, "--exclusively",
+             "--require-approval", "never", "--concurrency", str(DEPLOY_CONCURRENCY)],
+            tenant_config, config_path, log_file, cwd)
+        # 部署创建 / 更新了 Connect 资源，实例资源快照与 Stack 资源列表均已过期
+        invalidate(tenant_config.connect_instance_id)
+        invalidate_stacks()
+        if returncode != 0:
+            raise DeployError("CDK 部署失败，请检查 CloudFormation 控制台获取详细信息。")
+        print(f"\n  ✓ CDK 部署完成!")
+        status = "deployed"
+
+    return status, provision_config_agents(tenant_config, ", ".join(stacks_to_deploy))
+
+
+def provision_config_agents(tenant_config, message):
+    """api 开通方式下部署完成后开通租户配置中的座席，返回追加了失败行数的 message"""
+    if tenant_config.agent_provisioning != "api":
+        return message
+    counts = provision_agents(
+        tenant_config.connect_instance_arn, tenant_config.tenant_name, tenant_config.stack_name,
+        [tenant_config.security_profile_arn.split("/")[-1]], enumerate(tenant_config.agents, 2))
+    failed = sum(v for k, v in counts.items() if k.endswith(":failed"))
+    if failed:
+        message = f"{message}; {failed} agent rows failed".lstrip("; ")
+    return message
+
+
+# ─── 座席批量开通 ─────────────────────────────────────────────────────────────
+
+def find_routing_profile_id(connect_client, instance_id, name):
+    paginator = connect_client.get_paginator("list_routing_profiles")
+    for page in paginator.paginate(InstanceId=instance_id):
+        for rp in page.get("RoutingProfileSummaryList", []):
+            if rp.get("Name") == name:
+                return rp["Id"]
+    return None
+
+
+def provision_agents(connect_instance_arn, tenant_name, stack_name, security_profile_ids, agent_rows,
+                     tps=None, delete_missing=False, resume=True):
+    """通过 Connect API 批量开通座席（路由配置须已由 CDK 部署创建），返回各 action/status 的计数。
+
+    agent_rows 产出 (行号, 座席行)；tps 默认为 agent_provisioning.DEFAULT_TPS。
+    """
+    import boto3
+    from botocore.config import Config
+
+    from connect_cdk_voice_channel.agent_provisioning import DEFAULT_TPS, AgentProvisioner, default_paths
+
+    tps = DEFAULT_TPS if tps is None else tps
+    instance_id = connect_instance_arn.split("/")[-1]
+    # adaptive 重试在遇到 ThrottlingException 时自动退避
+    connect_client = boto3.client("connect", config=Config(retries={"mode": "adaptive", "max_attempts": 8}))
+    routing_profile_id = find_routing_profile_id(
+        connect_client, instance_id, f"{tenant_name} Routing Profile")
+    if not routing_profile_id:
+        raise DeployError(f"未找到路由配置 '{tenant_name} Routing Profile'，请先完成 CDK 部署。")
+
+    report_path, journal_path = default_paths(stack_name)
+    print(f"\n  正在批量开通座席（{tps:g} TPS）...")
+    provisioner = AgentProvisioner(
+        connect_client, instance_id, tenant_name, routing_profile_id, security_profile_ids,
+        tps=tps, delete_missing=delete_missing)
+    counts = provisioner.run(agent_rows, report_path, journal_path, resume=resume)
+    invalidate(instance_id)
+    for key in sorted(counts):
+        print_summary(key, counts[key])
+    failed = sum(v for k, v in counts.items() if k.endswith(":failed"))
+    if failed:
+        print(f"  ⚠ {failed} 行失败，详见 {report_path}；修正后重新运行会跳过已完成的行。")
+    else:
+        print(f"  ✓ 座席开通完成，报告: {report_path}")
+    return counts
+
+
+def provision_agents_command():
+    """python deploy_cli.py agents：单独（重新）运行座席批量开通"""
+    from connect_cdk_voice_channel.agent_provisioning import DEFAULT_TPS, default_paths
+
+    connect_instance_arn = prompt_input("请输入 Connect 实例 ARN")
+    tenant_name, stack_name = prompt_tenant_name("请输入租户名称 (Tenant Name)")
+    security_profile_arn = prompt_input("请输入 Agent 安全配置文件 ARN")
+    agents_csv = prompt_input("座席 CSV 文件", AGENTS_CSV)
+    tps = float(prompt_input("每秒 API 调用数 (TPS)", str(DEFAULT_TPS)))
+    delete_missing = prompt_yes_no("  是否删除 CSV 中已不存在的座席（仅限本工具为该租户创建的座席）?", "n")
+    _, journal_path = default_paths(stack_name)
+    resume = True
+    if os.path.exists(journal_path):
+        resume = prompt_yes_no("  检测到上次未完成的开通记录，是否从中断处继续?")
+    try:
+        provision_agents(connect_instance_arn, tenant_name, stack_name, [security_profile_arn.split("/")[-1]],
+                         iter_agent_rows(agents_csv, tenant_name),
+                         tps=tps, delete_missing=delete_missing, resume=resume)
+    except DeployError as e:
+        print(f"  ✗ {e}")
+        sys.exit(1)
+
+
+# ─── 参数化模板部署 ───────────────────────────────────────────────────────────
+
+def _substitute_pseudo(value, pseudo):
+    for name, replacement in pseudo.items():
+        value = value.replace("${%s}" % name, replacement)
+    return value
+
+
+def _zip_directory(path, zip_path):
+    import zipfile
+
+    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as archive:
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                full_path = os.path.join(root, name)
+                archive.write(full_path, os.path.relpath(full_path, path))
+
+
+def _asset_s3_client(role_arn):
+    """使用 CDK bootstrap 的资产发布角色；无法扮演时退回当前凭证"""
+    import boto3
+
+    if role_arn:
+        try:
+            credentials = boto3.client("sts").assume_role(
+                RoleArn=role_arn, RoleSessionName="connect-voice-channel-assets")["Credentials"]
+            return boto3.client(
+                "s3",
+                aws_access_key_id=credentials["AccessKeyId"],
+                aws_secret_access_key=credentials["SecretAccessKey"],
+                aws_session_token=credentials["SessionToken"],
+            )
+        except Exception as e:
+            print(f"  ℹ 无法扮演资产发布角色（{e}），使用当前凭证上传。")
+    return boto3.client("s3")
+
+
+def publish_template_assets(outdir, stack_name):
+    """把 cloud assembly 中该 Stack 的资产（Lambda 代码包与模板本身）上传到 CDK bootstrap 存储桶。
+
+    返回 (模板 S3 URL, CloudFormation 执行角色 ARN 或 None)。已存在的对象（按内容哈希命名）不会重复上传。
+    """
+    import boto3
+
+    with open(os.path.join(outdir, "manifest.json"), "r", encoding="utf-8") as f:
+        artifacts = json.load(f)["artifacts"]
+    properties = artifacts[stack_name]["properties"]
+    assets_file = artifacts[f"{stack_name}.assets"]["properties"]["file"]
+    with open(os.path.join(outdir, assets_file), "r", encoding="utf-8") as f:
+        assets = json.load(f)
+
+    identity = boto3.client("sts").get_caller_identity()
+    partition = identity["Arn"].split(":")[1]
+    region = boto3.session.Session().region_name
+    if not region:
+        raise DeployError("未配置 AWS 区域（AWS_REGION / AWS_DEFAULT_REGION）")
+    pseudo = {"AWS::AccountId": identity["Account"], "AWS::Region": region, "AWS::Partition": partition}
+
+    clients = {}
+    for asset_hash, asset in assets.get("files", {}).items():
+        source = asset["source"]
+        source_path = os.path.join(outdir, source["path"])
+        for destination in asset["destinations"].values():
+            bucket = _substitute_pseudo(destination["bucketName"], pseudo)
+            key = _substitute_pseudo(destination["objectKey"], pseudo)
+            role_arn = _substitute_pseudo(destination.get("assumeRoleArn", ""), pseudo)
+            if role_arn not in clients:
+                clients[role_arn] = _asset_s3_client(role_arn)
+            s3 = clients[role_arn]
+            try:
+                s3.head_object(Bucket=bucket, Key=key)
+                continue
+            except Exception:
+                pass
+            if source.get("packaging") == "zip" and os.path.isdir(source_path):
+                zip_path = os.path.join(outdir, f"{asset_hash}.zip")
+                _zip_directory(source_path, zip_path)
+                s3.upload_file(zip_path, bucket, key)
+                os.remove(zip_path)
+            else:
+                s3.upload_file(source_path, bucket, key)
+            print(f"    ↑ s3://{bucket}/{key}")
+
+    # stackTemplateAssetObjectUrl 形如 s3://<bucket>/<key>，CloudFormation 需要 https URL
+    bucket, key = _substitute_pseudo(properties["stackTemplateAssetObjectUrl"], pseudo)[len("s3://"):].split("/", 1)
+    suffix = "amazonaws.com.cn" if partition == "aws-cn" else "amazonaws.com"
+    template_url = f"https://{bucket}.s3.{region}.{suffix}/{key}"
+    execution_role = _substitute_pseudo(properties.get("cloudFormationExecutionRoleArn", ""), pseudo) or None
+    return template_url, execution_role
+
+
+def prepare_parameterized_template(outdir=TEMPLATE_OUT_DIR):
+    """synth 参数化模板并发布其资产，返回部署各租户所需的 {template, template_url, role_arn}"""
+    print("\n  正在合成参数化模板（所有租户共用一次 synth）...")
+    result = subprocess.run(
+        [get_cdk_command(), "synth", PARAMETERIZED_STACK_NAME, "--quiet", "--output", outdir,
+         "-c", f"{PARAMETERIZED_TEMPLATE_CONTEXT_KEY}=true"])
+    if result.returncode != 0:
+        raise DeployError("参数化模板合成失败")
+    template = read_assembly_templates(outdir)[PARAMETERIZED_STACK_NAME]
+    print("  正在发布模板资产...")
+    template_url, role_arn = publish_template_assets(outdir, PARAMETERIZED_STACK_NAME)
+    return {"template": template, "template_url": template_url, "role_arn": role_arn}
+
+
+def deploy_tenant_from_template(tenant_config, template_info):
+    """以租户参数把已发布的参数化模板部署为该租户的 Stack，返回 (状态, 说明)；失败时抛出 DeployError"""
+    import boto3
+    from botocore.exceptions import WaiterError
+
+    cfn = boto3.client("cloudformation")
+    stack_name = tenant_config.stack_name
+    parameters = template_parameters(tenant_config)
+    try:
+        stack = cfn.describe_stacks(StackName=stack_name)["Stacks"][0]
+    except Exception:
+        stack = None
+
+    if stack is not None:
+        stack_status = stack["StackStatus"]
+        if stack_status == "ROLLBACK_COMPLETE":
+            raise DeployError(f"Stack {stack_name} 首次创建失败（ROLLBACK_COMPLETE），请先 destroy 后重新部署")
+        if stack_status not in STABLE_STACK_STATUSES:
+            raise DeployError(f"Stack {stack_name} 当前状态为 {stack_status}，请稍后重试")
+        # 模板与参数均未变化时跳过
+        # 只比较本工具传入的参数（CDK 自动添加的 BootstrapVersion 等参数不参与比较）
+        deployed_parameters = {p["ParameterKey"]: p.get("ParameterValue") for p in stack.get("Parameters", [])}
+        deployed_parameters = {k: deployed_parameters.get(k) for k in parameters}
+        deployed = get_deployed_template(cfn, stack_name)
+        if (os.environ.get("FORCE_DEPLOY") != "1" and deployed is not None
+                and template_hash(deployed) == template_hash(template_info["template"])
+                and deployed_parameters == parameters):
+            print(f"\n  ✓ 无变更：模板与参数均与已部署的 Stack 一致，跳过部署。")
+            return "unchanged", provision_config_agents(tenant_config, "")
+
+    reconcile_existing_resources(
+        tenant_config.connect_instance_arn, [stack_name], tenant_config.tenant_name, [])
+
+    request = {
+        "StackName": stack_name,
+        "TemplateURL": template_info["template_url"],
+        "Parameters": [{"ParameterKey": k, "ParameterValue": v} for k, v in sorted(parameters.items())],
+        "Capabilities": ["CAPABILITY_IAM"],
+    }
+    if template_info.get("role_arn"):
+        request["RoleARN"] = template_info["role_arn"]
+
+    print(f"\n  正在{'更新' if stack is not None else '创建'} Stack {stack_name}...")
+    try:
+        if stack is None:
+            cfn.create_stack(**request)
+            waiter = cfn.get_waiter("stack_create_complete")
+        else:
+            cfn.update_stack(**request)
+            waiter = cfn.get_waiter("stack_update_complete")
+        waiter.wait(StackName=stack_name,
+                    WaiterConfig={"Delay": STACK_WAIT_DELAY, "MaxAttempts": STACK_WAIT_MAX_ATTEMPTS})
+    except WaiterError as e:
+        raise DeployError(f"Stack {stack_name} 部署失败: {e.last_response.get('Stacks', [{}])[0].get('StackStatusReason', e)}")
+    except Exception as e:
+        if "No updates are to be performed" not in str(e):
+            raise DeployError(f"Stack {stack_name} 部署失败: {e}")
+        print(f"\n  ✓ 无变更：CloudFormation 未发现需要更新的内容。")
+        return "unchanged", provision_config_agents(tenant_config, "")
+    finally:
+        invalidate(tenant_config.connect_instance_id)
+        invalidate_stacks()
+
+    print(f"\n  ✓ Stack {stack_name} 部署完成!")
+    return "deployed", provision_config_agents(tenant_config, stack_name)
+
+
+# ─── 清单批量部署 ─────────────────────────────────────────────────────────────
+
+def prepare_fleet_work_dir(work_dir):
+    """把租户工作目录准备为独立的 CDK 项目目录并返回该目录。
+
+    CDK CLI 在当前目录读取 cdk.json 并读写 cdk.context.json，多个 worker 在项目目录中并行运行时会争用
+    同一个 cdk.context.json。这里复制 cdk.json（app 中的脚本改为绝对路径）与已有的 cdk.context.json，
+    各 worker 的上下文查找结果只写入自己的目录。
+    """
+    with open(os.path.join(PROJECT_DIR, "cdk.json"), encoding="utf-8") as f:
+        cdk_settings = json.load(f)
+    cdk_settings["app"] = shlex.join(
+        os.path.join(PROJECT_DIR, arg) if arg.endswith(".py") else arg
+        for arg in shlex.split(cdk_settings["app"]))
+    with open(os.path.join(work_dir, "cdk.json"), "w", encoding="utf-8") as f:
+        json.dump(cdk_settings, f, indent=2)
+    context_path = os.path.join(PROJECT_DIR, "cdk.context.json")
+    if os.path.exists(context_path):
+        shutil.copyfile(context_path, os.path.join(work_dir, "cdk.context.json"))
+    return work_dir
+
+
+def validate_fleet_instances(configs):
+    """批量部署前对清单中的实例执行与步骤 1 相同的检查，返回 {Stack 名称: 错误说明}。
+
+    每个实例只 describe_instance 一次；每个 Agent 安全配置文件只校验并更新一次权限
+    （与步骤 1 相同，权限更新失败只打印警告）。实例或安全配置文件不可用的租户标记为失败。
+    """
+    import boto3
+
+    connect_client = boto3.client("connect")
+    instance_errors = {}
+    profile_errors = {}
+    errors = {}
+    for config in configs:
+        instance_id = config.connect_instance_id
+        if instance_id not in instance_errors:
+            try:
+                connect_client.describe_instance(InstanceId=instance_id)
+                instance_errors[instance_id] = None
+            except Exception as e:
+                instance_errors[instance_id] = f"验证 Connect 实例失败: {e}"
+        profile_key = (instance_id, config.security_profile_arn.split("/")[-1])
+        if instance_errors[instance_id] is None and profile_key not in profile_errors:
+            try:
+                connect_client.describe_security_profile(
+                    SecurityProfileId=profile_key[1], InstanceId=instance_id)
+                profile_errors[profile_key] = None
+            except Exception as e:
+                profile_errors[profile_key] = f"获取 Agent 安全配置文件失败: {e}"
+            else:
+                try:
+                    update_agent_security_profile(connect_client, *profile_key)
+                except Exception as e:
+                    print(f"  ⚠ {instance_id}: 更新安全配置文件权限失败: {e}")
+        error = instance_errors[instance_id] or profile_errors.get(profile_key)
+        if error:
+            errors[config.stack_name] = error
+    return errors
+
+
+def _deploy_fleet_tenant(config_data, template_info=None):
+    """进程池任务：在独立的工作目录（.fleet/<Stack 名称>/）中非交互部署一个租户。
+
+    template_info 不为空时部署已发布的参数化模板，否则为该租户单独 synth。
+    """
+    import traceback
+
+    tenant_config = TenantConfig.from_dict(config_data)
+    work_dir = os.path.join(FLEET_DIR, tenant_config.stack_name)
+    os.makedirs(work_dir, exist_ok=True)
+    log_path = os.path.join(work_dir, "deploy.log")
+    started = time.monotonic()
+    with open(log_path, "w", encoding="utf-8") as log_file, \
+            contextlib.redirect_stdout(log_file), contextlib.redirect_stderr(log_file):
+        try:
+            if template_info is not None:
+                status, message = deploy_tenant_from_template(tenant_config, template_info)
+            else:
+                status, message = deploy_tenant(
+                    tenant_config,
+                    outdir=os.path.join(work_dir, "cdk.out"),
+                    config_path=os.path.join(work_dir, "tenant_config.json"),
+                    log_file=log_file,
+                    cwd=prepare_fleet_work_dir(work_dir),
+                )
+        except FileNotFoundError:
+            status, message = "failed", "cdk command not found (run npm install)"
+        except DeployError as e:
+            status, message = "failed", str(e)
+        except Exception as e:
+            status, message = "failed", f"{type(e).__name__}: {e}"
+            traceback.print_exc()
+    return {
+        "tenant_name": tenant_config.tenant_name,
+        "stacks": " ".join(tenant_config.stack_names),
+        "status": status,
+        "seconds": round(time.monotonic() - started, 1),
+        "message": message,
+        "log": log_path,
+    }
+
+
+def deploy_fleet(manifest_path, workers=DEFAULT_FLEET_WORKERS, parameterized=False):
+    """按租户清单非交互部署全部租户（进程池并行），返回失败的租户数。
+
+    parameterized 为 True 时可以使用参数化模板的租户共用一次 synth，其余租户仍单独 synth。
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    try:
+        configs = resolve_manifest(manifest_path)
+    except (OSError, ValueError) as e:
+        print(f"  ✗ {e}")
+        return 1
+
+    total = len(configs)
+    results = []
+    # 与交互式部署的步骤 1 相同：校验实例并更新 Agent 安全配置文件权限；随后固定各租户的布局
+    errors = validate_fleet_instances(configs)
+    errors.update({name: error for name, error in pin_stack_layouts(configs).items() if name not in errors})
+    for config in configs:
+        if config.stack_name in errors:
+            results.append({"tenant_name": config.tenant_name, "stacks": config.stack_name, "status": "failed",
+                            "seconds": "", "message": errors[config.stack_name], "log": ""})
+            print(f"  ✗ {config.tenant_name}: {errors[config.stack_name]}")
+    configs = [config for config in configs if config.stack_name not in errors]
+
+    template_info = None
+    templated = set()
+    if parameterized:
+        for config in configs:
+            reason = ineligible_reason(config)
+            if reason:
+                print(f"  ℹ {config.tenant_name}: {reason}，改为单独合成部署")
+            else:
+                templated.add(config.stack_name)
+        if templated:
+            try:
+                template_info = prepare_parameterized_template()
+            except FileNotFoundError:
+                print("  ✗ 未找到 cdk 命令，请先运行 npm install")
+                return total
+            except DeployError as e:
+                print(f"  ✗ {e}")
+                return total
+
+    print(f"\n  共 {len(configs)} 个租户，{workers} 个并行 worker，日志位于 {FLEET_DIR}/<Stack 名称>/deploy.log\n")
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(_deploy_fleet_tenant, config.to_dict(),
+                            template_info if config.stack_name in templated else None): config
+            for config in configs
+        }
+        for future in as_completed(futures):
+            config = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {"tenant_name": config.tenant_name, "stacks": " ".join(config.stack_names),
+                          "status": "failed", "seconds": "", "message": f"{type(e).__name__}: {e}", "log": ""}
+            results.append(result)
+            mark = "✗" if result["status"] == "failed" else "✓"
+            print(f"  {mark} [{len(results)}/{total}] {result['tenant_name']}: {result['status']}"
+                  + (f" — {result['message']}" if result["message"] else ""))
+
+    results.sort(key=lambda r: r["tenant_name"])
+    report_path = os.path.join(FLEET_DIR, "report.csv")
+    os.makedirs(FLEET_DIR, exist_ok=True)
+    with open(report_path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=FLEET_REPORT_FIELDS)
+        writer.writeheader()
+        writer.writerows(results)
+
+    counts = {}
+    for result in results:
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+    print(f"\n{'='*60}")
+    print("  批量部署结果")
+    print(f"{'='*60}")
+    for status in sorted(counts):
+        print_summary(status, counts[status])
+    print_summary("报告", report_path)
+    return counts.get("failed", 0)
+
+
 # ─── 清理临时文件 ─────────────────────────────────────────────────────────────
 
+# 旧版本部署时在项目根目录生成的临时文件，升级后可通过 clean 命令一并清理
+LEGACY_SCRATCH_FILES = [
+    "connect.json",
+    "security_profile.json",
+    "environment_config.json",
+    "hours_of_operation.json",
+    "ivr_messages.json",
+    "survey_message.json",
+    "screenpop_translations.json",
+    "inbound_flow.json",
+    "inbound_flow_updated.json",
+    "survey_message_flow.json",
+    "screenpop_message_flow.json",
+    "connect_flow_screenpop_updated.json",
+    "connect_flow_survey_updated.json",
+    "agents.csv",
+]
+
+
 def cleanup():
-    """清理部署过程中生成的临时文件"""
-    files = [
-        "connect.json",
-        "security_profile.json",
-        "environment_config.json",
-        "hours_of_operation.json",
-        "ivr_messages.json",
-        "survey_message.json",
-        "screenpop_translations.json",
-        "inbound_flow.json",
-        "inbound_flow_updated.json",
-        "survey_message_flow.json",
-        "screenpop_message_flow.json",
-        "connect_flow_screenpop_updated.json",
-        "connect_flow_survey_updated.json",
-        "agents.csv",
-    ]
+    """清理中断部署后残留的租户配置文件、实例资源快照、批量部署工作目录、依赖检查戳，以及旧版本生成的临时文件"""
     removed = 0
-    for f in files:
+    for f in LEGACY_SCRATCH_FILES:
         if os.path.exists(f):
             os.remove(f)
             removed += 1
+    if os.path.isdir(TENANT_CONFIG_DIR):
+        for name in os.listdir(TENANT_CONFIG_DIR):
+            os.remove(os.path.join(TENANT_CONFIG_DIR, name))
+            removed += 1
+        os.rmdir(TENANT_CONFIG_DIR)
+    removed += invalidate()
+    # 删除依赖检查戳后，下次部署会重新完整检查依赖
+    if os.path.exists(DEPENDENCY_STAMP_FILE):
+        os.remove(DEPENDENCY_STAMP_FILE)
+        removed += 1
+    if os.path.isdir(FLEET_DIR):
+        shutil.rmtree(FLEET_DIR, ignore_errors=True)
+        removed += 1
     if removed:
         print(f"  已清理 {removed} 个临时文件。")
 
 
-# ─── 销毁 CDK Stack ──────────────────────────────────────────────────────────
+# ─── 销毁 Stack ──────────────────────────────────────────────────────────────
 
-def destroy():
-    """销毁已部署的 CDK Stack"""
-    tenant_name, stack_name = prompt_tenant_name("请输入要销毁的租户名称 (Tenant Name)")
+# 直接调用 CloudFormation DeleteStack 并轮询进度（不再 synth 占位配置运行 cdk destroy）
+DESTROY_POLL_SECONDS = 5
+DESTROY_TIMEOUT_SECONDS = 3600
 
-    print(f"\n  ⚠ 即将销毁 Stack: {stack_name}" + (f"（租户名: {tenant_name}）" if stack_name != tenant_name else ""))
-    if not prompt_yes_no("  确认销毁?", "n"):
-        print("  已取消。")
-        return
 
-    os.environ["tenant_name"] = tenant_name
-    os.environ["stack_name"] = stack_name
-    os.environ["tenant_description"] = ""
-    os.environ["tts_voice"] = "Joanna"
-    os.environ["deploy_survey_flow"] = "False"
-    os.environ["deploy_screen_flow"] = "False"
-    os.environ["ivr_welcome_message"] = ""
-    os.environ["ivr_open_hour_message"] = ""
-    os.environ["ivr_error_message"] = ""
-    os.environ["survey_message"] = ""
-    os.environ["survey_message_feedback"] = ""
-
-    # Stack 初始化还会读取 connect.json / security_profile.json / hours_of_operation.json 等文件。
-    # 如果本地已被清理，需要生成占位文件让 synth 能跑通。
-    placeholder_files = {
-        "connect.json": {"Id": "placeholder", "Arn": "arn:aws:connect:us-east-1:000000000000:instance/placeholder"},
-        "security_profile.json": {"Id": "placeholder", "Arn": "arn:aws:connect:us-east-1:000000000000:instance/placeholder/security-profile/placeholder", "Name": "Agent"},
-        "environment_config.json": {
-            "tenant_name": tenant_name,
-            "tenant_description": "",
-            "tts_voice": "Joanna",
-            "deploy_survey_flow": "False",
-            "deploy_screen_flow": "False",
-        },
-    }
+def disassociate_stack_lambdas(stack_names):
+    """删除 Stack 前解除其中 Lambda 与 Connect 实例的关联，返回解除的关联数。
 
-    created_placeholders = []
-    for fname, content in placeholder_files.items():
-        if not os.path.exists(fname):
-            save_json(content, fname)
-            created_placeholders.append(fname)
-
-    if not os.path.exists("hours_of_operation.json"):
-        hop_default = os.path.join(HOP_DIR, "hours_of_operation_us.json")
-        if os.path.exists(hop_default):
-            copy_file(hop_default, "hours_of_operation.json")
-            created_placeholders.append("hours_of_operation.json")
-
-    # 确保 inbound_flow.json 存在（Stack 初始化时 load_flows() 会写入，但以防万一）
-    if not os.path.exists("inbound_flow.json"):
-        default_flow = os.path.join(FLOWS_DIR, "welcome_message_flow", "welcome_message_flow.json")
-        if os.path.exists(default_flow):
-            copy_file(default_flow, "inbound_flow.json")
-            created_placeholders.append("inbound_flow.json")
-
-    # 确保 ivr_messages.json 存在
-    if not os.path.exists("ivr_messages.json"):
-        ivr_default = get_ivr_messages("us")
-        save_json(
-            {"welcomeMessage": ivr_default["welcomeMessage"],
-             "openHourMessage": ivr_default["openHourMessage"],
-             "errorMessage": ivr_default["errorMessage"]},
-            "ivr_messages.json",
-        )
-        created_placeholders.append("ivr_messages.json")
+    Connect 资源的物理 ID 即 ARN，实例 ID 从中解析；Lambda 的物理 ID 为函数名，
+    已关联的 ARN 可能带有别名限定符（live）。
+    """
+    import boto3
 
-    # 确保 screenpop_translations.json 存在
-    if not os.path.exists("screenpop_translations.json"):
-        screenpop_default = get_screenpop_translations("us")
-        save_json(screenpop_default, "screenpop_translations.json")
-        created_placeholders.append("screenpop_translations.json")
+    cfn = boto3.client("cloudformation")
+    resources = [r for name in stack_names for r in get_stack_resources(cfn, name)]
+    instance_id = None
+    for r in resources:
+        physical_id = r.get("PhysicalResourceId") or ""
+        if r["ResourceType"].startswith("AWS::Connect::") and ":instance/" in physical_id:
+            instance_id = physical_id.split(":instance/", 1)[1].split("/")[0]
+            break
+    function_names = [r["PhysicalResourceId"] for r in resources
+                      if r["ResourceType"] == "AWS::Lambda::Function" and r.get("PhysicalResourceId")]
+    if not instance_id or not function_names:
+        return 0
+
+    lambda_client = boto3.client("lambda")
+    function_arns = []
+    for name in function_names:
+        try:
+            function_arns.append(lambda_client.get_function(FunctionName=name)["Configuration"]["FunctionArn"])
+        except Exception:
+            # 函数已不存在
+            continue
 
-    try:
-        result = subprocess.run(
-            [get_cdk_command(), "destroy", "--force"],
-            capture_output=False,
-        )
-        if result.returncode == 0:
-            print(f"\n  ✓ Stack {stack_name} 已销毁!")
-        else:
-            print(f"\n  ✗ 销毁失败，请检查 CloudFormation 控制台。")
-    except FileNotFoundError:
-        print("  ✗ 未找到 cdk 命令，请在项目根目录运行 'npm install' 安装本地 CDK CLI。")
-    finally:
-        # 清理本次为 destroy 生成的占位文件
-        for fname in created_placeholders:
-            if os.path.exists(fname):
-                os.remove(fname)
+    connect_client = boto3.client("connect")
+    removed = 0
+    paginator = connect_client.get_paginator("list_lambda_functions")
+    for page in paginator.paginate(InstanceId=instance_id):
+        for associated in page.get("LambdaFunctions", []):
+            if any(associated == arn or associated.startswith(f"{arn}:") for arn in function_arns):
+                connect_client.disassociate_lambda_function(InstanceId=instance_id, FunctionArn=associated)
+                removed += 1
+    return removed
+
+
+def _latest_stack_events(cfn, stack_id):
+    return cfn.describe_stack_events(StackName=stack_id).get("StackEvents", [])
+
+
+def delete_stacks(stack_names):
+    """对 stack_names 同时发起 DeleteStack，轮询直到全部结束并逐条输出资源事件。
+
+    返回 {Stack 名称: 失败原因}（成功删除的 Stack 不在其中）。
+    """
+    import boto3
+
+    cfn = boto3.client("cloudformation")
+    pending = {}
+    failures = {}
+    for name in stack_names:
+        try:
+            stack_id = cfn.describe_stacks(StackName=name)["Stacks"][0]["StackId"]
+        except Exception:
+            # 已被删除
+            continue
+        # 删除前的事件不再输出
+        seen = {event["EventId"] for event in _latest_stack_events(cfn, stack_id)}
+        cfn.delete_stack(StackName=name)
+        pending[name] = (stack_id, seen)
+        print(f"  … 正在删除 Stack: {name}")
+
+    deadline = time.monotonic() + DESTROY_TIMEOUT_SECONDS
+    while pending:
+        if time.monotonic() > deadline:
+            for name in pending:
+                failures[name] = "timed out waiting for DELETE_COMPLETE"
+                print(f"  ✗ {name}: 等待删除超时")
+            break
+        time.sleep(DESTROY_POLL_SECONDS)
+        for name, (stack_id, seen) in list(pending.items()):
+            # 已删除的 Stack 仍可以按 StackId 查询事件与状态
+            for event in reversed(_latest_stack_events(cfn, stack_id)):
+                if event["EventId"] in seen:
+                    continue
+                seen.add(event["EventId"])
+                reason = event.get("ResourceStatusReason")
+                print(f"    [{name}] {event['LogicalResourceId']}: {event['ResourceStatus']}"
+                      + (f" — {reason}" if reason else ""))
+            stack = cfn.describe_stacks(StackName=stack_id)["Stacks"][0]
+            if stack["StackStatus"] == "DELETE_COMPLETE":
+                del pending[name]
+                print(f"  ✓ 已删除 {name}")
+            elif stack["StackStatus"] == "DELETE_FAILED":
+                del pending[name]
+                failures[name] = stack.get("StackStatusReason", "DELETE_FAILED")
+                print(f"  ✗ {name} 删除失败: {failures[name]}")
+    return failures
+
+
+def destroy_tenants(tenant_stacks):
+    """销毁多个租户，tenant_stacks 为 {租户 Stack 名称: [已部署的 Stack]}，返回失败的 Stack 数。
+
+    先并发解除各租户 Lambda 与 Connect 实例的关联，然后所有租户一起分两批删除：
+    第一批为单体 Stack、Flows 与座席分片（互不依赖），第二批为被它们导入的 Core。
+    """
+    print("\n  正在解除 Lambda 与 Connect 实例的关联...")
+    with ThreadPoolExecutor(max_workers=RECONCILE_WORKERS) as executor:
+        futures = {executor.submit(disassociate_stack_lambdas, names): tenant
+                   for tenant, names in tenant_stacks.items()}
+        for future in as_completed(futures):
+            try:
+                removed = future.result()
+            except Exception as e:
+                print(f"  ⚠ {futures[future]}: 解除关联失败（{e}），由 CloudFormation 删除关联资源")
+                continue
+            if removed:
+                print(f"  ✓ {futures[future]}: 已解除 {removed} 个 Lambda 关联")
+
+    core_stacks = {tenant: f"{tenant}-Core" for tenant, names in tenant_stacks.items()
+                   if f"{tenant}-Core" in names}
+    first = [name for names in tenant_stacks.values() for name in names if name not in core_stacks.values()]
+    failures = delete_stacks(first)
+    # 同一租户的其它 Stack 删除失败时保留 Core（仍被其导入）
+    second = [core for tenant, core in core_stacks.items()
+              if not any(name in failures for name in tenant_stacks[tenant])]
+    skipped = len(core_stacks) - len(second)
+    failures.update(delete_stacks(second))
+
+    # 租户所在实例未知，清除全部实例资源快照
+    invalidate()
+    invalidate_stacks()
+    return len(failures) + skipped
+
+
+def destroy(argv=()):
+    """销毁一个或多个租户的 Stack，返回失败的 Stack 数。
+
+    未指定 --tenant / --manifest 时交互输入一个租户名称。
+    """
+    parser = argparse.ArgumentParser(prog="deploy_cli.py destroy")
+    parser.add_argument("--tenant", action="append", default=[], help="要销毁的租户名称（可重复）")
+    parser.add_argument("--manifest", help="销毁租户清单中的全部租户")
+    parser.add_argument("--yes", action="store_true", help="不再确认")
+    args = parser.parse_args(list(argv))
+
+    stack_names = [sanitize_stack_name(name) for name in args.tenant]
+    if args.manifest:
+        try:
+            stack_names += [config.stack_name for config in resolve_manifest(args.manifest)]
+        except (OSError, ValueError) as e:
+            print(f"  ✗ {e}")
+            return 1
+    if not stack_names:
+        _, stack_name = prompt_tenant_name("请输入要销毁的租户名称 (Tenant Name)")
+        stack_names = [stack_name]
+    stack_names = list(dict.fromkeys(stack_names))
+
+    found = find_fleet_stacks(stack_names)
+    for name in stack_names:
+        if not found[name]:
+            print(f"  ℹ 未找到已部署的 Stack: {name}")
+    tenant_stacks = {name: stacks for name, stacks in found.items() if stacks}
+    if not tenant_stacks:
+        return 0
+
+    print(f"\n  ⚠ 即将销毁 {len(tenant_stacks)} 个租户的 Stack:")
+    for stacks in tenant_stacks.values():
+        print(f"    - {', '.join(sorted(stacks))}")
+    if not args.yes and not prompt_yes_no("  确认销毁?", "n"):
+        print("  已取消。")
+        return 0
+
+    failed = destroy_tenants(tenant_stacks)
+    if failed:
+        print(f"\n  ✗ {failed} 个 Stack 未能删除，请检查 CloudFormation 控制台。")
+    else:
+        print(f"\n  ✓ 已销毁 {len(tenant_stacks)} 个租户的 Stack!")
+    return failed
 
 
 # ─── 磁盘/缓存检查 ────────────────────────────────────────────────────────────
 
 # CloudShell 的持久化家目录仅有约 1GB，缓存过大时会导致 CDK/jsii 解压
 # aws-cdk-lib 时报 "ENOSPC: no space left on device"。部署前检查缓存目录，
-# 超过阈值则自动清空以释放空间。
+# 超过上限时按最近使用时间（LRU）淘汰缓存项，直到低于目标水位；
+# jsii 包缓存与 pip 缓存受保护，不会被淘汰，下次 synth / 安装仍可复用。
 CACHE_DIR = os.path.expanduser("~/.cache")
 CACHE_SIZE_LIMIT_BYTES = 100 * 1024 * 1024  # 100MB
+CACHE_TARGET_BYTES = 70 * 1024 * 1024  # 淘汰到 70MB 以下
+# 相对于 CACHE_DIR 的受保护路径；环境变量 CACHE_PROTECTED_DIRS（以 os.pathsep 分隔）可追加
+CACHE_PROTECTED_DIRS = ("aws/jsii", "pip")
 
 
-def get_dir_size(path):
-    """递归计算目录占用的字节数（无法访问的文件将被跳过）。"""
-    total = 0
-    for dirpath, dirnames, filenames in os.walk(path, onerror=lambda e: None):
-        for name in filenames:
-            fp = os.path.join(dirpath, name)
-            try:
-                # 使用 lstat 避免跟随符号链接重复统计
-                total += os.lstat(fp).st_size
-            except (OSError, FileNotFoundError):
-                continue
-    return total
+def get_protected_cache_dirs():
+    extra = [p for p in os.environ.get("CACHE_PROTECTED_DIRS", "").split(os.pathsep) if p]
+    return [os.path.normpath(os.path.join(CACHE_DIR, p)) for p in (*CACHE_PROTECTED_DIRS, *extra)]
 
 
-def check_and_clear_cache():
-    """检查缓存目录大小，超过 100MB 时清空其内容以释放磁盘空间。"""
-    if not os.path.isdir(CACHE_DIR):
-        return
+def _scan_cache_entry(path):
+    """用 scandir 统计一个缓存项，返回 (字节数, 最近使用时间)。不跟随符号链接，无法访问的项被跳过。
 
-    size = get_dir_size(CACHE_DIR)
-    size_mb = size / (1024 * 1024)
+    文件取访问与修改时间中较新者；目录只取修改时间（遍历本身会更新目录的访问时间）。
+    """
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return 0, 0
+    if not os.path.isdir(path) or os.path.islink(path):
+        return st.st_size, max(st.st_atime, st.st_mtime)
+    newest = st.st_mtime
+
+    total = 0
+    stack = [path]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as it:
+                for entry in it:
+                    try:
+                        st = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                        newest = max(newest, st.st_mtime)
+                    else:
+                        total += st.st_size
+                        newest = max(newest, st.st_atime, st.st_mtime)
+        except OSError:
+            continue
+    return total, newest
+
+
+def _list_cache_entries(protected):
+    """返回 (可淘汰的缓存项, 受保护的路径)。
+
+    可淘汰项为 CACHE_DIR 的顶层子项；受保护路径的上级目录（如 aws/）会展开为其子项。
+    """
+    entries, kept = [], []
+    stack = [CACHE_DIR]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as it:
+                children = [(entry.path, entry.is_dir(follow_symlinks=False)) for entry in it]
+        except OSError:
+            continue
+        for path, is_dir in children:
+            if path in protected:
+                kept.append(path)
+            elif is_dir and any(p.startswith(path + os.sep) for p in protected):
+                stack.append(path)
+            else:
+                entries.append(path)
+    return entries, kept
 
-    if size <= CACHE_SIZE_LIMIT_BYTES:
-        print(f"  缓存目录 {CACHE_DIR} 当前占用 {size_mb:.1f}MB，未超过 100MB 限制。")
-        return
 
-    print(f"\n  ⚠ 缓存目录 {CACHE_DIR} 占用 {size_mb:.1f}MB，已超过 100MB，正在清空 ...")
-    cleared = 0
-    for entry in os.listdir(CACHE_DIR):
-        target = os.path.join(CACHE_DIR, entry)
+def scan_cache(limit=None):
+    """单次遍历统计缓存占用，总量一旦超过 limit（默认 CACHE_SIZE_LIMIT_BYTES）即停止。
+
+    返回 {"total": 已统计字节数, "exceeded": 是否超过 limit, "entries": {已统计的可淘汰项: (字节数, 最近使用时间)},
+    "pending": [尚未统计的可淘汰项]}；exceeded 为 False 时 total 即为总占用。
+    """
+    limit = CACHE_SIZE_LIMIT_BYTES if limit is None else limit
+    protected = get_protected_cache_dirs()
+    entries, kept = _list_cache_entries(protected)
+    usage = {"total": 0, "exceeded": False, "entries": {}, "pending": []}
+    # 受保护目录同样占用空间，先统计
+    for path in kept:
+        usage["total"] += _scan_cache_entry(path)[0]
+    for index, path in enumerate(entries):
+        if usage["total"] > limit:
+            usage["pending"] = entries[index:]
+            break
+        usage["entries"][path] = _scan_cache_entry(path)
+        usage["total"] += usage["entries"][path][0]
+    usage["exceeded"] = usage["total"] > limit
+    return usage
+
+
+def evict_cache(usage, target=None):
+    """按最近使用时间从旧到新删除可淘汰项，直到总占用不超过 target（默认 CACHE_TARGET_BYTES），
+    返回 (删除项数, 释放字节数, 剩余占用)。
+
+    scan_cache 提前停止时先补充统计剩余的项（每个文件仍只统计一次）。
+    """
+    target = CACHE_TARGET_BYTES if target is None else target
+    entries = dict(usage["entries"])
+    total = usage["total"]
+    for path in usage["pending"]:
+        entries[path] = _scan_cache_entry(path)
+        total += entries[path][0]
+
+    cleared = freed = 0
+    for path, (size, _) in sorted(entries.items(), key=lambda item: item[1][1]):
+        if total <= target:
+            break
         try:
-            if os.path.isdir(target) and not os.path.islink(target):
-                shutil.rmtree(target, ignore_errors=True)
+            if os.path.isdir(path) and not os.path.islink(path):
+                shutil.rmtree(path)
             else:
-                os.remove(target)
-            cleared += 1
+                os.remove(path)
         except OSError as e:
-            print(f"    ⚠ 无法删除 {target}: {e}")
+            print(f"    ⚠ 无法删除 {path}: {e}")
+            continue
+        cleared += 1
+        freed += size
+        total -= size
+    return cleared, freed, total
+
+
+def check_and_clear_cache():
+    """检查缓存目录大小，超过上限时按 LRU 淘汰到目标水位以下（受保护的目录不会被删除）。"""
+    if not os.path.isdir(CACHE_DIR):
+        return
+
+    limit_mb = CACHE_SIZE_LIMIT_BYTES / (1024 * 1024)
+    target_mb = CACHE_TARGET_BYTES / (1024 * 1024)
+    usage = scan_cache()
+    if not usage["exceeded"]:
+        print(f"  缓存目录 {CACHE_DIR} 当前占用 {usage['total'] / (1024 * 1024):.1f}MB，"
+              f"未超过 {limit_mb:.0f}MB 限制。")
+        return
 
-    freed_mb = (size - get_dir_size(CACHE_DIR)) / (1024 * 1024)
-    print(f"  ✓ 已清理 {cleared} 项缓存，释放约 {freed_mb:.1f}MB 空间。")
+    print(f"\n  ⚠ 缓存目录 {CACHE_DIR} 已超过 {limit_mb:.0f}MB，正在按最近使用时间淘汰到 {target_mb:.0f}MB 以下 ...")
+    cleared, freed, total = evict_cache(usage)
+    print(f"  ✓ 已淘汰 {cleared} 项缓存，释放约 {freed / (1024 * 1024):.1f}MB 空间，"
+          f"当前占用 {total / (1024 * 1024):.1f}MB。")
+    if total > CACHE_TARGET_BYTES:
+        print(f"  ⚠ 受保护的缓存（{', '.join(CACHE_PROTECTED_DIRS)}）仍使占用高于 {target_mb:.0f}MB，"
+              "如磁盘空间不足可手动清理（例如 pip cache purge）。")
 
 
 # ─── 依赖检查 ────────────────────────────────────────────────────────────────
 
+# ensure_dependencies 的检查结果：每行一个通过检查的「requirements.txt + 解释器」哈希
+DEPENDENCY_STAMP_FILE = os.path.join(PROJECT_DIR, ".dependency_stamp")
+DEPENDENCY_STAMP_KEEP = 8
+
+
+def dependency_stamp_key(req_file, python=None):
+    """requirements.txt 内容与解释器（路径、实际文件及其修改时间）的哈希；升级解释器或修改依赖后失效"""
+    python = python or sys.executable
+    digest = hashlib.sha256()
+    with open(req_file, "rb") as f:
+        digest.update(f.read())
+    real_python = os.path.realpath(python)
+    try:
+        mtime = os.stat(real_python).st_mtime_ns
+    except OSError:
+        mtime = 0
+    digest.update(f"\0{os.path.abspath(python)}\0{real_python}\0{mtime}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def read_dependency_stamps():
+    try:
+        with open(DEPENDENCY_STAMP_FILE, "r", encoding="utf-8") as f:
+            return f.read().split()
+    except OSError:
+        return []
+
+
+def write_dependency_stamp(key):
+    keys = [k for k in read_dependency_stamps() if k != key][-(DEPENDENCY_STAMP_KEEP - 1):] + [key]
+    try:
+        with open(DEPENDENCY_STAMP_FILE, "w", encoding="utf-8") as f:
+            f.write("\n".join(keys) + "\n")
+    except OSError:
+        pass
+
+
 def ensure_dependencies():
     """确保 CDK 部署所需的 Python 依赖已安装。
 
@@ -950,15 +1805,23 @@ def ensure_dependencies():
     .venv，将依赖安装其中，并用该虚拟环境的解释器重新执行本脚本，
     从而避免 ModuleNotFoundError: No module named 'aws_cdk'。
     """
+    project_dir = os.path.dirname(os.path.abspath(__file__))
+    req_file = os.path.join(project_dir, "requirements.txt")
+
+    # 常见情况：requirements.txt 与解释器都没有变化，上次检查通过后不再重复检查
+    stamp_key = dependency_stamp_key(req_file) if os.path.exists(req_file) else None
+    if stamp_key and stamp_key in read_dependency_stamps():
+        return
+
     import importlib.util
 
     required_modules = ["aws_cdk", "constructs"]
     missing = [m for m in required_modules if importlib.util.find_spec(m) is None]
     if not missing:
+        if stamp_key:
+            write_dependency_stamp(stamp_key)
         return
 
-    project_dir = os.path.dirname(os.path.abspath(__file__))
-    req_file = os.path.join(project_dir, "requirements.txt")
     if not os.path.exists(req_file):
         print(f"  ⚠ 缺少依赖 {missing}，但未找到 requirements.txt，请手动安装。")
         return
@@ -970,6 +1833,7 @@ def ensure_dependencies():
         print(f"\n  检测到缺少依赖 {missing}，正在安装 requirements.txt ...")
         try:
             subprocess.run([sys.executable, "-m", "pip", "install", "-r", req_file], check=True)
+            write_dependency_stamp(stamp_key)
             print("  ✓ 依赖安装完成")
             return
         except subprocess.CalledProcessError as e:
@@ -987,6 +1851,7 @@ def ensure_dependencies():
         venv_python = os.path.join(venv_dir, "bin", "python")
         venv_bin = os.path.join(venv_dir, "bin")
 
+    created = False
     if not os.path.exists(venv_python):
         print(f"\n  检测到缺少依赖 {missing}，正在创建虚拟环境 .venv ...")
         try:
@@ -995,16 +1860,22 @@ def ensure_dependencies():
             print(f"  ✗ 创建虚拟环境失败: {e}")
             print("    请手动运行: python3 -m venv .venv && source .venv/bin/activate && pip install -r requirements.txt")
             sys.exit(1)
+        created = True
 
-    print("  正在安装 requirements.txt 到 .venv ...")
-    try:
-        subprocess.run([venv_python, "-m", "pip", "install", "--upgrade", "pip"], check=True)
-        subprocess.run([venv_python, "-m", "pip", "install", "-r", req_file], check=True)
-        print("  ✓ 依赖安装完成")
-    except subprocess.CalledProcessError as e:
-        print(f"  ✗ 依赖安装失败: {e}")
-        print("    请手动运行: python3 -m venv .venv && source .venv/bin/activate && pip install -r requirements.txt")
-        sys.exit(1)
+    # 已有的 .venv 在 requirements.txt 未变化时不再重新安装（也不再升级 pip）
+    venv_stamp_key = dependency_stamp_key(req_file, venv_python)
+    if venv_stamp_key not in read_dependency_stamps():
+        print("  正在安装 requirements.txt 到 .venv ...")
+        try:
+            if created:
+                subprocess.run([venv_python, "-m", "pip", "install", "--upgrade", "pip"], check=True)
+            subprocess.run([venv_python, "-m", "pip", "install", "-r", req_file], check=True)
+            write_dependency_stamp(venv_stamp_key)
+            print("  ✓ 依赖安装完成")
+        except subprocess.CalledProcessError as e:
+            print(f"  ✗ 依赖安装失败: {e}")
+            print("    请手动运行: python3 -m venv .venv && source .venv/bin/activate && pip install -r requirements.txt")
+            sys.exit(1)
 
     # 将 .venv 提前加入 PATH，确保后续 CDK 子进程中的 `python3 app.py` 也使用该环境；
     # 然后用 .venv 的解释器重新执行本脚本（再次进入时依赖已就绪，会直接跳过）。
@@ -1014,6 +1885,55 @@ def ensure_dependencies():
     os.execv(venv_python, [venv_python] + sys.argv)
 
 
+# ─── 启动耗时分析 ────────────────────────────────────────────────────────────
+
+STARTUP_BUDGET_MS = 100
+STARTUP_PROFILE_TOP = 15
+
+
+def profile_startup():
+    """--profile-startup：测量启动到第一个提示之前的各阶段耗时，并列出最慢的导入。
+
+    导入耗时在子进程中以 python -X importtime 测量（当前进程已经导入过全部模块）。
+    """
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import deploy_cli"],
+                            cwd=PROJECT_DIR, capture_output=True, text=True)
+    import_ms = (time.perf_counter() - started) * 1000
+    if result.returncode != 0:
+        print(result.stderr[-2000:])
+        return
+
+    rows = []
+    for line in result.stderr.splitlines():
+        parts = line[len("import time:"):].split("|") if line.startswith("import time:") else []
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue
+        name = parts[2].rstrip()
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((int(parts[1]) / 1000, int(parts[0]) / 1000, depth, name.strip()))
+
+    started = time.perf_counter()
+    req_file = os.path.join(PROJECT_DIR, "requirements.txt")
+    stamp_hit = os.path.exists(req_file) and dependency_stamp_key(req_file) in read_dependency_stamps()
+    dependency_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    cache_exceeded = os.path.isdir(CACHE_DIR) and scan_cache()["exceeded"]
+    cache_ms = (time.perf_counter() - started) * 1000
+
+    print(f"\n  最慢的 {STARTUP_PROFILE_TOP} 个导入（累计 / 自身，ms）：")
+    for cumulative, own, depth, name in sorted(rows, reverse=True)[:STARTUP_PROFILE_TOP]:
+        print(f"    {cumulative:8.1f} {own:8.1f}  {'  ' * max(depth - 1, 0)}{name}")
+    print()
+    total_ms = import_ms + dependency_ms + cache_ms
+    print_summary("解释器启动 + 导入", f"{import_ms:.1f} ms")
+    print_summary("依赖检查", f"{dependency_ms:.1f} ms（{'命中检查戳' if stamp_hit else '未命中，将完整检查'}）")
+    print_summary("缓存目录检查", f"{cache_ms:.1f} ms{'（超过上限，部署前会执行 LRU 淘汰）' if cache_exceeded else ''}")
+    mark = "✓" if total_ms < STARTUP_BUDGET_MS else "⚠"
+    print(f"\n  {mark} 启动到第一个提示约 {total_ms:.1f} ms（目标 < {STARTUP_BUDGET_MS} ms）")
+
+
 # ─── 主入口 ──────────────────────────────────────────────────────────────────
 
 def main():
@@ -1022,21 +1942,45 @@ def main():
     print("║   Amazon Connect Voice Channel CLI Deployment Tool      ║")
     print("╚══════════════════════════════════════════════════════════╝")
 
+    if "--profile-startup" in sys.argv[1:]:
+        profile_startup()
+        return
+
     if len(sys.argv) > 1:
         cmd = sys.argv[1].lower()
         if cmd == "destroy":
-            ensure_dependencies()
-            destroy()
-            return
+            # 直接调用 CloudFormation，不需要 CDK 依赖
+            sys.exit(1 if destroy(sys.argv[2:]) else 0)
         elif cmd == "clean":
             cleanup()
             return
+        elif cmd == "agents":
+            provision_agents_command()
+            return
+        elif cmd == "deploy":
+            parser = argparse.ArgumentParser(prog="deploy_cli.py deploy")
+            parser.add_argument("--manifest", help="租户清单（.json / .yaml），指定后非交互批量部署")
+            parser.add_argument("--workers", type=int, default=DEFAULT_FLEET_WORKERS, help="并行部署的租户数")
+            parser.add_argument("--parameterized", action="store_true",
+                                help="只 synth 一次参数化模板，以各租户的参数部署（不适用的租户单独 synth）")
+            args = parser.parse_args(sys.argv[2:])
+            if args.manifest:
+                check_and_clear_cache()
+                ensure_dependencies()
+                sys.exit(1 if deploy_fleet(args.manifest, max(1, args.workers), args.parameterized) else 0)
+            # 未指定清单时与不带参数相同，进入交互式部署
         elif cmd == "help":
             print("\n用法:")
             print("  python deploy_cli.py          交互式部署")
-            print("  python deploy_cli.py destroy   销毁已部署的 Stack")
-            print("  python deploy_cli.py clean     清理临时文件")
+            print("  python deploy_cli.py deploy --manifest tenants.yaml [--workers 4] [--parameterized]")
+            print("                                按租户清单非交互批量部署")
+            print("  python deploy_cli.py destroy [--tenant NAME ...] [--manifest tenants.yaml] [--yes]")
+            print("                                销毁已部署的 Stack（多个租户并行）")
+            print("  python deploy_cli.py clean     清理残留的临时文件")
+            print("  python deploy_cli.py agents    通过 Connect API 批量开通座席")
             print("  python deploy_cli.py help      显示帮助")
+            print("  python deploy_cli.py --profile-startup")
+            print("                                输出启动各阶段与导入耗时")
             return
 
     # 部署前检查缓存目录大小，必要时清空以避免磁盘空间不足
@@ -1045,28 +1989,29 @@ def main():
     # 部署前确保 CDK 依赖已安装
     ensure_dependencies()
 
-    # 步骤 1: 确认 Connect 实例（安全配置文件信息由 step1 写入 security_profile.json）
-    connect_instance_arn, _ = step1_connect_instance()
+    # 步骤 1: 确认 Connect 实例与 Agent 安全配置文件
+    connect_instance_arn, security_profile_arn = step1_connect_instance()
 
     # 步骤 2: 选择语言和语音
     tts_voice, selected_lang, region_key = step2_language_voice()
 
     # 步骤 3: 确认弹屏功能
-    enable_screenpop = step3_screenpop()
+    enable_screenpop, agent_name_options = step3_screenpop()
 
     # 步骤 4: 确认满意度评价
-    enable_survey, survey_message, survey_feedback = step4_survey(region_key)
+    enable_survey, survey_messages = step4_survey(region_key)
 
     # 部署
     deploy(
         connect_instance_arn,
+        security_profile_arn,
         tts_voice,
         selected_lang,
         region_key,
         enable_screenpop,
         enable_survey,
-        survey_message,
-        survey_feedback,
+        survey_messages,
+        agent_name_options,
     )
 
 
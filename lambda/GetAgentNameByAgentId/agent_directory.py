@@ -0,0 +1,123 @@
+import time
+
+from botocore.exceptions import ClientError
+
+
+def format_agent_name(identity_info):
+    return f"{identity_info.get('FirstName', '')} {identity_info.get('LastName', '')}".strip()
+
+
+class AgentDirectory:
+    """实例级座席目录：agent_id → 显示名称的内存索引。
+
+    - load():    全量构建。用 list_users 分页获取 Id 与 LastModifiedTime，
+                 再用 search_users 分页批量获取姓名（无权限时回退为逐个 describe_user）。
+    - refresh(): 增量刷新。只对 LastModifiedTime 变化或新增的座席调用 describe_user，并移除已删除的座席。
+                 ListUsers 不支持按修改时间过滤，因此每次刷新仍会分页列举实例中的全部座席
+                 （每页 1000 个，只取 Id 与 LastModifiedTime）。
+
+    load() / refresh() 在后台线程中执行（同一时间只有一个），lookup() 可在刷新期间并发调用。
+    """
+
+    def __init__(self, client, instance_id, refresh_interval=300, clock=time.monotonic):
+        self.client = client
+        self.instance_id = instance_id
+        self.refresh_interval = refresh_interval
+        self._clock = clock
+        self._names = {}
+        self._modified = {}
+        self._refreshed_at = None
+
+    def __len__(self):
+        return len(self._names)
+
+    @property
+    def loaded(self):
+        return self._refreshed_at is not None
+
+    def is_stale(self):
+        return not self.loaded or self._clock() - self._refreshed_at >= self.refresh_interval
+
+    def mark_stale(self):
+        """强制下次访问时刷新（已加载的目录执行增量刷新）。"""
+        if self.loaded:
+            self._refreshed_at = float('-inf')
+
+    def lookup(self, agent_id):
+        """返回 (hit, name)；目录中不存在该座席时 hit 为 False。"""
+        # 单次 dict.get，避免与后台刷新中的删除交错
+        name = self._names.get(agent_id)
+        return name is not None, name
+
+    def _list_user_summaries(self):
+        paginator = self.client.get_paginator('list_users')
+        # ListUsers 每页最多 1000 个（默认 100），减少刷新时的分页调用次数
+        for page in paginator.paginate(InstanceId=self.instance_id, PaginationConfig={'PageSize': 1000}):
+            yield from page.get('UserSummaryList', [])
+
+    def _search_user_names(self):
+        names = {}
+        paginator = self.client.get_paginator('search_users')
+        for page in paginator.paginate(InstanceId=self.instance_id):
+            for user in page.get('Users', []):
+                names[user['Id']] = format_agent_name(user.get('IdentityInfo', {}))
+        return names
+
+    def _describe_user_name(self, agent_id):
+        try:
+            response = self.client.describe_user(UserId=agent_id, InstanceId=self.instance_id)
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') == 'ResourceNotFoundException':
+                return None
+            raise
+        return format_agent_name(response['User']['IdentityInfo'])
+
+    def load(self):
+        """全量构建目录，返回座席数量。"""
+        summaries = {u['Id']: u.get('LastModifiedTime') for u in self._list_user_summaries()}
+        try:
+            searched = self._search_user_names()
+        except ClientError as e:
+            print(f"search_users unavailable, falling back to describe_user: {e}")
+            searched = {}
+
+        names = {}
+        for agent_id in summaries:
+            name = searched.get(agent_id)
+            if name is None:
+                name = self._describe_user_name(agent_id)
+            if name is not None:
+                names[agent_id] = name
+
+        self._names = names
+        self._modified = {k: v for k, v in summaries.items() if k in names}
+        self._refreshed_at = self._clock()
+        return len(self._names)
+
+    def refresh(self):
+        """增量刷新目录，返回本次新增/更新的座席数量。尚未全量加载时执行 load()。"""
+        if not self.loaded:
+            return self.load()
+
+        seen = set()
+        changed = 0
+        for summary in self._list_user_summaries():
+            agent_id = summary['Id']
+            seen.add(agent_id)
+            last_modified = summary.get('LastModifiedTime')
+            if (agent_id in self._names and last_modified is not None
+                    and self._modified.get(agent_id) == last_modified):
+                continue
+            name = self._describe_user_name(agent_id)
+            if name is None:
+                continue
+            self._names[agent_id] = name
+            self._modified[agent_id] = last_modified
+            changed += 1
+
+        for agent_id in set(self._names) - seen:
+            del self._names[agent_id]
+            self._modified.pop(agent_id, None)
+
+        self._refreshed_at = self._clock()
+        return changed
@@ -1,28 +1,587 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait
+from contextlib import nullcontext
+
 import boto3
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
 
-connect = boto3.client('connect')
+from agent_directory import AgentDirectory
+from metrics import InvocationMetrics, trace_subsegment
+from shared_cache import create_shared_store
 
+# Connect 客户端调优（通过 Lambda 环境变量调整）：
+# - CONNECT_MAX_ATTEMPTS:    adaptive 重试模式下的最大尝试次数（含首次调用）
+# - CONNECT_CONNECT_TIMEOUT: 建立连接超时（秒）
+# - CONNECT_READ_TIMEOUT:    读取超时（秒）
+# adaptive 模式会在客户端侧对限流（Throttling）做令牌桶退避，TCP keep-alive 复用温容器中的连接。
+CONNECT_CLIENT_CONFIG = Config(
+    retries={
+        'mode': 'adaptive',
+        'max_attempts': int(os.environ.get('CONNECT_MAX_ATTEMPTS', '3'))
+    },
+    connect_timeout=float(os.environ.get('CONNECT_CONNECT_TIMEOUT', '1')),
+    read_timeout=float(os.environ.get('CONNECT_READ_TIMEOUT', '1')),
+    tcp_keepalive=True,
+    max_pool_connections=10
+)
 
-def get_agent_name(agent_id, instance_id):
-    if not agent_id:
-        return ""
-    response = connect.describe_user(UserId=agent_id, InstanceId=instance_id)
+connect = boto3.client('connect', config=CONNECT_CLIENT_CONFIG)
+
+# 共享缓存（DynamoDB）客户端：只尝试一次、短超时（AGENT_NAME_SHARED_CACHE_TIMEOUT，秒），
+# 读取耗时计入姓名解析的截止时间，慢读取不会拖垮降级模式
+SHARED_CACHE_TIMEOUT = float(os.environ.get('AGENT_NAME_SHARED_CACHE_TIMEOUT', '0.2'))
+SHARED_CACHE_CLIENT_CONFIG = Config(
+    retries={'mode': 'standard', 'max_attempts': 1},
+    connect_timeout=SHARED_CACHE_TIMEOUT,
+    read_timeout=SHARED_CACHE_TIMEOUT,
+    tcp_keepalive=True,
+    max_pool_connections=10
+)
+
+FUNCTION_NAME = os.environ.get('AWS_LAMBDA_FUNCTION_NAME', 'GetAgentNameByAgentId')
+
+# 模块首次导入后的第一次调用为冷启动
+cold_start = True
+
+# 座席姓名缓存配置（通过 Lambda 环境变量调整）：
+# - AGENT_NAME_CACHE_TTL:          命中缓存的有效期（秒）
+# - AGENT_NAME_CACHE_NEGATIVE_TTL: 不存在/已删除座席的负缓存有效期（秒）
+# - AGENT_NAME_CACHE_MAX_SIZE:     最大条目数，超过后按 LRU 淘汰
+CACHE_TTL_SECONDS = float(os.environ.get('AGENT_NAME_CACHE_TTL', '300'))
+CACHE_NEGATIVE_TTL_SECONDS = float(os.environ.get('AGENT_NAME_CACHE_NEGATIVE_TTL', '60'))
+CACHE_MAX_SIZE = int(os.environ.get('AGENT_NAME_CACHE_MAX_SIZE', '1000'))
+
+# 实例级座席目录预加载配置：
+# - AGENT_DIRECTORY_PRELOAD:          为 true 时启用目录（按实例全量加载后增量刷新）
+# - AGENT_DIRECTORY_INSTANCE_ID:      冷启动时预加载的实例 ID（为空则在首次调用时加载）
+# - AGENT_DIRECTORY_REFRESH_INTERVAL: 增量刷新间隔（秒）
+# - AGENT_DIRECTORY_PRELOAD_TIMEOUT:  冷启动（模块导入）阶段等待预加载完成的最长时间（秒）
+DIRECTORY_PRELOAD = os.environ.get('AGENT_DIRECTORY_PRELOAD', 'false').strip().lower() in ('true', '1', 'yes')
+DIRECTORY_INSTANCE_ID = os.environ.get('AGENT_DIRECTORY_INSTANCE_ID', '')
+DIRECTORY_REFRESH_INTERVAL = float(os.environ.get('AGENT_DIRECTORY_REFRESH_INTERVAL', '300'))
+DIRECTORY_PRELOAD_TIMEOUT = float(os.environ.get('AGENT_DIRECTORY_PRELOAD_TIMEOUT', '5'))
+
+# 降级模式配置：
+# - AGENT_NAME_DEADLINE_MS:   单次姓名解析的硬性截止时间（毫秒）。必须小于联系流中
+#                             InvokeLambdaFunction 的超时（InvocationTimeLimitSeconds）以及 Lambda 超时
+# - AGENT_NAME_FALLBACK:      既无陈旧值也无法及时查询时返回的默认姓名
+# - DEADLINE_SAFETY_MARGIN_MS: 相对 Lambda 剩余执行时间预留的余量（毫秒）
+DEADLINE_MS = float(os.environ.get('AGENT_NAME_DEADLINE_MS', '2000'))
+FALLBACK_AGENT_NAME = os.environ.get('AGENT_NAME_FALLBACK', '')
+DEADLINE_SAFETY_MARGIN_MS = float(os.environ.get('DEADLINE_SAFETY_MARGIN_MS', '200'))
+
+# 批量解析配置（一次调用解析多个座席 / 多个属性）：
+# - BATCH_MAX_CONCURRENCY: 并发查询的最大线程数
+# - BATCH_MAX_AGENTS:      AgentIds 参数中最多解析的座席数量
+BATCH_MAX_CONCURRENCY = int(os.environ.get('BATCH_MAX_CONCURRENCY', '4'))
+BATCH_MAX_AGENTS = int(os.environ.get('BATCH_MAX_AGENTS', '10'))
+
+# 可通过 AgentAttributes 参数请求的座席属性，输出 key 为「前缀 + 属性名」，
+# 例如 LastAgentName、LastAgentRoutingProfile、Agent1HierarchyGroup
+SUPPORTED_ATTRIBUTES = ('Name', 'Username', 'RoutingProfile', 'HierarchyGroup')
+
+# describe_user 返回这些错误码时视为座席不存在，写入负缓存
+NOT_FOUND_ERROR_CODES = ('ResourceNotFoundException',)
+
+
+class AgentNameCache:
+    """容器内（warm container 复用）的座席姓名缓存。
+
+    以 (instance_id, agent_id) 为 key，带 TTL 过期与按容量的 LRU 淘汰。
+    值为 None 表示负缓存（座席不存在），调用方据此直接返回空字符串。
+    过期条目不会立即删除（直到被 LRU 淘汰），供降级模式返回最近一次已知的姓名。
+    """
+
+    def __init__(self, max_size=CACHE_MAX_SIZE, ttl=CACHE_TTL_SECONDS,
+                 negative_ttl=CACHE_NEGATIVE_TTL_SECONDS, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._clock = clock
+        self._entries = OrderedDict()
+        # 超时后在后台线程完成的 describe_user 也会写入缓存
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """返回 (hit, value)。过期条目视为未命中。"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= self._clock():
+                return False, None
+            self._entries.move_to_end(key)
+            return True, entry[0]
+
+    def get_stale(self, key):
+        """返回 (hit, value)，忽略 TTL；仅在降级模式下使用。负缓存条目不作为陈旧值返回。"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] is None:
+                return False, None
+            return True, entry[0]
+
+    def put(self, key, value):
+        if self.max_size <= 0:
+            return
+        ttl = self.ttl if value is not None else self.negative_ttl
+        with self._lock:
+            self._entries[key] = (value, self._clock() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+agent_name_cache = AgentNameCache()
+
+# 批量解析使用的座席详情（describe_user 结果）与路由配置/层级组名称缓存
+agent_profile_cache = AgentNameCache()
+resource_name_cache = AgentNameCache()
+
+# describe_user 在该线程池中执行，以便在截止时间到达时放弃等待
+describe_executor = ThreadPoolExecutor(max_workers=4)
+
+# 批量解析时每个座席一个任务；与 describe_executor 分开，避免嵌套提交导致线程池死锁
+batch_executor = ThreadPoolExecutor(max_workers=BATCH_MAX_CONCURRENCY)
+
+# 跨容器共享缓存（DynamoDB / SQLite / 内存），本地缓存未命中时读取，describe_user 后回写
+shared_store = create_shared_store(config=SHARED_CACHE_CLIENT_CONFIG)
+
+# instance_id → AgentDirectory
+agent_directories = {}
+
+# 目录刷新（ListUsers 全量分页 + describe_user）在独立线程中执行，调用路径从不等待刷新：
+# 目录过期期间继续使用旧内容，尚未加载完成时由 describe_user 路径兜底
+directory_executor = ThreadPoolExecutor(max_workers=1)
+# instance_id → 正在执行（或最近一次）的刷新任务，同一实例同时只有一个刷新任务
+directory_refreshes = {}
+directory_lock = threading.Lock()
+
+
+def get_agent_directory(instance_id):
+    """返回该实例的座席目录；未启用预加载时返回 None。目录过期时在后台提交刷新，不等待其完成。"""
+    if not DIRECTORY_PRELOAD:
+        return None
+    with directory_lock:
+        directory = agent_directories.get(instance_id)
+        if directory is None:
+            directory = AgentDirectory(connect, instance_id, DIRECTORY_REFRESH_INTERVAL)
+            agent_directories[instance_id] = directory
+        if directory.is_stale():
+            submit_directory_refresh(directory)
+    return directory
+
+
+def submit_directory_refresh(directory):
+    """提交目录刷新并返回其 Future；该实例已有刷新在执行时直接返回该任务。调用方须持有 directory_lock。"""
+    future = directory_refreshes.get(directory.instance_id)
+    if future is None or future.done():
+        future = directory_executor.submit(refresh_directory, directory)
+        directory_refreshes[directory.instance_id] = future
+    return future
+
+
+def refresh_directory(directory):
+    try:
+        directory.refresh()
+    except Exception as e:
+        # 刷新失败时保留旧目录内容，由 describe_user 路径兜底；目录仍为过期状态，下次调用会再次提交刷新
+        print(f"agent directory refresh failed: {e}")
+    return len(directory)
+
+
+def preload_agent_directory():
+    """冷启动预加载：在模块导入阶段为配置的实例构建座席目录。
+
+    最多等待 AGENT_DIRECTORY_PRELOAD_TIMEOUT 秒（不计入任何调用）；超时后加载在后台继续，
+    期间的调用走 describe_user 路径。
+    """
+    if not (DIRECTORY_PRELOAD and DIRECTORY_INSTANCE_ID):
+        return
+    get_agent_directory(DIRECTORY_INSTANCE_ID)
+    with directory_lock:
+        future = directory_refreshes.get(DIRECTORY_INSTANCE_ID)
+    try:
+        count = future.result(timeout=DIRECTORY_PRELOAD_TIMEOUT) if future else 0
+    except FutureTimeoutError:
+        print("agent directory preload still running in background")
+    else:
+        print(f"agent directory preloaded: {count} agents")
+
+
+def read_shared_cache(instance_id, agent_id):
+    """从跨容器共享缓存读取；未配置或读取失败时视为未命中。"""
+    if shared_store is None:
+        return False, None
+    try:
+        return shared_store.get(instance_id, agent_id)
+    except Exception as e:
+        print(f"shared cache read failed: {e}")
+        return False, None
+
+
+def write_shared_cache(instance_id, agent_id, agent_name):
+    """回写跨容器共享缓存；写入失败不影响本次调用结果。"""
+    if shared_store is None:
+        return
+    ttl = CACHE_TTL_SECONDS if agent_name is not None else CACHE_NEGATIVE_TTL_SECONDS
+    try:
+        shared_store.put(instance_id, agent_id, agent_name, ttl)
+    except Exception as e:
+        print(f"shared cache write failed: {e}")
+
+
+def describe_agent_name(agent_id, instance_id):
+    """调用 Connect describe_user 获取座席姓名；座席不存在时返回 None。"""
+    try:
+        response = connect.describe_user(UserId=agent_id, InstanceId=instance_id)
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') in NOT_FOUND_ERROR_CODES:
+            return None
+        raise
     info = response['User']['IdentityInfo']
     return f"{info['FirstName']} {info['LastName']}"
 
 
+def describe_with_deadline(key, agent_id, instance_id, timeout_seconds):
+    """在截止时间内等待 describe_user；超时抛出 FutureTimeoutError。
+
+    超时的调用仍在后台线程中继续，完成后把结果写入缓存，供之后的调用使用。
+    """
+    future = describe_executor.submit(describe_agent_name, agent_id, instance_id)
+    try:
+        return future.result(timeout=max(timeout_seconds, 0))
+    except FutureTimeoutError:
+        future.add_done_callback(lambda f: store_late_result(key, f))
+        raise
+
+
+def store_late_result(key, future):
+    """超时后才完成的 describe_user 结果同样写入本地与共享缓存，避免其它容器重复查询。"""
+    if future.exception() is None:
+        agent_name = future.result()
+        agent_name_cache.put(key, agent_name)
+        write_shared_cache(key[0], key[1], agent_name)
+
+
+def degraded_agent_name(key, error, metrics=None):
+    """降级模式：返回最近一次已知（陈旧）的姓名，否则返回配置的默认姓名。"""
+    hit, agent_name = agent_name_cache.get_stale(key)
+    mode = 'stale' if hit else 'fallback'
+    print(f"agent name degraded ({mode}): {type(error).__name__}: {error}")
+    if metrics is not None:
+        metrics.record_degraded(mode, error)
+    return agent_name if hit else FALLBACK_AGENT_NAME
+
+
+def get_agent_name(agent_id, instance_id, metrics=None, deadline_ms=DEADLINE_MS):
+    if not agent_id:
+        return ""
+    directory = get_agent_directory(instance_id)
+    if directory is not None:
+        hit, agent_name = directory.lookup(agent_id)
+        if hit:
+            record_source(metrics, 'directory')
+            return agent_name
+    key = (instance_id, agent_id)
+    hit, agent_name = agent_name_cache.get(key)
+    if hit:
+        record_source(metrics, 'local')
+        return agent_name or ""
+
+    # 共享缓存的读取耗时计入截止时间，剩余时间不足时 describe_with_deadline 立即超时并降级；
+    # 剩余时间已不足一次共享缓存读取的超时时，跳过读取，把时间留给 describe_user
+    hit = False
+    if deadline_ms >= SHARED_CACHE_TIMEOUT * 1000:
+        started = time.monotonic()
+        hit, agent_name = read_shared_cache(instance_id, agent_id)
+        deadline_ms -= (time.monotonic() - started) * 1000
+    if hit:
+        record_source(metrics, 'shared')
+    else:
+        record_source(metrics, 'describe')
+        timer = metrics.timed('DescribeUserLatency') if metrics is not None else nullcontext()
+        try:
+            with trace_subsegment('DescribeUser'), timer:
+                agent_name = describe_with_deadline(
+                    key, agent_id, instance_id, deadline_ms / 1000)
+        except (FutureTimeoutError, ClientError, BotoCoreError) as e:
+            return degraded_agent_name(key, e, metrics)
+        write_shared_cache(instance_id, agent_id, agent_name)
+    agent_name_cache.put(key, agent_name)
+    return agent_name or ""
+
+
+def fetch_agent_profile(agent_id, instance_id):
+    """调用 describe_user 获取座席详情 {Name, Username, RoutingProfileId, HierarchyGroupId}；座席不存在时返回 None。"""
+    try:
+        user = connect.describe_user(UserId=agent_id, InstanceId=instance_id)['User']
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') in NOT_FOUND_ERROR_CODES:
+            return None
+        raise
+    info = user['IdentityInfo']
+    return {
+        'Name': f"{info['FirstName']} {info['LastName']}",
+        'Username': user.get('Username', ''),
+        'RoutingProfileId': user.get('RoutingProfileId', ''),
+        'HierarchyGroupId': user.get('HierarchyGroupId', ''),
+    }
+
+
+def store_agent_profile(key, profile):
+    """写入座席详情缓存，并把姓名（座席不存在时为负缓存）写入本地与共享姓名缓存。"""
+    agent_profile_cache.put(key, profile)
+    agent_name = profile['Name'] if profile is not None else None
+    agent_name_cache.put(key, agent_name)
+    write_shared_cache(key[0], key[1], agent_name)
+
+
+def store_late_profile(key, future):
+    if future.exception() is None:
+        store_agent_profile(key, future.result())
+
+
+def describe_agent_profile(agent_id, instance_id, timeout_seconds):
+    """返回座席详情；座席不存在时返回 None。
+
+    与 describe_with_deadline 相同：超过 timeout_seconds 抛出 FutureTimeoutError，
+    查询在后台继续并在完成后写入缓存。
+    """
+    key = (instance_id, agent_id)
+    hit, profile = agent_profile_cache.get(key)
+    if hit:
+        return profile
+    future = describe_executor.submit(fetch_agent_profile, agent_id, instance_id)
+    try:
+        profile = future.result(timeout=max(timeout_seconds, 0))
+    except FutureTimeoutError:
+        future.add_done_callback(lambda f: store_late_profile(key, f))
+        raise
+    store_agent_profile(key, profile)
+    return profile
+
+
+def describe_resource_name(kind, resource_id, instance_id):
+    """返回路由配置（RoutingProfile）或层级组（HierarchyGroup）的名称。"""
+    if not resource_id:
+        return ""
+    key = (instance_id, kind, resource_id)
+    hit, name = resource_name_cache.get(key)
+    if hit:
+        return name or ""
+    if kind == 'RoutingProfile':
+        name = connect.describe_routing_profile(
+            InstanceId=instance_id, RoutingProfileId=resource_id)['RoutingProfile']['Name']
+    else:
+        name = connect.describe_user_hierarchy_group(
+            HierarchyGroupId=resource_id, InstanceId=instance_id)['HierarchyGroup']['Name']
+    resource_name_cache.put(key, name)
+    return name
+
+
+def resolve_agent_attributes(agent_id, instance_id, attributes, deadline_ms, metrics=None):
+    """解析单个座席的多个属性，返回 {属性名: 值}。
+
+    姓名沿用 get_agent_name 的目录/缓存/降级路径；其余属性来自 describe_user
+    与 describe_routing_profile / describe_user_hierarchy_group，失败时降级为空字符串。
+    """
+    result = {}
+    others = [a for a in attributes if a != 'Name']
+    started = time.monotonic()
+    # 先获取座席详情（会顺带写入姓名缓存），随后的姓名解析无需再次调用 describe_user
+    try:
+        profile = {}
+        if others and agent_id:
+            profile = describe_agent_profile(agent_id, instance_id, deadline_ms / 1000) or {}
+        for attribute in others:
+            if attribute == 'Username':
+                result[attribute] = profile.get('Username', '')
+            else:
+                result[attribute] = describe_resource_name(
+                    attribute, profile.get(f'{attribute}Id'), instance_id)
+    except (FutureTimeoutError, ClientError, BotoCoreError) as e:
+        print(f"agent attributes degraded: {type(e).__name__}: {e}")
+        if metrics is not None:
+            metrics.record_degraded('fallback', e)
+    if 'Name' in attributes:
+        remaining_ms = deadline_ms - (time.monotonic() - started) * 1000
+        result['Name'] = get_agent_name(agent_id, instance_id, metrics, remaining_ms)
+    return result
+
+
+def resolve_batch(agents, instance_id, attributes, deadline_ms, metrics=None):
+    """并发解析多个座席的属性，返回扁平的属性映射。
+
+    agents 为 [(输出 key 前缀, agent_id), ...]。所有查询共享同一个截止时间，
+    截止时仍未完成的座席返回默认值（姓名为 AGENT_NAME_FALLBACK，其余为空字符串）。
+    """
+    futures = {
+        prefix: batch_executor.submit(
+            resolve_agent_attributes, agent_id, instance_id, attributes, deadline_ms, metrics)
+        for prefix, agent_id in agents
+    }
+    done, _ = wait(futures.values(), timeout=max(deadline_ms, 0) / 1000)
+
+    response = {}
+    for prefix, future in futures.items():
+        values = {}
+        if future in done and future.exception() is None:
+            values = future.result()
+        elif metrics is not None:
+            metrics.record_degraded(
+                'fallback', future.exception() if future in done else FutureTimeoutError())
+        for attribute in attributes:
+            default = FALLBACK_AGENT_NAME if attribute == 'Name' else ''
+            response[f'{prefix}{attribute}'] = values.get(attribute, default)
+    return response
+
+
+def parse_batch_request(parameters):
+    """从 Details.Parameters 解析批量请求，返回 (agents, attributes)。
+
+    - LastAgentID:     兼容原有参数，输出前缀为 LastAgent（如 LastAgentName）
+    - AgentIds:        逗号分隔的多个座席 ID，输出前缀依次为 Agent1、Agent2 ...
+    - AgentAttributes: 逗号分隔的属性列表（Name / Username / RoutingProfile / HierarchyGroup），默认 Name
+    """
+    agents = []
+    if 'LastAgentID' in parameters:
+        agents.append(('LastAgent', parameters['LastAgentID']))
+    agent_ids = [a.strip() for a in parameters.get('AgentIds', '').split(',') if a.strip()]
+    for index, agent_id in enumerate(agent_ids[:BATCH_MAX_AGENTS], 1):
+        agents.append((f'Agent{index}', agent_id))
+
+    attributes = []
+    for attribute in parameters.get('AgentAttributes', 'Name').split(','):
+        attribute = attribute.strip()
+        if attribute in SUPPORTED_ATTRIBUTES and attribute not in attributes:
+            attributes.append(attribute)
+        elif attribute:
+            print(f"unsupported agent attribute ignored: {attribute}")
+    return agents, attributes or ['Name']
+
+
+def record_source(metrics, source):
+    if metrics is not None:
+        metrics.record_source(source)
+
+
 def get_instance_id(instance_arn):
     return instance_arn.split('/')[1]
 
 
+def is_scheduled_event(event):
+    """EventBridge 定时规则的事件；其它缺少 Details 的事件（测试调用等）不会触发目录刷新。"""
+    return event.get('source') == 'aws.events' or event.get('detail-type') == 'Scheduled Event'
+
+
+def refresh_agent_directories():
+    """定时事件（EventBridge）触发的目录刷新，返回各实例的座席数量。
+
+    刷新仍在目录线程中执行（与调用路径上提交的刷新互斥），定时调用等待其完成。
+    """
+    instance_ids = set(agent_directories)
+    if DIRECTORY_INSTANCE_ID:
+        instance_ids.add(DIRECTORY_INSTANCE_ID)
+    futures = {}
+    for instance_id in instance_ids:
+        directory = get_agent_directory(instance_id)
+        with directory_lock:
+            futures[instance_id] = submit_directory_refresh(directory)
+    return {instance_id: future.result() for instance_id, future in futures.items()}
+
+
+def get_deadline_ms(context):
+    """硬性截止时间：取配置值与 Lambda 剩余执行时间（扣除安全余量）中的较小者。"""
+    get_remaining = getattr(context, 'get_remaining_time_in_millis', None)
+    if get_remaining is None:
+        return DEADLINE_MS
+    return min(DEADLINE_MS, get_remaining() - DEADLINE_SAFETY_MARGIN_MS)
+
+
 def lambda_handler(event, context):
-    print(event)
-    agent_id = event["Details"]["Parameters"]["LastAgentID"]
-    print('agent_id:' + agent_id)
-    instance_arn = event["Details"]["ContactData"]["InstanceARN"]
-    instance_id = get_instance_id(instance_arn)
-    print('instance_id:' + instance_id)
-    agent_name = get_agent_name(agent_id, instance_id)
-    return {
-        'LastAgentName': agent_name
-    }
+    global cold_start
+    if is_scheduled_event(event):
+        if not DIRECTORY_PRELOAD:
+            return {}
+        return refresh_agent_directories()
+
+    metrics = InvocationMetrics(getattr(context, 'function_name', FUNCTION_NAME), cold_start)
+    cold_start = False
+    try:
+        print(event)
+        parameters = event["Details"]["Parameters"]
+        instance_arn = event["Details"]["ContactData"]["InstanceARN"]
+        instance_id = get_instance_id(instance_arn)
+        print('instance_id:' + instance_id)
+        agents, attributes = parse_batch_request(parameters)
+        deadline_ms = get_deadline_ms(context)
+        if len(agents) == 1 and agents[0][0] == 'LastAgent' and attributes == ['Name']:
+            # 常见路径：只解析 LastAgentID 的姓名，直接在当前线程完成
+            print('agent_id:' + agents[0][1])
+            response = {
+                'LastAgentName': get_agent_name(agents[0][1], instance_id, metrics, deadline_ms)
+            }
+        else:
+            metrics.put('BatchAgents', len(agents))
+            response = resolve_batch(agents, instance_id, attributes, deadline_ms, metrics)
+    except Exception as e:
+        metrics.record_error(e)
+        raise
+    finally:
+        metrics.flush()
+    return response
+
+
+def prime_before_snapshot():
+    """SnapStart 快照前的预热：加载 describe_user 的服务模型并预加载座席目录，
+    使从快照恢复的执行环境无需再付出这些初始化开销。"""
+    connect.meta.service_model.operation_model('DescribeUser')
+    preload_agent_directory()
+
+
+def reset_after_restore():
+    """从快照恢复后重置快照时的模块级状态。
+
+    - 清空姓名、座席详情与资源名称缓存（本地缓存与快照时间点绑定，恢复时可能早已过期）
+    - 重建 describe / 批量 / 目录线程池：快照中的线程与未完成任务不应带入恢复后的执行环境
+    - 重建 Connect 客户端与共享缓存客户端：快照中的 HTTP 连接池与凭证在恢复后不可复用
+    - 快照前预加载的目录内容保留（避免恢复后重新全量加载），标记为过期并立即提交后台增量刷新
+    """
+    global describe_executor, batch_executor, directory_executor, connect, shared_store
+    for cache in (agent_name_cache, agent_profile_cache, resource_name_cache):
+        cache.clear()
+    for executor in (describe_executor, batch_executor, directory_executor):
+        executor.shutdown(wait=False, cancel_futures=True)
+    describe_executor = ThreadPoolExecutor(max_workers=4)
+    batch_executor = ThreadPoolExecutor(max_workers=BATCH_MAX_CONCURRENCY)
+    directory_executor = ThreadPoolExecutor(max_workers=1)
+    connect = boto3.client('connect', config=CONNECT_CLIENT_CONFIG)
+    shared_store = create_shared_store(config=SHARED_CACHE_CLIENT_CONFIG)
+    with directory_lock:
+        directory_refreshes.clear()
+        for directory in agent_directories.values():
+            directory.client = connect
+            directory.mark_stale()
+            submit_directory_refresh(directory)
+
+
+preload_agent_directory()
+
+# snapshot_restore_py 由 Lambda Python 运行时提供（SnapStart），本地环境中不存在
+try:
+    from snapshot_restore_py import register_after_restore, register_before_snapshot
+except ImportError:
+    pass
+else:
+    register_before_snapshot(prime_before_snapshot)
+    register_after_restore(reset_after_restore)
@@ -0,0 +1,137 @@
+import contextlib
+import json
+import os
+import threading
+import time
+
+# 每次调用输出一行 CloudWatch 嵌入式指标格式（EMF）日志，CloudWatch 会自动提取为指标：
+#   - DescribeUserLatency: describe_user 调用耗时（毫秒，未调用时不输出）
+#   - InvocationLatency:   整次调用耗时（毫秒）
+#   - ColdStart:           冷启动为 1，温启动为 0
+#   - CacheHit/CacheMiss:  由缓存（目录/本地/共享）返回 / 调用 describe_user 的姓名数量
+#   - Errors:              调用是否失败；错误类型记录在 ErrorType 属性中
+#   - Degraded:            以降级模式返回（陈旧姓名或默认姓名，见 DegradedMode 属性）的数量
+#   - BatchAgents:         批量解析时本次请求的座席数量
+# 批量解析时各座席在不同线程中记录，计数类指标为整次调用的合计。
+# 配置（Lambda 环境变量）：
+#   METRICS_ENABLED:   为 false 时不输出指标（默认 true）
+#   METRICS_NAMESPACE: CloudWatch 指标命名空间
+#   TRACING_ENABLED:   为 true 且已打包 aws_xray_sdk 时，为 describe_user 创建 X-Ray 子段
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').strip().lower() in ('true', '1', 'yes')
+METRICS_NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'ConnectVoiceChannel/GetAgentName')
+TRACING_ENABLED = os.environ.get('TRACING_ENABLED', 'false').strip().lower() in ('true', '1', 'yes')
+
+try:
+    from aws_xray_sdk.core import xray_recorder
+except ImportError:
+    xray_recorder = None
+
+_METRIC_UNITS = {
+    'DescribeUserLatency': 'Milliseconds',
+    'InvocationLatency': 'Milliseconds',
+    'ColdStart': 'Count',
+    'CacheHit': 'Count',
+    'CacheMiss': 'Count',
+    'Errors': 'Count',
+    'Degraded': 'Count',
+    'BatchAgents': 'Count',
+}
+
+
+@contextlib.contextmanager
+def trace_subsegment(name):
+    """可选的 X-Ray 子段；未启用或未安装 aws_xray_sdk 时为空操作。"""
+    if not TRACING_ENABLED or xray_recorder is None:
+        yield None
+        return
+    with xray_recorder.in_subsegment(name) as subsegment:
+        yield subsegment
+
+
+class InvocationMetrics:
+    """收集单次调用的指标，调用结束时以一行 EMF JSON 输出。
+
+    批量解析的工作线程共用同一个实例，计数通过 add() 在锁内累加。
+    """
+
+    def __init__(self, function_name, cold_start, clock=time.perf_counter):
+        self.function_name = function_name
+        self._clock = clock
+        self._started_at = clock()
+        self._lock = threading.Lock()
+        self.values = {'ColdStart': 1 if cold_start else 0}
+        self.properties = {}
+        self._sources = set()
+
+    def put(self, name, value):
+        with self._lock:
+            self.values[name] = value
+
+    def add(self, name, value=1):
+        with self._lock:
+            self.values[name] = self.values.get(name, 0) + value
+
+    def set_property(self, name, value):
+        self.properties[name] = value
+
+    @contextlib.contextmanager
+    def timed(self, name):
+        started_at = self._clock()
+        try:
+            yield
+        finally:
+            # 批量解析中有多次 describe_user 时记录最慢的一次
+            elapsed = (self._clock() - started_at) * 1000
+            with self._lock:
+                self.values[name] = max(self.values.get(name, 0), elapsed)
+
+    def record_source(self, source):
+        """记录姓名来源：directory / local / shared / describe。多个来源时 CacheSource 为逗号分隔的列表。"""
+        hit = source != 'describe'
+        with self._lock:
+            self._sources.add(source)
+            self.properties['CacheSource'] = ','.join(sorted(self._sources))
+            self.values.setdefault('CacheHit', 0)
+            self.values.setdefault('CacheMiss', 0)
+            self.values['CacheHit' if hit else 'CacheMiss'] += 1
+
+    def _record_error_class(self, error):
+        self.set_property('ErrorType', type(error).__name__)
+        code = getattr(error, 'response', {}).get('Error', {}).get('Code')
+        if code:
+            self.set_property('ErrorCode', code)
+
+    def record_error(self, error):
+        self.put('Errors', 1)
+        self._record_error_class(error)
+
+    def record_degraded(self, mode, error):
+        """记录降级返回：mode 为 stale（陈旧姓名）或 fallback（默认姓名）。"""
+        self.add('Degraded')
+        self.set_property('DegradedMode', mode)
+        self._record_error_class(error)
+
+    def to_emf(self):
+        self.values.setdefault('Errors', 0)
+        self.values['InvocationLatency'] = (self._clock() - self._started_at) * 1000
+        document = {
+            '_aws': {
+                'Timestamp': int(time.time() * 1000),
+                'CloudWatchMetrics': [{
+                    'Namespace': METRICS_NAMESPACE,
+                    'Dimensions': [['FunctionName']],
+                    'Metrics': [
+                        {'Name': name, 'Unit': _METRIC_UNITS.get(name, 'None')}
+                        for name in self.values
+                    ],
+                }],
+            },
+            'FunctionName': self.function_name,
+        }
+        document.update(self.properties)
+        document.update(self.values)
+        return document
+
+    def flush(self):
+        if METRICS_ENABLED:
+            print(json.dumps(self.to_emf()))
@@ -0,0 +1,129 @@
+import os
+import sqlite3
+import threading
+import time
+
+# 跨容器共享的座席姓名缓存后端。
+# 所有后端实现相同的接口：
+#   get(instance_id, agent_id) -> (hit, name)   name 为 None 表示负缓存（座席不存在）
+#   put(instance_id, agent_id, name, ttl)
+# 后端通过 Lambda 环境变量选择：
+#   AGENT_NAME_SHARED_CACHE_BACKEND: dynamodb | sqlite | memory | none（默认 none）
+#   AGENT_NAME_SHARED_CACHE_TABLE:   DynamoDB 表名（dynamodb 后端）
+#   AGENT_NAME_SHARED_CACHE_PATH:    SQLite 数据库文件路径（sqlite 后端，默认 /tmp/agent_names.db）
+
+
+def make_cache_key(instance_id, agent_id):
+    return f"{instance_id}#{agent_id}"
+
+
+class InMemoryAgentNameStore:
+    """进程内的共享缓存替身，供本地测试使用。"""
+
+    def __init__(self, clock=time.time):
+        self._clock = clock
+        self._items = {}
+
+    def get(self, instance_id, agent_id):
+        item = self._items.get(make_cache_key(instance_id, agent_id))
+        if item is None or item[1] <= self._clock():
+            return False, None
+        return True, item[0]
+
+    def put(self, instance_id, agent_id, name, ttl):
+        self._items[make_cache_key(instance_id, agent_id)] = (name, self._clock() + ttl)
+
+
+class SQLiteAgentNameStore:
+    """基于 SQLite 的共享缓存替身，可在多个本地进程之间共享。
+
+    存储在模块导入时创建，但会在 describe / 批量解析的工作线程中使用，
+    因此连接允许跨线程访问，并以锁串行化所有读写。
+    """
+
+    def __init__(self, path, clock=time.time):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS agent_names ("
+            "cache_key TEXT PRIMARY KEY, agent_name TEXT, found INTEGER, expires_at REAL)")
+        self._conn.commit()
+
+    def get(self, instance_id, agent_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT agent_name, found, expires_at FROM agent_names WHERE cache_key = ?",
+                (make_cache_key(instance_id, agent_id),)).fetchone()
+        if row is None or row[2] <= self._clock():
+            return False, None
+        return True, (row[0] if row[1] else None)
+
+    def put(self, instance_id, agent_id, name, ttl):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO agent_names VALUES (?, ?, ?, ?)",
+                (make_cache_key(instance_id, agent_id), name or "", int(name is not None),
+                 self._clock() + ttl))
+            self._conn.commit()
+
+
+class DynamoDBAgentNameStore:
+    """基于 DynamoDB 的共享缓存，表结构由 Stack 创建：
+
+    - 分区键 CacheKey（"{instance_id}#{agent_id}"）
+    - AgentName / Found 存储姓名与是否存在
+    - ExpiresAt 为 TTL 属性（epoch 秒）。DynamoDB 的 TTL 删除是延迟执行的，
+      因此读取时仍需自行判断是否过期。
+    """
+
+    def __init__(self, table_name, client=None, clock=time.time):
+        if client is None:
+            import boto3
+            client = boto3.client('dynamodb')
+        self.table_name = table_name
+        self.client = client
+        self._clock = clock
+
+    def get(self, instance_id, agent_id):
+        response = self.client.get_item(
+            TableName=self.table_name,
+            Key={'CacheKey': {'S': make_cache_key(instance_id, agent_id)}})
+        item = response.get('Item')
+        if not item or int(item['ExpiresAt']['N']) <= self._clock():
+            return False, None
+        if not item.get('Found', {}).get('BOOL', True):
+            return True, None
+        return True, item.get('AgentName', {}).get('S', '')
+
+    def put(self, instance_id, agent_id, name, ttl):
+        self.client.put_item(
+            TableName=self.table_name,
+            Item={
+                'CacheKey': {'S': make_cache_key(instance_id, agent_id)},
+                'AgentName': {'S': name or ''},
+                'Found': {'BOOL': name is not None},
+                'ExpiresAt': {'N': str(int(self._clock() + ttl))},
+            })
+
+
+def create_shared_store(backend=None, config=None):
+    """根据环境变量创建共享缓存后端；未配置时返回 None。
+
+    config 为 botocore Config，用于给 DynamoDB 客户端设置超时与重试（Lambda 使用单次尝试、短超时的配置，
+    使读取耗时保持在姓名解析的截止时间之内）。
+    """
+    backend = (backend or os.environ.get('AGENT_NAME_SHARED_CACHE_BACKEND', 'none')).strip().lower()
+    if backend == 'dynamodb':
+        table_name = os.environ.get('AGENT_NAME_SHARED_CACHE_TABLE', '')
+        if not table_name:
+            print("AGENT_NAME_SHARED_CACHE_TABLE not set, shared cache disabled")
+            return None
+        import boto3
+        return DynamoDBAgentNameStore(table_name, boto3.client('dynamodb', config=config))
+    if backend == 'sqlite':
+        return SQLiteAgentNameStore(
+            os.environ.get('AGENT_NAME_SHARED_CACHE_PATH', '/tmp/agent_names.db'))
+    if backend == 'memory':
+        return InMemoryAgentNameStore()
+    return None
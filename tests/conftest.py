@@ -0,0 +1,15 @@
+import os
+import sys
+
+# 测试不访问 AWS：boto3 只需要区域与（假的）凭证即可在模块导入时创建客户端
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LAMBDA_DIR = os.path.join(PROJECT_DIR, "lambda", "GetAgentNameByAgentId")
+
+# Lambda 代码以函数目录为根导入（lambda_function、agent_directory ...），CLI 与 CDK 代码以项目目录为根
+for path in (PROJECT_DIR, LAMBDA_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
@@ -0,0 +1,91 @@
+import pytest
+from botocore.exceptions import ClientError
+
+from agent_directory import AgentDirectory
+from lambda_function import is_scheduled_event
+
+INSTANCE_ID = "instance-1"
+
+
+class FakePaginator:
+    def __init__(self, pages):
+        self.pages = pages
+
+    def paginate(self, **kwargs):
+        return iter(self.pages)
+
+
+class FakeConnectClient:
+    """list_users / search_users / describe_user 替身；users 为 {agent_id: (姓, 名, LastModifiedTime)}"""
+
+    def __init__(self, users, search_available=True):
+        self.users = dict(users)
+        self.search_available = search_available
+        self.describe_calls = []
+
+    def get_paginator(self, operation):
+        if operation == "list_users":
+            return FakePaginator([{"UserSummaryList": [
+                {"Id": agent_id, "LastModifiedTime": modified}
+                for agent_id, (_, _, modified) in self.users.items()]}])
+        if not self.search_available:
+            raise ClientError({"Error": {"Code": "AccessDeniedException"}}, "SearchUsers")
+        return FakePaginator([{"Users": [
+            {"Id": agent_id, "IdentityInfo": {"FirstName": first, "LastName": last}}
+            for agent_id, (first, last, _) in self.users.items()]}])
+
+    def describe_user(self, UserId, InstanceId):
+        self.describe_calls.append(UserId)
+        if UserId not in self.users:
+            raise ClientError({"Error": {"Code": "ResourceNotFoundException"}}, "DescribeUser")
+        first, last, _ = self.users[UserId]
+        return {"User": {"IdentityInfo": {"FirstName": first, "LastName": last}}}
+
+
+@pytest.fixture
+def client():
+    return FakeConnectClient({"a1": ("Jane", "Doe", 1), "a2": ("John", "Roe", 1)})
+
+
+def test_load_uses_search_users(client):
+    directory = AgentDirectory(client, INSTANCE_ID)
+    assert directory.load() == 2
+    assert directory.lookup("a1") == (True, "Jane Doe")
+    assert directory.lookup("missing") == (False, None)
+    assert client.describe_calls == []
+
+
+def test_load_falls_back_to_describe_user(client):
+    client.search_available = False
+    directory = AgentDirectory(client, INSTANCE_ID)
+    assert directory.load() == 2
+    assert sorted(client.describe_calls) == ["a1", "a2"]
+
+
+def test_refresh_only_describes_changed_agents(client):
+    directory = AgentDirectory(client, INSTANCE_ID)
+    directory.load()
+    client.users["a1"] = ("Janet", "Doe", 2)
+    client.users["a3"] = ("New", "Agent", 1)
+    del client.users["a2"]
+    directory.refresh()
+    assert sorted(client.describe_calls) == ["a1", "a3"]
+    assert directory.lookup("a1") == (True, "Janet Doe")
+    assert directory.lookup("a2") == (False, None)
+    assert directory.lookup("a3") == (True, "New Agent")
+
+
+def test_stale_after_refresh_interval(client):
+    now = [0.0]
+    directory = AgentDirectory(client, INSTANCE_ID, refresh_interval=300, clock=lambda: now[0])
+    assert directory.is_stale()
+    directory.load()
+    assert not directory.is_stale()
+    now[0] = 300
+    assert directory.is_stale()
+
+
+def test_only_eventbridge_schedule_events_trigger_refresh():
+    assert is_scheduled_event({"source": "aws.events", "detail-type": "Scheduled Event"})
+    assert not is_scheduled_event({})
+    assert not is_scheduled_event({"key1": "value1"})
@@ -0,0 +1,18 @@
+import re
+
+from connect_cdk_voice_channel.tenant_config import agent_logical_id
+
+
+def test_logical_id_is_derived_from_username():
+    assert agent_logical_id("Agent01_Demo") == agent_logical_id("Agent01_Demo")
+    assert re.fullmatch(r"CfnUserAgent01Demo[0-9a-f]{8}", agent_logical_id("Agent01_Demo"))
+
+
+def test_usernames_with_the_same_token_get_distinct_ids():
+    assert agent_logical_id("a.b") != agent_logical_id("ab")
+
+
+def test_logical_id_is_a_valid_cloudformation_id():
+    logical_id = agent_logical_id("名字-with.symbols@example" + "x" * 300)
+    assert re.fullmatch(r"[A-Za-z0-9]+", logical_id)
+    assert len(logical_id) <= 255
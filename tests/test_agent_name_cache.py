@@ -0,0 +1,96 @@
+import pytest
+from botocore.exceptions import ClientError
+
+import lambda_function
+from lambda_function import AgentNameCache
+
+INSTANCE_ID = "instance-1"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeConnectClient:
+    """describe_user 替身：users 中不存在的座席返回 ResourceNotFoundException"""
+
+    def __init__(self, users):
+        self.users = users
+        self.calls = 0
+
+    def describe_user(self, UserId, InstanceId):
+        self.calls += 1
+        if UserId not in self.users:
+            raise ClientError({"Error": {"Code": "ResourceNotFoundException"}}, "DescribeUser")
+        first, last = self.users[UserId]
+        return {"User": {"IdentityInfo": {"FirstName": first, "LastName": last}}}
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def connect_client(monkeypatch):
+    client = FakeConnectClient({"agent-1": ("Jane", "Doe")})
+    monkeypatch.setattr(lambda_function, "connect", client)
+    lambda_function.agent_name_cache.clear()
+    yield client
+    lambda_function.agent_name_cache.clear()
+
+
+def test_entry_expires_after_ttl(clock):
+    cache = AgentNameCache(max_size=10, ttl=300, negative_ttl=60, clock=clock)
+    cache.put("a", "Jane Doe")
+    clock.now = 299
+    assert cache.get("a") == (True, "Jane Doe")
+    clock.now = 300
+    assert cache.get("a") == (False, None)
+
+
+def test_negative_entry_uses_negative_ttl(clock):
+    cache = AgentNameCache(max_size=10, ttl=300, negative_ttl=60, clock=clock)
+    cache.put("missing", None)
+    assert cache.get("missing") == (True, None)
+    clock.now = 60
+    assert cache.get("missing") == (False, None)
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = AgentNameCache(max_size=2, ttl=300, negative_ttl=60, clock=clock)
+    cache.put("a", "A")
+    cache.put("b", "B")
+    cache.get("a")
+    cache.put("c", "C")
+    assert len(cache) == 2
+    assert cache.get("a") == (True, "A")
+    assert cache.get("b") == (False, None)
+    assert cache.get("c") == (True, "C")
+
+
+def test_zero_max_size_disables_cache(clock):
+    cache = AgentNameCache(max_size=0, clock=clock)
+    cache.put("a", "A")
+    assert cache.get("a") == (False, None)
+
+
+def test_get_agent_name_calls_describe_user_once(connect_client):
+    assert lambda_function.get_agent_name("agent-1", INSTANCE_ID) == "Jane Doe"
+    assert lambda_function.get_agent_name("agent-1", INSTANCE_ID) == "Jane Doe"
+    assert connect_client.calls == 1
+
+
+def test_missing_agent_is_negatively_cached(connect_client):
+    assert lambda_function.get_agent_name("gone", INSTANCE_ID) == ""
+    assert lambda_function.get_agent_name("gone", INSTANCE_ID) == ""
+    assert connect_client.calls == 1
+
+
+def test_empty_agent_id_skips_lookup(connect_client):
+    assert lambda_function.get_agent_name("", INSTANCE_ID) == ""
+    assert connect_client.calls == 0
@@ -0,0 +1,75 @@
+import pytest
+
+import lambda_function
+from lambda_function import parse_batch_request
+
+INSTANCE_ID = "instance-1"
+
+
+class FakeConnectClient:
+    def __init__(self):
+        self.describe_user_calls = 0
+
+    def describe_user(self, UserId, InstanceId):
+        self.describe_user_calls += 1
+        return {"User": {
+            "Username": f"{UserId}-login",
+            "RoutingProfileId": "rp-1",
+            "HierarchyGroupId": "",
+            "IdentityInfo": {"FirstName": UserId.capitalize(), "LastName": "Doe"},
+        }}
+
+    def describe_routing_profile(self, InstanceId, RoutingProfileId):
+        return {"RoutingProfile": {"Name": "Sales"}}
+
+
+@pytest.fixture
+def connect_client(monkeypatch):
+    client = FakeConnectClient()
+    monkeypatch.setattr(lambda_function, "connect", client)
+    monkeypatch.setattr(lambda_function, "shared_store", None)
+    for cache in (lambda_function.agent_name_cache, lambda_function.agent_profile_cache,
+                  lambda_function.resource_name_cache):
+        cache.clear()
+    return client
+
+
+def test_last_agent_id_only():
+    assert parse_batch_request({"LastAgentID": "a1"}) == ([("LastAgent", "a1")], ["Name"])
+
+
+def test_agent_ids_and_attributes():
+    agents, attributes = parse_batch_request({
+        "AgentIds": "a1, a2,,a3",
+        "AgentAttributes": "Name,RoutingProfile,Name",
+    })
+    assert agents == [("Agent1", "a1"), ("Agent2", "a2"), ("Agent3", "a3")]
+    assert attributes == ["Name", "RoutingProfile"]
+
+
+def test_unsupported_attributes_fall_back_to_name():
+    assert parse_batch_request({"LastAgentID": "a1", "AgentAttributes": "Email"})[1] == ["Name"]
+
+
+def test_agent_ids_are_capped(monkeypatch):
+    monkeypatch.setattr(lambda_function, "BATCH_MAX_AGENTS", 2)
+    agents, _ = parse_batch_request({"AgentIds": "a1,a2,a3"})
+    assert [agent_id for _, agent_id in agents] == ["a1", "a2"]
+
+
+def test_resolve_batch_returns_flat_map(connect_client):
+    response = lambda_function.resolve_batch(
+        [("LastAgent", "alice"), ("Agent1", "bob")], INSTANCE_ID,
+        ["Name", "Username", "RoutingProfile", "HierarchyGroup"], deadline_ms=2000)
+    assert response == {
+        "LastAgentName": "Alice Doe",
+        "LastAgentUsername": "alice-login",
+        "LastAgentRoutingProfile": "Sales",
+        "LastAgentHierarchyGroup": "",
+        "Agent1Name": "Bob Doe",
+        "Agent1Username": "bob-login",
+        "Agent1RoutingProfile": "Sales",
+        "Agent1HierarchyGroup": "",
+    }
+    # 座席详情查询会顺带写入姓名缓存，姓名解析不再调用 describe_user
+    assert connect_client.describe_user_calls == 2
@@ -0,0 +1,131 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from botocore.exceptions import ClientError
+
+import lambda_function
+from lambda_function import AgentNameCache
+from metrics import InvocationMetrics
+from shared_cache import InMemoryAgentNameStore
+
+INSTANCE_ID = "instance-1"
+KEY = (INSTANCE_ID, "agent-1")
+
+
+class SlowConnectClient:
+    """describe_user 阻塞到 release() 为止，或直接抛出 error"""
+
+    def __init__(self, error=None):
+        self.error = error
+        self.released = threading.Event()
+
+    def release(self):
+        self.released.set()
+
+    def describe_user(self, UserId, InstanceId):
+        if self.error is not None:
+            raise self.error
+        self.released.wait(5)
+        return {"User": {"IdentityInfo": {"FirstName": "Jane", "LastName": "Doe"}}}
+
+
+def wait_for(predicate, timeout=5):
+    """超时后完成的 describe_user 在后台线程中回写缓存"""
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+@pytest.fixture(autouse=True)
+def reset_state(monkeypatch):
+    monkeypatch.setattr(lambda_function, "FALLBACK_AGENT_NAME", "Agent")
+    monkeypatch.setattr(lambda_function, "shared_store", None)
+    lambda_function.agent_name_cache.clear()
+    yield
+    lambda_function.agent_name_cache.clear()
+
+
+@pytest.fixture
+def slow_client(monkeypatch):
+    client = SlowConnectClient()
+    monkeypatch.setattr(lambda_function, "connect", client)
+    yield client
+    client.release()
+
+
+def test_stale_entries_survive_expiry():
+    now = [0.0]
+    cache = AgentNameCache(max_size=10, ttl=300, negative_ttl=60, clock=lambda: now[0])
+    cache.put("a", "Jane Doe")
+    cache.put("gone", None)
+    now[0] = 1000
+    assert cache.get("a") == (False, None)
+    assert cache.get_stale("a") == (True, "Jane Doe")
+    # 负缓存条目不作为陈旧值返回
+    assert cache.get_stale("gone") == (False, None)
+
+
+def test_deadline_is_capped_by_remaining_time():
+    context = SimpleNamespace(get_remaining_time_in_millis=lambda: 1000)
+    expected = min(lambda_function.DEADLINE_MS, 1000 - lambda_function.DEADLINE_SAFETY_MARGIN_MS)
+    assert lambda_function.get_deadline_ms(context) == expected
+    assert lambda_function.get_deadline_ms(object()) == lambda_function.DEADLINE_MS
+
+
+def test_timeout_returns_fallback_and_stores_late_result(slow_client):
+    metrics = InvocationMetrics("fn", cold_start=False)
+    assert lambda_function.get_agent_name("agent-1", INSTANCE_ID, metrics, deadline_ms=50) == "Agent"
+    document = metrics.to_emf()
+    assert document["Degraded"] == 1
+    assert document["DegradedMode"] == "fallback"
+
+    slow_client.release()
+    assert wait_for(lambda: lambda_function.agent_name_cache.get(KEY) == (True, "Jane Doe"))
+
+
+def test_late_result_is_written_to_shared_cache(slow_client, monkeypatch):
+    store = InMemoryAgentNameStore()
+    monkeypatch.setattr(lambda_function, "shared_store", store)
+    lambda_function.get_agent_name("agent-1", INSTANCE_ID, deadline_ms=50)
+    slow_client.release()
+    assert wait_for(lambda: store.get(INSTANCE_ID, "agent-1") == (True, "Jane Doe"))
+
+
+def test_throttling_returns_stale_name(monkeypatch):
+    error = ClientError({"Error": {"Code": "ThrottlingException"}}, "DescribeUser")
+    monkeypatch.setattr(lambda_function, "connect", SlowConnectClient(error))
+    # ttl=0：条目写入后立即过期，只能作为陈旧值返回
+    monkeypatch.setattr(lambda_function, "agent_name_cache", AgentNameCache(ttl=0))
+    lambda_function.agent_name_cache.put(KEY, "Jane Doe")
+
+    metrics = InvocationMetrics("fn", cold_start=False)
+    assert lambda_function.get_agent_name("agent-1", INSTANCE_ID, metrics) == "Jane Doe"
+    document = metrics.to_emf()
+    assert document["DegradedMode"] == "stale"
+    assert document["ErrorCode"] == "ThrottlingException"
+
+
+def test_degraded_count_is_summed():
+    metrics = InvocationMetrics("fn", cold_start=False)
+    for _ in range(3):
+        metrics.record_degraded("fallback", TimeoutError())
+    assert metrics.to_emf()["Degraded"] == 3
+
+
+def test_shared_cache_skipped_near_deadline(slow_client, monkeypatch):
+    reads = []
+
+    class RecordingStore(InMemoryAgentNameStore):
+        def get(self, instance_id, agent_id):
+            reads.append(agent_id)
+            return super().get(instance_id, agent_id)
+
+    monkeypatch.setattr(lambda_function, "shared_store", RecordingStore())
+    deadline_ms = lambda_function.SHARED_CACHE_TIMEOUT * 1000 / 2
+    lambda_function.get_agent_name("agent-1", INSTANCE_ID, deadline_ms=deadline_ms)
+    assert reads == []
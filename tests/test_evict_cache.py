@@ -0,0 +1,53 @@
+import os
+
+from deploy_cli import evict_cache
+
+
+def make_entry(tmp_path, name, size, used_at):
+    path = tmp_path / name
+    path.write_bytes(b"x" * size)
+    os.utime(path, (used_at, used_at))
+    return str(path)
+
+
+def test_evicts_least_recently_used_until_under_target(tmp_path):
+    old = make_entry(tmp_path, "old", 100, 1000)
+    middle = make_entry(tmp_path, "middle", 100, 2000)
+    new = make_entry(tmp_path, "new", 100, 3000)
+    usage = {"total": 300, "exceeded": True, "pending": [],
+             "entries": {old: (100, 1000), middle: (100, 2000), new: (100, 3000)}}
+
+    assert evict_cache(usage, target=150) == (2, 200, 100)
+    assert not os.path.exists(old)
+    assert not os.path.exists(middle)
+    assert os.path.exists(new)
+
+
+def test_evicts_directories(tmp_path):
+    directory = tmp_path / "pip"
+    directory.mkdir()
+    (directory / "wheel").write_bytes(b"x" * 50)
+    usage = {"total": 50, "exceeded": True, "pending": [],
+             "entries": {str(directory): (50, 1000)}}
+
+    assert evict_cache(usage, target=0) == (1, 50, 0)
+    assert not directory.exists()
+
+
+def test_pending_entries_are_measured_before_evicting(tmp_path):
+    # scan_cache 超过上限后提前停止，剩余项在淘汰前补充统计
+    scanned = make_entry(tmp_path, "scanned", 100, 3000)
+    pending = make_entry(tmp_path, "pending", 100, 1000)
+    usage = {"total": 100, "exceeded": True, "pending": [pending],
+             "entries": {scanned: (100, 3000)}}
+
+    assert evict_cache(usage, target=100) == (1, 100, 100)
+    assert not os.path.exists(pending)
+    assert os.path.exists(scanned)
+
+
+def test_nothing_evicted_under_target(tmp_path):
+    path = make_entry(tmp_path, "entry", 100, 1000)
+    usage = {"total": 100, "exceeded": False, "pending": [], "entries": {path: (100, 1000)}}
+    assert evict_cache(usage, target=100) == (0, 0, 100)
+    assert os.path.exists(path)
@@ -0,0 +1,60 @@
+import json
+
+from connect_cdk_voice_channel.flow_template import FlowTemplate, render_flow_content
+
+
+def test_fragments_respect_identifier_boundaries():
+    template = FlowTemplate({"Text": "contact_name Inbound Flow, contact_name_suffix"},
+                            fragments=["contact_name"])
+    rendered, report = template.render({"contact_name": "Demo"})
+    assert rendered == {"Text": "Demo Inbound Flow, contact_name_suffix"}
+    assert report == {"unresolved": [], "unused": []}
+
+
+def test_longer_fragment_wins():
+    template = FlowTemplate(["arn_prefix:aws", "arn"], fragments=["arn", "arn_prefix"])
+    rendered, _ = template.render({"arn": "X", "arn_prefix": "arn:aws:connect:us-east-1:1"})
+    assert rendered == ["arn:aws:connect:us-east-1:1:aws", "X"]
+
+
+def test_substituted_text_is_not_rescanned():
+    template = FlowTemplate({"Text": "a b"}, fragments=["a", "b"])
+    rendered, _ = template.render({"a": "b", "b": "c"})
+    assert rendered == {"Text": "b c"}
+
+
+def test_exact_placeholders_match_whole_values_only():
+    template = FlowTemplate({"Voice": "Joanna", "Text": "Joanna will help you"}, exact=["Joanna"])
+    rendered, _ = template.render({"Joanna": "Matthew"})
+    assert rendered == {"Voice": "Matthew", "Text": "Joanna will help you"}
+
+
+def test_scoped_placeholders_only_match_under_their_key():
+    flow = {
+        "displayName": "GetAgentNameByAgentId",
+        "Parameters": {"Name": "GetAgentNameByAgentId"},
+    }
+    template = FlowTemplate(flow, scoped={"displayName": ["GetAgentNameByAgentId"]})
+    rendered, _ = template.render({"GetAgentNameByAgentId": "Demo-GetAgentNameByAgentId"})
+    assert rendered == {
+        "displayName": "Demo-GetAgentNameByAgentId",
+        "Parameters": {"Name": "GetAgentNameByAgentId"},
+    }
+
+
+def test_dict_keys_are_not_replaced():
+    template = FlowTemplate({"contact_name": "contact_name"}, fragments=["contact_name"])
+    rendered, _ = template.render({"contact_name": "Demo"})
+    assert rendered == {"contact_name": "Demo"}
+
+
+def test_report_unresolved_and_unused():
+    template = FlowTemplate({"Text": "queue-arn"}, fragments=["queue-arn", "welcome-message"])
+    _, report = template.render({"queue-arn": None, "welcome-message": "Hi"})
+    assert report == {"unresolved": ["queue-arn"], "unused": ["welcome-message"]}
+
+
+def test_render_flow_content_returns_json(capsys):
+    content = render_flow_content({"Text": "contact_name"}, {"contact_name": "Demo"}, {"Joanna": "Matthew"})
+    assert json.loads(content) == {"Text": "Demo"}
+    assert "Joanna" in capsys.readouterr().out
@@ -0,0 +1,81 @@
+import json
+import threading
+
+from botocore.exceptions import ClientError
+
+import metrics
+from metrics import InvocationMetrics
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_emf_document():
+    clock = FakeClock()
+    m = InvocationMetrics("fn", cold_start=True, clock=clock)
+    m.record_source("describe")
+    with m.timed("DescribeUserLatency"):
+        clock.now = 0.025
+    clock.now = 0.030
+    document = m.to_emf()
+
+    directive = document["_aws"]["CloudWatchMetrics"][0]
+    assert directive["Namespace"] == metrics.METRICS_NAMESPACE
+    assert directive["Dimensions"] == [["FunctionName"]]
+    names = {metric["Name"]: metric["Unit"] for metric in directive["Metrics"]}
+    assert names["DescribeUserLatency"] == "Milliseconds"
+    assert names["CacheMiss"] == "Count"
+    assert document["FunctionName"] == "fn"
+    assert document["ColdStart"] == 1
+    assert document["CacheSource"] == "describe"
+    assert (document["CacheHit"], document["CacheMiss"]) == (0, 1)
+    assert document["DescribeUserLatency"] == 25.0
+    assert document["InvocationLatency"] == 30.0
+    assert document["Errors"] == 0
+
+
+def test_record_error_sets_error_code():
+    m = InvocationMetrics("fn", cold_start=False)
+    m.record_error(ClientError({"Error": {"Code": "ThrottlingException"}}, "DescribeUser"))
+    document = m.to_emf()
+    assert document["Errors"] == 1
+    assert document["ErrorType"] == "ClientError"
+    assert document["ErrorCode"] == "ThrottlingException"
+
+
+def test_counts_are_summed_across_threads():
+    # 批量解析的工作线程共用同一个实例
+    m = InvocationMetrics("fn", cold_start=False)
+
+    def worker():
+        for _ in range(100):
+            m.record_source("local")
+            m.record_source("describe")
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    document = m.to_emf()
+    assert (document["CacheHit"], document["CacheMiss"]) == (400, 400)
+    assert document["CacheSource"] == "describe,local"
+
+
+def test_flush_prints_one_json_line(capsys, monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_ENABLED", True)
+    InvocationMetrics("fn", cold_start=False).flush()
+    lines = capsys.readouterr().out.splitlines()
+    assert len(lines) == 1
+    assert json.loads(lines[0])["FunctionName"] == "fn"
+
+
+def test_flush_disabled(capsys, monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_ENABLED", False)
+    InvocationMetrics("fn", cold_start=False).flush()
+    assert capsys.readouterr().out == ""
@@ -0,0 +1,43 @@
+import pytest
+
+from connect_cdk_voice_channel.parameterized import TENANT_NAME_MAX_LENGTH, ineligible_reason
+from connect_cdk_voice_channel.tenant_manifest import resolve_tenant
+
+DEFAULTS = {
+    "connect_instance_arn": "arn:aws:connect:us-east-1:123456789012:instance/i-1",
+    "security_profile_arn": "arn:aws:connect:us-east-1:123456789012:instance/i-1/security-profile/sp-1",
+    "agent_provisioning": "api",
+}
+
+
+def make_tenant(**entry):
+    return resolve_tenant({"tenant_name": "Demo", **entry}, DEFAULTS)
+
+
+def test_eligible_tenant():
+    assert ineligible_reason(make_tenant()) is None
+    assert ineligible_reason(make_tenant(enable_screenpop=True, enable_survey=True)) is None
+
+
+def test_stack_managed_agents_are_ineligible():
+    assert "agent_provisioning=api" in ineligible_reason(make_tenant(agent_provisioning="cloudformation"))
+
+
+def test_non_default_lambda_options_are_ineligible():
+    assert ineligible_reason(make_tenant(agent_directory_preload=True)) is not None
+    assert ineligible_reason(make_tenant(lambda_performance_profile="balanced")) is not None
+
+
+@pytest.mark.parametrize("tenant_name", [
+    "Demo Tenant",
+    "Demo.Tenant",
+    "租户",
+    "x" * (TENANT_NAME_MAX_LENGTH + 1),
+])
+def test_tenant_names_that_cannot_name_the_lambda_are_ineligible(tenant_name):
+    config = make_tenant(tenant_name=tenant_name, stack_name="Demo")
+    assert "租户名称" in ineligible_reason(config)
+
+
+def test_longest_valid_tenant_name_is_eligible():
+    assert ineligible_reason(make_tenant(tenant_name="a-_" * (TENANT_NAME_MAX_LENGTH // 3))) is None
@@ -0,0 +1,79 @@
+import threading
+
+import pytest
+
+from shared_cache import InMemoryAgentNameStore, SQLiteAgentNameStore, create_shared_store
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture(params=["sqlite", "memory"])
+def store(request, tmp_path, clock):
+    if request.param == "sqlite":
+        return SQLiteAgentNameStore(str(tmp_path / "agent_names.db"), clock=clock)
+    return InMemoryAgentNameStore(clock=clock)
+
+
+def test_round_trip(store):
+    assert store.get("i", "a") == (False, None)
+    store.put("i", "a", "Jane Doe", 60)
+    assert store.get("i", "a") == (True, "Jane Doe")
+    assert store.get("other", "a") == (False, None)
+
+
+def test_negative_entry(store):
+    store.put("i", "gone", None, 60)
+    assert store.get("i", "gone") == (True, None)
+
+
+def test_entry_expires(store, clock):
+    store.put("i", "a", "Jane Doe", 60)
+    clock.now += 60
+    assert store.get("i", "a") == (False, None)
+
+
+def test_sqlite_store_is_shared_between_connections(tmp_path, clock):
+    path = str(tmp_path / "agent_names.db")
+    SQLiteAgentNameStore(path, clock=clock).put("i", "a", "Jane Doe", 60)
+    assert SQLiteAgentNameStore(path, clock=clock).get("i", "a") == (True, "Jane Doe")
+
+
+def test_sqlite_store_is_usable_from_worker_threads(tmp_path, clock):
+    # 存储在导入时（主线程）创建，读写发生在 describe / 批量解析的工作线程中
+    store = SQLiteAgentNameStore(str(tmp_path / "agent_names.db"), clock=clock)
+    errors = []
+
+    def worker(n):
+        try:
+            for i in range(50):
+                store.put("i", f"agent-{n}-{i}", f"Agent {n} {i}", 60)
+                assert store.get("i", f"agent-{n}-{i}") == (True, f"Agent {n} {i}")
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+
+
+def test_create_shared_store_backends(tmp_path, monkeypatch):
+    monkeypatch.setenv("AGENT_NAME_SHARED_CACHE_PATH", str(tmp_path / "agent_names.db"))
+    assert create_shared_store("none") is None
+    assert isinstance(create_shared_store("memory"), InMemoryAgentNameStore)
+    assert isinstance(create_shared_store("sqlite"), SQLiteAgentNameStore)
+    monkeypatch.delenv("AGENT_NAME_SHARED_CACHE_TABLE", raising=False)
+    assert create_shared_store("dynamodb") is None
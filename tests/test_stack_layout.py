@@ -0,0 +1,50 @@
+import pytest
+
+from connect_cdk_voice_channel.tenant_config import AGENT_SHARD_THRESHOLD
+from test_tenant_config import make_agents, make_config
+
+
+def test_auto_layout_follows_agent_count():
+    assert not make_config(agents=make_agents(AGENT_SHARD_THRESHOLD)).layered
+    assert make_config(agents=make_agents(AGENT_SHARD_THRESHOLD + 1)).layered
+
+
+def test_layered_stack_names():
+    config = make_config(stack_layout="layered", agents_per_shard=2, agents=make_agents(5))
+    assert config.stack_names == ["Demo-Core", "Demo-Flows", "Demo-Agents1", "Demo-Agents2", "Demo-Agents3"]
+    assert [(name, start, len(rows)) for name, start, rows in config.agent_shards()] == [
+        ("Demo-Agents1", 0, 2), ("Demo-Agents2", 2, 2), ("Demo-Agents3", 4, 1)]
+
+
+def test_api_provisioned_agents_stay_out_of_the_stack():
+    config = make_config(agent_provisioning="api", agents=make_agents(AGENT_SHARD_THRESHOLD + 1))
+    assert config.stack_agents == []
+    assert not config.layered
+
+
+def test_pin_new_tenant_resolves_auto():
+    config = make_config(agents=make_agents(AGENT_SHARD_THRESHOLD + 1))
+    assert config.pin_stack_layout([]) == "layered"
+    assert config.stack_layout == "layered"
+
+
+def test_pin_keeps_deployed_single_layout_past_threshold():
+    config = make_config(agents=make_agents(AGENT_SHARD_THRESHOLD + 1))
+    assert config.pin_stack_layout(["Demo"]) == "single"
+    assert config.stack_names == ["Demo"]
+
+
+def test_pin_keeps_deployed_layered_layout_below_threshold():
+    config = make_config(agents=make_agents(3))
+    assert config.pin_stack_layout(["Demo-Core", "Demo-Flows", "Demo-Agents1"]) == "layered"
+
+
+def test_pin_rejects_explicit_layout_mismatch():
+    config = make_config(stack_layout="layered", agents=make_agents(3))
+    with pytest.raises(ValueError, match="does not match the deployed 'single' layout"):
+        config.pin_stack_layout(["Demo"])
+
+
+def test_validate_rejects_unknown_layout():
+    with pytest.raises(ValueError, match="stack_layout must be one of"):
+        make_config(stack_layout="sharded").validate()
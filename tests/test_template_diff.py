@@ -0,0 +1,79 @@
+import pytest
+
+from connect_cdk_voice_channel.template_diff import (
+    HotswapNotSupported,
+    flow_content_changes,
+    resolve_intrinsics,
+)
+
+PSEUDO = {"AWS::Region": "us-east-1", "AWS::AccountId": "123456789012", "AWS::Partition": "aws"}
+QUEUE_ARN = "arn:aws:connect:us-east-1:123456789012:instance/i-1/queue/q-1"
+
+
+def make_context(exports=None):
+    return {
+        "pseudo": PSEUDO,
+        "resources": {
+            "Queue": ("AWS::Connect::Queue", QUEUE_ARN),
+            "AgentNameFn": ("AWS::Lambda::Function", "Demo-GetAgentNameByAgentId"),
+        },
+        "exports": exports if exports is not None else {},
+    }
+
+
+def test_ref_and_get_att():
+    context = make_context()
+    assert resolve_intrinsics({"Ref": "AWS::Region"}, context) == "us-east-1"
+    assert resolve_intrinsics({"Ref": "Queue"}, context) == QUEUE_ARN
+    assert resolve_intrinsics({"Fn::GetAtt": ["Queue", "QueueArn"]}, context) == QUEUE_ARN
+    assert resolve_intrinsics({"Fn::GetAtt": "AgentNameFn.Arn"}, context) == (
+        "arn:aws:lambda:us-east-1:123456789012:function:Demo-GetAgentNameByAgentId")
+
+
+def test_join_select_split():
+    context = make_context()
+    value = {"Fn::Join": [":", [
+        {"Fn::Select": [0, {"Fn::Split": ["/", {"Ref": "Queue"}]}]},
+        "suffix",
+    ]]}
+    assert resolve_intrinsics(value, context) == "arn:aws:connect:us-east-1:123456789012:instance:suffix"
+
+
+def test_import_value_loads_exports_lazily():
+    calls = []
+
+    def load_exports():
+        calls.append(1)
+        return {"Demo-Core:QueueArn": QUEUE_ARN}
+
+    context = make_context(exports=load_exports)
+    value = [{"Fn::ImportValue": "Demo-Core:QueueArn"}, {"Fn::ImportValue": "Demo-Core:QueueArn"}]
+    assert resolve_intrinsics(value, context) == [QUEUE_ARN, QUEUE_ARN]
+    assert calls == [1]
+
+
+def test_plain_values_are_unchanged():
+    value = {"Type": "MESSAGE", "Parameters": ["a", 1, None]}
+    assert resolve_intrinsics(value, make_context()) == value
+
+
+@pytest.mark.parametrize("value", [
+    {"Ref": "Unknown"},
+    {"Fn::GetAtt": ["Queue", "QueueId"]},
+    {"Fn::ImportValue": "missing"},
+    {"Fn::If": ["Cond", "a", "b"]},
+])
+def test_unsupported_values_raise(value):
+    with pytest.raises(HotswapNotSupported):
+        resolve_intrinsics(value, make_context())
+
+
+def flow_template(content, description="flow"):
+    return {"Resources": {"Flow": {"Type": "AWS::Connect::ContactFlow",
+                                   "Properties": {"Content": content, "Description": description}}}}
+
+
+def test_flow_content_changes():
+    assert flow_content_changes(flow_template("old"), flow_template("new")) == {"Flow": "new"}
+    assert flow_content_changes(flow_template("old"), flow_template("new", "changed")) is None
+    assert flow_content_changes(None, flow_template("new")) is None
@@ -0,0 +1,65 @@
+import pytest
+
+from connect_cdk_voice_channel.tenant_config import (
+    HOURS_OF_OPERATION_KEYS,
+    IVR_MESSAGE_KEYS,
+    TenantConfig,
+)
+
+INSTANCE_ARN = "arn:aws:connect:us-east-1:123456789012:instance/00000000-0000-0000-0000-000000000000"
+
+
+def make_config(**overrides):
+    values = {
+        "tenant_name": "Demo",
+        "stack_name": "Demo",
+        "connect_instance_arn": INSTANCE_ARN,
+        "security_profile_arn": f"{INSTANCE_ARN}/security-profile/sp-1",
+        "tts_voice": "Joanna",
+        "selected_language": "English (US)",
+        "language_region_key": "en-US",
+        "ivr_messages": {key: "text" for key in IVR_MESSAGE_KEYS},
+        "hours_of_operation": {key: "value" for key in HOURS_OF_OPERATION_KEYS},
+    }
+    values.update(overrides)
+    return TenantConfig(**values)
+
+
+def make_agents(count):
+    return [{"Username": f"agent{i}", "FirstName": "A", "LastName": "B", "Password": "Passw0rd!"}
+            for i in range(count)]
+
+
+def test_valid_config():
+    config = make_config(agents=make_agents(2))
+    assert config.validate() is config
+    assert config.connect_instance_id == "00000000-0000-0000-0000-000000000000"
+
+
+def test_validate_lists_every_problem():
+    config = make_config(
+        stack_name="1-bad",
+        connect_instance_arn="not-an-arn",
+        ivr_messages={},
+        enable_survey=True,
+        agents=[{"Username": "a"}, {"Username": "a", "FirstName": "A", "LastName": "B", "Password": "p"}],
+    )
+    with pytest.raises(ValueError) as excinfo:
+        config.validate()
+    message = str(excinfo.value)
+    for expected in ("stack_name '1-bad'", "connect_instance_arn 'not-an-arn'", "ivr_messages missing",
+                     "survey_messages missing", "agents[0] missing", "agents[1] duplicate Username 'a'"):
+        assert expected in message
+
+
+def test_round_trip_through_file(tmp_path):
+    config = make_config(agents=make_agents(1), enable_screenpop=True)
+    path = config.save(str(tmp_path / "tenant.json"))
+    assert TenantConfig.load(path) == config
+
+
+def test_unknown_keys_are_rejected():
+    data = make_config().to_dict()
+    data["surprise"] = True
+    with pytest.raises(ValueError, match="surprise"):
+        TenantConfig.from_dict(data)
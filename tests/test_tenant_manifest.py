@@ -0,0 +1,18 @@
+import pytest
+
+from connect_cdk_voice_channel.tenant_manifest import _flag
+
+
+def test_flag_defaults_to_false():
+    assert _flag({}, "enable_survey") is False
+
+
+@pytest.mark.parametrize("value", [True, False])
+def test_flag_accepts_booleans(value):
+    assert _flag({"enable_survey": value}, "enable_survey") is value
+
+
+@pytest.mark.parametrize("value", ["false", "true", 0, 1, None])
+def test_flag_rejects_non_booleans(value):
+    with pytest.raises(ValueError, match="enable_survey must be true or false"):
+        _flag({"enable_survey": value}, "enable_survey")